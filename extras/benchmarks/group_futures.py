@@ -0,0 +1,74 @@
+"""
+Time to submit a 10k member group, as done on each replay of a workflow.
+
+The executor is replaced by one returning futures in a preset state, so that
+only the bookkeeping of GroupFuture is measured:
+
+    PYTHONPATH=. python extras/benchmarks/group_futures.py
+"""
+from __future__ import print_function
+
+import time
+
+from simpleflow import futures
+from simpleflow.activity import with_attributes
+from simpleflow.canvas import Group
+
+
+SIZE = 10000
+
+
+@with_attributes()
+def to_string(arg):
+    return str(arg)
+
+
+class FakeExecutor(object):
+    """
+    Finish the first *nb_finished* tasks; the next ones are running.
+    """
+    def __init__(self, nb_finished):
+        self.workflow = self
+        self.nb_finished = nb_finished
+        self.nb_submitted = 0
+
+    def submit(self, submittable):
+        future = futures.Future()
+        if self.nb_submitted < self.nb_finished:
+            future.set_finished(self.nb_submitted)
+        else:
+            future.set_running()
+        self.nb_submitted += 1
+        return future
+
+
+def scenarios():
+    return [
+        ("all finished, max_parallel=10", 10, SIZE),
+        ("9990 finished + running window", 10, SIZE - 10),
+        ("no limit, half running", None, SIZE // 2),
+    ]
+
+
+def bench(max_parallel, nb_finished, repeat=3):
+    group = Group(*[(to_string, i) for i in range(SIZE)], max_parallel=max_parallel)
+    timings = []
+    for _ in range(repeat):
+        executor = FakeExecutor(nb_finished)
+        start = time.time()
+        future = group.submit(executor)
+        # also build the result, as a workflow reading it would
+        if future.finished:
+            future.result
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main():
+    print("{:<32} {:>10}".format("scenario", "best of 3"))
+    for name, max_parallel, nb_finished in scenarios():
+        print("{:<32} {:>8.1f}ms".format(name, bench(max_parallel, nb_finished) * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Memory retained by a 50k-event history, and the time to build it.
+
+The history holds as many ActivityTaskScheduled, ActivityTaskStarted and
+ActivityTaskCompleted events, built by History.from_event_list() from raw
+events as SWF sends them. Memory is measured with tracemalloc once the raw
+events are dropped, so only what the history keeps is counted:
+
+    PYTHONPATH=. python extras/benchmarks/history_events_memory.py
+"""
+from __future__ import print_function
+
+import gc
+import time
+import tracemalloc
+
+from simpleflow.utils import json_dumps
+from swf.models.history import History
+
+NB_EVENTS = 50000
+
+
+def raw_events(nb_events):
+    events = []
+    for event_id in range(1, nb_events + 1):
+        timestamp = 1500000000.0 + event_id
+        step = (event_id - 1) % 3
+        if step == 0:
+            n = event_id // 3
+            events.append({
+                "eventId": event_id,
+                "eventTimestamp": timestamp,
+                "eventType": "ActivityTaskScheduled",
+                "activityTaskScheduledEventAttributes": {
+                    "activityId": "activity-tasks.process-{}".format(n),
+                    "activityType": {"name": "tasks.process", "version": "1.0"},
+                    "decisionTaskCompletedEventId": 4,
+                    "heartbeatTimeout": "300",
+                    "input": json_dumps({"args": [n, "https://www.example.com/page-{}.html".format(n)]}),
+                    "scheduleToCloseTimeout": "3600",
+                    "scheduleToStartTimeout": "3600",
+                    "startToCloseTimeout": "600",
+                    "taskList": {"name": "process-tasks"},
+                    "taskPriority": "0",
+                },
+            })
+        elif step == 1:
+            events.append({
+                "eventId": event_id,
+                "eventTimestamp": timestamp,
+                "eventType": "ActivityTaskStarted",
+                "activityTaskStartedEventAttributes": {
+                    "identity": json_dumps({"hostname": "worker-1", "pid": 1234, "user": "simpleflow"}),
+                    "scheduledEventId": event_id - 1,
+                },
+            })
+        else:
+            events.append({
+                "eventId": event_id,
+                "eventTimestamp": timestamp,
+                "eventType": "ActivityTaskCompleted",
+                "activityTaskCompletedEventAttributes": {
+                    "result": json_dumps({"status": 200, "size": event_id * 7}),
+                    "scheduledEventId": event_id - 2,
+                    "startedEventId": event_id - 1,
+                },
+            })
+    return events
+
+
+def build_history():
+    return History.from_event_list(raw_events(NB_EVENTS))
+
+
+def main():
+    start = time.time()
+    build_history()
+    elapsed = time.time() - start
+
+    gc.collect()
+    tracemalloc.start()
+    history = build_history()
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("{:>8} {:>14} {:>12} {:>10}".format("events", "retained", "bytes/event", "build"))
+    print("{:>8} {:>12.1f}MB {:>12} {:>8.2f}s".format(
+        len(history), retained / 1e6, retained // len(history), elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Bytes stored and encode/decode time of jumbo fields, by compression.
+
+Storage is replaced by a dict, so that only the formatting cost is measured:
+
+    PYTHONPATH=. python extras/benchmarks/jumbo_fields_compression.py
+"""
+from __future__ import print_function
+
+import os
+import random
+import time
+
+from mock import patch
+
+import swf.constants
+import swf.format
+from simpleflow.utils import json_dumps
+
+
+def payloads():
+    random.seed(0)
+    records = [
+        {
+            "id": i,
+            "url": "https://www.example.com/category/{}/page-{}.html".format(i % 50, i),
+            "status": random.choice([200, 200, 200, 301, 404]),
+            "size": random.randint(1000, 100000),
+            "tags": random.sample(["a", "b", "c", "d", "e", "f"], 3),
+        }
+        for i in range(20000)
+    ]
+    return [
+        ("300 records", records[:300]),
+        ("7500 records", records[:7500]),
+        ("20000 records", records),
+        ("50000 floats", [random.random() for _ in range(50000)]),
+    ]
+
+
+def bench(name, message, compression, store):
+    environ = {
+        "SIMPLEFLOW_JUMBO_FIELDS_BUCKET": "jumbo-bucket",
+        "SIMPLEFLOW_JUMBO_FIELDS_COMPRESSION": compression or "",
+    }
+    with patch.dict(os.environ, environ):
+        start = time.time()
+        encoded = swf.format.result(message)
+        encode_time = time.time() - start
+
+    stored = len(encoded) if encoded.startswith(swf.constants.COMPRESSED_FIELDS_PREFIX) else 0
+    stored += sum(len(content) for content in store.values())
+    swf.format.JUMBO_FIELDS_MEMORY_CACHE.clear()
+    start = time.time()
+    # compare to resolve the lazy proxy of jumbo fields
+    assert swf.format.decode(encoded) == message
+    decode_time = time.time() - start
+    store.clear()
+    print("{:<16} {:<6} {:>9} {:>9} {:>8.1f}ms {:>8.1f}ms".format(
+        name, compression or "none", len(json_dumps(message)), stored, encode_time * 1000, decode_time * 1000))
+
+
+def main():
+    store = {}
+
+    def push_content(bucket, path, content):
+        store[(bucket, path)] = content
+
+    def pull_content(bucket, path, encoding="utf-8"):
+        content = store[(bucket, path)]
+        return content.decode(encoding) if encoding and isinstance(content, bytes) else content
+
+    print("{:<16} {:<6} {:>9} {:>9} {:>10} {:>10}".format("payload", "comp.", "JSON", "stored", "encode", "decode"))
+    with patch("simpleflow.storage.push_content", push_content), \
+            patch("simpleflow.storage.pull_content", pull_content):
+        for name, message in payloads():
+            for compression in [None] + sorted(swf.format.COMPRESSORS, reverse=True):
+                bench(name, message, compression, store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Cost per decision of scheduling activities with large inputs in one
+decision task, as the number of decisions grows.
+
+Each decision schedules an activity with a 9kB input; the request size
+check of Executor.schedule_task runs for each of them:
+
+    PYTHONPATH=. python extras/benchmarks/schedule_large_decisions.py
+"""
+from __future__ import print_function
+
+import os
+import time
+
+from simpleflow import Workflow, activity
+from simpleflow.swf.executor import Executor
+from simpleflow.swf.task import ActivityTask
+from swf.models import Domain
+
+
+@activity.with_attributes(task_list="benchmark", version="1.0")
+def process(data, i):
+    return i
+
+
+class BenchmarkWorkflow(Workflow):
+    name = "benchmark"
+    version = "1.0"
+    task_list = "benchmark"
+
+
+def bench(executor, nb_decisions, repeat=3):
+    data = "x" * 9000
+    timings = []
+    for _ in range(repeat):
+        executor.reset()
+        tasks = [ActivityTask(process, data, i) for i in range(nb_decisions)]
+        for i, a_task in enumerate(tasks):
+            a_task.id = "process-{}".format(i)
+        start = time.time()
+        for a_task in tasks:
+            executor.schedule_task(a_task)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main():
+    # Nothing is sent to SWF, but models need credentials to be built
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    executor = Executor(Domain("benchmark"), BenchmarkWorkflow)
+    print("{:>10} {:>10} {:>14}".format("decisions", "total", "per decision"))
+    for nb_decisions in [10, 25, 50, 90]:
+        elapsed = bench(executor, nb_decisions)
+        print("{:>10} {:>8.1f}ms {:>12.3f}ms".format(
+            nb_decisions, elapsed * 1000, elapsed * 1000 / nb_decisions))
+
+
+if __name__ == "__main__":
+    main()
@@ -43,6 +43,12 @@ class FuncGroup(SubmittableContainer):
 class Group(SubmittableContainer):
     """
     List of activities running in parallel.
+
+    With ``durations``, a model estimating the duration of each activity like
+    simpleflow.swf.stats.DurationModel, the longest activities are submitted
+    first, which shortens the group when ``max_parallel`` holds some back.
+    The estimates must not change during an execution, except for tasks of
+    different names: task IDs are assigned in submission order.
     """
 
     def __init__(self,
@@ -53,6 +59,7 @@ class Group(SubmittableContainer):
         self.max_parallel = options.pop('max_parallel', None)
         self.raises_on_failure = options.pop('raises_on_failure', None)
         self.bubbles_exception_on_failure = options.pop('bubbles_exception_on_failure', True)
+        self.durations = options.pop('durations', None)
         self.extend(activities)
 
     def append(self, submittable, *args, **kwargs):
@@ -96,7 +103,24 @@ class Group(SubmittableContainer):
 
     def submit(self, executor):
         self.set_workflow_tasks_executor(executor)
-        return GroupFuture(self.activities, executor.workflow, self.max_parallel, self.bubbles_exception_on_failure)
+        return GroupFuture(
+            self.activities,
+            executor.workflow,
+            self.max_parallel,
+            self.bubbles_exception_on_failure,
+            order=self.get_submission_order(),
+        )
+
+    def get_submission_order(self):
+        """
+        Indexes of the activities, longest first if we have their estimated
+        durations; ties keep their declaration order.
+        :rtype: Optional[list[int]]
+        """
+        if self.durations is None:
+            return None
+        estimates = [self.durations.estimate(a) for a in self.activities]
+        return sorted(range(len(self.activities)), key=lambda i: -estimates[i])
 
     def __repr__(self):
         return '<{} at {:#x}, activities={!r}>'.format(self.__class__.__name__, id(self), self.activities)
@@ -121,60 +145,194 @@ class Group(SubmittableContainer):
 
 
 class GroupFuture(futures.Future):
+    """
+    Future of a Group.
+
+    The futures of the activities don't change during a replay, so their
+    states are counted as they are added to ``futures``; the result and
+    exception are only built when read. Futures that can wait, like those of
+    the local executor's pool, are recounted by wait().
 
-    def __init__(self, activities, workflow, max_parallel=None, bubbles_exception_on_failure=True):
+    With an *order*, the activities are submitted in this order of indexes
+    and ``futures`` follows it; the result is in the declaration order.
+    """
+
+    def __init__(self, activities, workflow, max_parallel=None, bubbles_exception_on_failure=True, order=None):
+        self.futures = []
+        self._reset_counts()
         super(GroupFuture, self).__init__()
         self.activities = activities
-        self.futures = []
         self.workflow = workflow
         self.max_parallel = max_parallel
         self.bubbles_exception_on_failure = bubbles_exception_on_failure
+        self.order = order
 
-        for a in self.activities:
-            if not self.max_parallel or self._count_pending_or_running < self.max_parallel:
-                future = workflow.submit(a)
-                self.futures.append(future)
-                if self._count_pending_or_running == self.max_parallel:
-                    break
-
+        self._submit()
         self.sync_state()
         self.sync_result()
 
+    def _submit(self):
+        """
+        Submit the next activities until the parallelism window is full.
+        """
+        order = self.order if self.order is not None else range(len(self.activities))
+        for i in order[len(self.futures):]:
+            if self.max_parallel and self._count_pending_or_running >= self.max_parallel:
+                break
+            self.futures.append(self.workflow.submit(self.activities[i]))
+
+    def _reset_counts(self):
+        self._nb_counted = 0
+        self._nb_finished = 0
+        self._nb_cancelled = 0
+        self._nb_running = 0
+        self._nb_pending = 0
+        # Futures before this index are done
+        self._nb_done = 0
+        self._nb_done_finished = 0
+
+    def _count_futures(self):
+        """
+        Count the states of the futures added since the last call.
+        """
+        if len(self.futures) < self._nb_counted:
+            self._reset_counts()
+        for future in self.futures[self._nb_counted:]:
+            if future.finished:
+                self._nb_finished += 1
+            elif future.cancelled:
+                self._nb_cancelled += 1
+            elif future.running:
+                self._nb_running += 1
+            elif future.pending:
+                self._nb_pending += 1
+        self._nb_counted = len(self.futures)
+
+    def _recount_futures(self):
+        """
+        Count the states of the futures again, after some of them changed.
+        Those known to be done aren't checked again.
+        """
+        while self._nb_done < len(self.futures) and self.futures[self._nb_done].done:
+            if self.futures[self._nb_done].finished:
+                self._nb_done_finished += 1
+            self._nb_done += 1
+        self._nb_counted = self._nb_done
+        self._nb_finished = self._nb_done_finished
+        self._nb_cancelled = self._nb_done - self._nb_done_finished
+        self._nb_running = 0
+        self._nb_pending = 0
+        self._count_futures()
+
+    def wait(self):
+        """
+        Wait for the activities if their futures can, submitting the next
+        ones as they finish; else raise ExecutionBlocked.
+        """
+        while not self.done:
+            self._recount_futures()
+            if self._nb_done < len(self.futures):
+                self.futures[self._nb_done].wait()
+                self._recount_futures()
+            nb_futures = len(self.futures)
+            self._submit()
+            self.sync_state()
+            self.sync_result()
+            if not self.done and self._nb_done == nb_futures == len(self.futures):
+                # Nothing to wait for
+                return super(GroupFuture, self).wait()
+        return self._result
+
     def sync_state(self):
-        if all(a.finished for a in self.futures) and self._futures_contain_all_activities:
+        self._count_futures()
+        if self._nb_finished == len(self.futures) and self._futures_contain_all_activities:
             self._state = futures.FINISHED
-        elif any(a.cancelled for a in self.futures):
+        elif self._nb_cancelled:
             self._state = futures.CANCELLED
-        elif any(a.running for a in self.futures):
+        elif self._nb_running:
             self._state = futures.RUNNING
 
     @property
     def _count_pending_or_running(self):
-        return len([True for f in self.futures if f.pending or f.running])
+        self._count_futures()
+        return self._nb_pending + self._nb_running
 
     @property
     def _futures_contain_all_activities(self):
         return len(self.futures) == len(self.activities)
 
     def sync_result(self):
-        self._result = []
+        """
+        Mark the result and exception as outdated: they are rebuilt from the
+        futures on the next access.
+        """
+        self._result_outdated = True
+        self._exception_outdated = True
+
+    def build_result(self):
+        """
+        Build the result list and the exception from the futures.
+        :return: result list, AggregateException or None
+        :rtype: (list, Optional[AggregateException])
+        """
+        result = []
         exceptions = []
         for future in self.futures:
             if future.finished:
-                self._result.append(future.result)
+                result.append(future.result)
                 if self.bubbles_exception_on_failure is not False:
-                    exception = future.exception
-                    exceptions.append(exception)
+                    exceptions.append(future.exception)
+                else:
+                    exceptions.append(None)
             else:
-                self._result.append(None)
+                result.append(None)
                 exceptions.append(None)
+        if self.order is not None:
+            # Back to the declaration order
+            ordered_result = [None] * len(self.activities)
+            ordered_exceptions = [None] * len(self.activities)
+            for i, value, exception in zip(self.order, result, exceptions):
+                ordered_result[i] = value
+                ordered_exceptions[i] = exception
+            result, exceptions = ordered_result, ordered_exceptions
         if any(ex for ex in exceptions):
-            self._exception = AggregateException(exceptions)
+            return result, AggregateException(exceptions)
+        return result, None
+
+    def _build_outdated(self):
+        result, exception = self.build_result()
+        if self._result_outdated:
+            self._result = result
+        if self._exception_outdated and exception is not None:
+            self._exception = exception
+        self._exception_outdated = False
+
+    @property
+    def _result(self):
+        if self._result_outdated:
+            self._build_outdated()
+        return self.__result
+
+    @_result.setter
+    def _result(self, value):
+        self.__result = value
+        self._result_outdated = False
+
+    @property
+    def _exception(self):
+        if self._exception_outdated:
+            self._build_outdated()
+        return self.__exception
+
+    @_exception.setter
+    def _exception(self, value):
+        self.__exception = value
+        self._exception_outdated = False
 
     @property
     def count_finished_activities(self):
-        return sum(1 if a.finished else 0
-                   for a in self.futures)
+        self._count_futures()
+        return self._nb_finished
 
     def __repr__(self):
         return '<{} at {:#x}, state={state}, exception={exception}, activities={activities}, futures={futures}>'.format(
@@ -187,6 +345,105 @@ class GroupFuture(futures.Future):
         )
 
 
+class ShardedGroup(SubmittableContainer):
+    """
+    Call an activity on each item of a large iterable, like Workflow.map, in
+    child workflows of at most *shard_size* activities. An execution doesn't
+    start more than *shard_size* child workflows either: larger iterables are
+    sharded recursively. This keeps each history small, hence the replays
+    fast and the open activities below the SWF limits.
+
+    The future's result is the list of the activity results, in order; as in
+    a Group, failed activities that don't raise on failure give a None.
+
+    *max_parallel* bounds the number of activities running at the same time
+    across all the child workflows: each level of sharding runs at most
+    *max_parallel* child workflows and splits the budget between them.
+
+    The child workflows are *workflow* executions, ShardWorkflow by default:
+    its type must be registered on SWF. Subclass it to change its version,
+    task list or timeouts.
+
+    :type activity: Activity
+    :type items: list
+    :type shard_size: int
+    :type max_parallel: Optional[int]
+    :type workflow: Optional[type]
+    """
+    def __init__(self, activity, iterable, shard_size=1000, **options):
+        if shard_size < 1:
+            raise ValueError('shard_size must be >= 1')
+        self.activity = activity
+        self.items = list(iterable)
+        self.shard_size = shard_size
+        self.max_parallel = options.pop('max_parallel', None)
+        self.raises_on_failure = options.pop('raises_on_failure', None)
+        self.workflow = options.pop('workflow', None)
+        if options:
+            raise TypeError('ShardedGroup got unexpected options: {}'.format(', '.join(sorted(options))))
+
+    def get_shards(self):
+        """
+        Split the items, in at most *shard_size* shards.
+        :rtype: list[list]
+        """
+        nb_items = len(self.items)
+        nb_shards = min(self.shard_size, (nb_items + self.shard_size - 1) // self.shard_size)
+        size = (nb_items + nb_shards - 1) // nb_shards
+        return [self.items[i:i + size] for i in range(0, nb_items, size)]
+
+    def submit(self, executor):
+        if len(self.items) <= self.shard_size:
+            group = Group(
+                *[ActivityTask(self.activity, item) for item in self.items],
+                max_parallel=self.max_parallel,
+                raises_on_failure=self.raises_on_failure
+            )
+            return group.submit(executor)
+
+        from simpleflow.workflow import ShardWorkflow
+        workflow = self.workflow or ShardWorkflow
+        shards = self.get_shards()
+        max_parallel = shard_max_parallel = None
+        if self.max_parallel is not None:
+            max_parallel = min(self.max_parallel, len(shards))
+            shard_max_parallel = self.max_parallel // max_parallel
+        tasks = [
+            WorkflowTask(
+                executor,
+                workflow,
+                self.activity.name,
+                shard,
+                shard_size=self.shard_size,
+                max_parallel=shard_max_parallel,
+                raises_on_failure=self.raises_on_failure,
+            )
+            for shard in shards
+        ]
+        return ShardedGroupFuture(tasks, executor.workflow, [len(shard) for shard in shards], max_parallel)
+
+    def propagate_attribute(self, attr, val):
+        setattr(self, attr, val)
+
+
+class ShardedGroupFuture(GroupFuture):
+    """
+    Future of the child workflows of a ShardedGroup; its result is the
+    concatenation of theirs, with None for each item of the unfinished ones.
+    """
+    def __init__(self, activities, workflow, shard_sizes, max_parallel=None):
+        self.shard_sizes = shard_sizes
+        super(ShardedGroupFuture, self).__init__(activities, workflow, max_parallel)
+
+    def build_result(self):
+        shard_results, exception = super(ShardedGroupFuture, self).build_result()
+        result = []
+        for i, size in enumerate(self.shard_sizes):
+            shard_result = shard_results[i] if i < len(shard_results) else None
+            result.extend(shard_result if shard_result is not None else [None] * size)
+        return result, exception
+
+
 class Chain(Group):
     """
     Chain a list of `ActivityTask` or callables returning Group/Chain
@@ -225,15 +482,37 @@ class ChainFuture(GroupFuture):
         self.activities = activities
         self.workflow = workflow
         self.bubbles_exception_on_failure = bubbles_exception_on_failure
+        self.futures = []
+        self._reset_counts()
+        self.order = None
         self._state = futures.PENDING
         self._result = None
         self._exception = None
-        self.futures = []
         self._has_failed = False
+        self.send_result = send_result
+        self.break_on_failure = break_on_failure
 
+        self._submit()
+        self.sync_state()
+        self.sync_result()
+
+    def _submit(self):
+        """
+        Submit the next activities while the previous one is finished.
+        """
         previous_result = None
-        for i, a in enumerate(self.activities):
-            if send_result and i > 0:
+        if self.futures:
+            previous = self.futures[-1]
+            if self._has_failed or not previous.finished:
+                return
+            if previous.exception and self.break_on_failure:
+                self._has_failed = True
+                return
+            previous_result = previous.result
+
+        for i in range(len(self.futures), len(self.activities)):
+            a = self.activities[i]
+            if self.send_result and i > 0:
                 if isinstance(a, ActivityTask):
                     # ActivityTask.args is ignored when building swf.ActivityTask (#247)
                     args = a.args + [previous_result]
@@ -241,23 +520,21 @@ class ChainFuture(GroupFuture):
                 else:
                     a.args.append(previous_result)
 
-            future = workflow.submit(a)
+            future = self.workflow.submit(a)
             self.futures.append(future)
             if not future.finished:
                 break
-            if future.exception and break_on_failure:
+            if future.exception and self.break_on_failure:
                 # End this chain
                 self._has_failed = True
                 break
             previous_result = future.result
 
-        self.sync_state()
-        self.sync_result()
-
     def sync_state(self):
-        if all(a.finished for a in self.futures) and (self._futures_contain_all_activities or self._has_failed):
+        self._count_futures()
+        if self._nb_finished == len(self.futures) and (self._futures_contain_all_activities or self._has_failed):
             self._state = futures.FINISHED
-        elif any(a.cancelled for a in self.futures):
+        elif self._nb_cancelled:
             self._state = futures.CANCELLED
-        elif any(a.running for a in self.futures):
+        elif self._nb_running:
             self._state = futures.RUNNING
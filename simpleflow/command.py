@@ -139,6 +139,13 @@ def transform_input(wf_input):
     return wf_input
 
 
+@click.option('--local-pool-type', default='thread',
+              type=click.Choice(['thread', 'process']),
+              required=False,
+              help='Kind of pool of --local-pool-size (default=thread).')
+@click.option('--local-pool-size', type=int,
+              required=False,
+              help='With --local, run up to N activities at once.')
 @click.option('--local', default=False, is_flag=True,
               required=False,
               help='Run the workflow locally without calling Amazon SWF.')
@@ -179,7 +186,9 @@ def start_workflow(workflow,
                    decision_tasks_timeout,
                    input,
                    input_file,
-                   local):
+                   local,
+                   local_pool_size=None,
+                   local_pool_type='thread'):
     workflow_class = get_workflow(workflow)
 
     wf_input = get_or_load_input(input_file, input)
@@ -187,7 +196,7 @@ def start_workflow(workflow,
     if local:
         from .local import Executor
 
-        Executor(workflow_class).run(wf_input)
+        Executor(workflow_class, pool_size=local_pool_size, pool_type=local_pool_type).run(wf_input)
 
         return
 
@@ -366,6 +375,41 @@ def task_info(ctx, domain, workflow_id, task_id, details):
     print(with_format(ctx)(helpers.get_task)(domain, workflow_id, task_id, details))
 
 
+@click.option('--preload',
+              multiple=True,
+              help='Import this module before forking the decider processes (repeatable); '
+                   'the modules of the workflows are always imported.')
+@click.option('--result-cache-size-limit',
+              type=int,
+              required=False,
+              help='Max size of a disk result cache, in MB.')
+@click.option('--result-cache-ttl',
+              type=int,
+              required=False,
+              help='Drop cached results after N seconds.')
+@click.option('--result-cache',
+              required=False,
+              help='Complete idempotent activities with the results cached in this directory or '
+                   's3://<bucket>[/<prefix>].')
+@click.option('--history-checkpoints',
+              is_flag=True,
+              help='Save parsed histories on disk and only fetch the new events of each decision task.')
+@click.option('--pool-max-rss',
+              type=int,
+              required=False,
+              help='Recycle a decision process when its RSS exceeds N MB.')
+@click.option('--pool-max-decisions',
+              type=int,
+              required=False,
+              help='Recycle a decision process after N decisions.')
+@click.option('--pool-size',
+              type=int,
+              required=False,
+              help='Take decisions in N long-lived processes instead of forking for each one.')
+@click.option('--history-cache-size',
+              type=int,
+              required=False,
+              help='Keep the parsed histories of up to N executions between decision tasks.')
 @click.option('--nb-processes', '-N', type=int)
 @click.option('--log-level', '-l')
 @click.option('--task-list')
@@ -375,7 +419,9 @@ def task_info(ctx, domain, workflow_id, task_id, details):
               help='SWF Domain')
 @click.argument('workflows', nargs=-1, required=True)
 @cli.command('decider.start', help='Start a decider process to manage workflow executions.')
-def start_decider(workflows, domain, task_list, log_level, nb_processes):
+def start_decider(workflows, domain, task_list, log_level, nb_processes, history_cache_size,
+                  pool_size, pool_max_decisions, pool_max_rss, history_checkpoints,
+                  result_cache, result_cache_ttl, result_cache_size_limit, preload):
     if log_level:
         logger.warning(
             "Deprecated: --log-level will be removed, use LOG_LEVEL environment variable instead"
@@ -386,6 +432,15 @@ def start_decider(workflows, domain, task_list, log_level, nb_processes):
         task_list,
         None,
         nb_processes,
+        history_cache_size=history_cache_size,
+        pool_size=pool_size,
+        pool_max_decisions=pool_max_decisions,
+        pool_max_rss=pool_max_rss * 1024 * 1024 if pool_max_rss else None,
+        history_checkpoints=history_checkpoints,
+        result_cache=result_cache,
+        result_cache_expire=result_cache_ttl,
+        result_cache_size_limit=result_cache_size_limit * 1024 * 1024 if result_cache_size_limit else None,
+        preload=preload,
     )
 
 
@@ -397,6 +452,29 @@ def start_decider(workflows, domain, task_list, log_level, nb_processes):
               default='local',
               help='Whether to process the task locally or in a Kubernetes job (default=local)',
               )
+@click.option('--preload',
+              multiple=True,
+              help='Import this module, e.g. the module of the activities, before forking the worker '
+                   'processes (repeatable).')
+@click.option('--executor-max-rss',
+              type=int,
+              required=False,
+              help='Recycle a warm executor when its RSS exceeds N MB.')
+@click.option('--executor-max-tasks',
+              type=int,
+              required=False,
+              help='Recycle a warm executor after N tasks.')
+@click.option('--warm-executor',
+              is_flag=True,
+              help='Process tasks in a long-lived process instead of forking for each one.')
+@click.option('--heartbeat-rate',
+              type=float,
+              required=False,
+              help='Max heartbeats per second sent by each worker process (with --concurrency).')
+@click.option('--concurrency',
+              type=int,
+              required=False,
+              help='Keep up to N tasks in flight in each worker process (default=1).')
 @click.option('--one-task',
               is_flag=True,
               help='Run only one task and shut down (no supervisor).')
@@ -413,7 +491,8 @@ def start_decider(workflows, domain, task_list, log_level, nb_processes):
               required=True,
               help='SWF Domain')
 @cli.command('worker.start', help='Start a worker process to handle activity tasks.')
-def start_worker(domain, task_list, log_level, nb_processes, heartbeat, one_task, process_mode, poll_data):
+def start_worker(domain, task_list, log_level, nb_processes, heartbeat, one_task, process_mode, poll_data,
+                 concurrency, heartbeat_rate, warm_executor, executor_max_tasks, executor_max_rss, preload):
     if log_level:
         logger.warning(
             "Deprecated: --log-level will be removed, use LOG_LEVEL environment variable instead"
@@ -435,6 +514,12 @@ def start_worker(domain, task_list, log_level, nb_processes, heartbeat, one_task
         one_task,
         process_mode,
         poll_data,
+        concurrency=concurrency,
+        heartbeat_rate=heartbeat_rate,
+        warm_executor=warm_executor,
+        executor_max_tasks=executor_max_tasks,
+        executor_max_rss=executor_max_rss * 1024 * 1024 if executor_max_rss else None,
+        preload=preload,
     )
 
 
@@ -601,6 +686,7 @@ def standalone(context,
     worker_proc.start()
 
     print('starting workflow {}'.format(workflow), file=sys.stderr)
+    start_time = time.time()
     ex = start_workflow.callback(
         workflow,
         domain,
@@ -626,6 +712,12 @@ def standalone(context,
             print('execution {} finished'.format(ex.workflow_id), file=sys.stderr)
             break
 
+    if previous_history is not None:
+        events = previous_history.events
+        previous_duration = (events[-1].timestamp - events[0].timestamp).total_seconds()
+        logger.info('repair took {:.1f}s, the repaired execution ran for {:.1f}s'.format(
+            time.time() - start_time, previous_duration))
+
     os.kill(worker_proc.pid, signal.SIGTERM)
     worker_proc.join()
     os.kill(decider_proc.pid, signal.SIGTERM)
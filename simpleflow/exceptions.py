@@ -69,6 +69,22 @@ class TaskTerminated(Exception):
     pass
 
 
+class ContinueAsNew(Exception):
+    """
+    Close the workflow execution and start a new run of it, with the same
+    workflow ID, called with these arguments.
+
+    :ivar input: input of the new run
+    :type input: dict[str, Any]
+    """
+    def __init__(self, *args, **kwargs):
+        super(ContinueAsNew, self).__init__()
+        self.input = {
+            'args': args,
+            'kwargs': kwargs,
+        }
+
+
 class AggregateException(Exception):
     """
     Class containing a list of exceptions.
@@ -1,8 +1,17 @@
 from __future__ import absolute_import, print_function
 
+import atexit
+import collections
+import fcntl
+import io
+import json
+import mmap
 import os
+import select
+import shutil
+import stat
 import sys
-
+import threading
 import time
 
 import psutil
@@ -22,9 +31,11 @@ from builtins import map
 from future.utils import iteritems
 
 from swf import format
+from swf.constants import JUMBO_FIELDS_MAX_SIZE
 from simpleflow import compat
 from simpleflow.exceptions import ExecutionError, ExecutionTimeoutError
-from simpleflow.utils import json_dumps
+from simpleflow.process.watcher import ProcessWatcher
+from simpleflow.utils import json_dump, json_dumps
 
 __all__ = ['program', 'python']
 
@@ -154,13 +165,14 @@ def wait_subprocess(process, timeout=None, command_info=None):
         :rtype: int.
     """
     if timeout:
-        t_start = time.time()
-        rc = process.poll()
-        while time.time() - t_start < timeout and rc is None:
-            time.sleep(1)
-            rc = process.poll()
-
-        if rc is None:
+        watcher = ProcessWatcher()
+        watcher.add(process)
+        try:
+            exited, _ = watcher.wait(timeout)
+        finally:
+            watcher.close()
+
+        if not exited:
             try:
                 process.terminate()  # send SIGTERM
             except OSError as e:
@@ -170,11 +182,354 @@ def wait_subprocess(process, timeout=None, command_info=None):
                 else:
                     raise
             raise ExecutionTimeoutError(command=command_info, timeout_value=timeout)
-        return rc
     return process.wait()
 
 
-def python(interpreter='python', logger_name=__name__, timeout=None, kill_children=False):
+def decode_result(result_str, logger):
+    """
+    Decode the JSON result of a callable executed by `python`.
+
+    :param result_str:
+    :type result_str: str
+    :param logger:
+    :type logger: logging.Logger
+    :return: the result, None if empty or invalid
+    :rtype: Any
+    """
+    if not result_str:
+        return None
+    try:
+        return format.decode(result_str)
+    except BaseException as ex:
+        logger.exception('Exception in python.execute: {} {}'.format(ex.__class__.__name__, ex))
+        logger.warning('%r', result_str)
+
+
+def load_result(result_file, logger):
+    """
+    Decode the result file written by `main`. The file is memory-mapped and
+    decoded from the mapping, without reading it into an intermediate buffer.
+    An offloaded result is only its jumbo field signature, decoded into a
+    lazy proxy that is not downloaded unless used.
+
+    :param result_file:
+    :type result_file: file
+    :param logger:
+    :type logger: logging.Logger
+    :return: the result, None if empty or invalid
+    :rtype: Any
+    """
+    size = os.fstat(result_file.fileno()).st_size
+    if not size:
+        return None
+    mapping = mmap.mmap(result_file.fileno(), size, access=mmap.ACCESS_READ)
+    try:
+        if compat.PY2:
+            result_str = mapping[:]
+        else:
+            result_str = str(mapping, 'utf-8', 'replace')
+    finally:
+        mapping.close()
+    return decode_result(result_str, logger)
+
+
+def write_result(result, fd, offload_threshold=None):
+    """
+    Write the JSON result of a callable to *fd* as it is encoded, instead of
+    encoding it in memory first.
+
+    If *fd* is a regular file, the result is longer than *offload_threshold*
+    (but fits in a jumbo field) and a jumbo fields bucket is configured, the
+    result is pushed to the bucket and replaced by its jumbo field signature
+    in the file.
+
+    :param result:
+    :type result: Any
+    :param fd:
+    :type fd: int
+    :param offload_threshold: in bytes
+    :type offload_threshold: Optional[int]
+    """
+    can_offload = (
+        offload_threshold is not None and
+        fd != 1 and
+        stat.S_ISREG(os.fstat(fd).st_mode) and
+        format._jumbo_fields_bucket()
+    )
+    start = os.lseek(fd, 0, os.SEEK_CUR) if can_offload else 0
+
+    # Text file on a duplicate of fd: closing it leaves fd open.
+    if compat.PY2:
+        result_file = os.fdopen(os.dup(fd), 'w')
+    else:
+        result_file = io.open(os.dup(fd), 'w', encoding='utf-8')
+    with result_file:
+        json_dump(result, result_file)
+
+    if not can_offload:
+        return
+    size = os.fstat(fd).st_size - start
+    if size <= offload_threshold or size > JUMBO_FIELDS_MAX_SIZE:
+        return
+    with os.fdopen(os.dup(fd), 'rb') as content:
+        content.seek(start)
+        signature = format.push_jumbo_file(content, size)
+    os.ftruncate(fd, start)
+    os.lseek(fd, start, os.SEEK_SET)
+    os.write(fd, signature.encode('utf-8'))
+
+
+class InterpreterServer(object):
+    """
+    Long-lived interpreter executing callables on request, see `serve`.
+
+    Requests and responses are JSON lines sent over two pipes; a result
+    follows its response line as is. stdout and stderr are left to the
+    callables.
+
+    :ivar command: command line of the server
+    :type command: list[str]
+    :ivar calls: number of calls processed
+    :type calls: int
+    """
+    #: Seconds given to the server to exit when closed before it is killed
+    close_timeout = 5
+
+    def __init__(self, interpreter):
+        request_r, request_w = os.pipe()
+        response_r, response_w = os.pipe()
+        self.command = [
+            interpreter, '-m', 'simpleflow.execute', '--serve',
+            '--request-fd={}'.format(request_r),
+            '--response-fd={}'.format(response_w),
+        ]
+        # Our ends must not leak into the server or it never sees EOF.
+        for fd in (request_w, response_r):
+            fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+        if compat.PY2:  # close_fds doesn't work with python2 (using its C _posixsubprocess helper)
+            close_fds = False
+            pass_fds = ()
+        else:
+            close_fds = True
+            pass_fds = (request_r, response_w)
+        self.process = subprocess.Popen(
+            self.command,
+            close_fds=close_fds,
+            pass_fds=pass_fds,
+        )
+        os.close(request_r)
+        os.close(response_w)
+        self._requests = os.fdopen(request_w, 'wb')
+        self._responses_fd = response_r
+        self._buffer = bytearray()
+        self.calls = 0
+
+    def call(self, funcname, funcargs, logger_name=None, timeout=None, kill_children=False,
+             offload_threshold=None):
+        """
+        Execute a callable.
+
+        The server is terminated on timeout and must be closed if this raises.
+
+        :param funcname: name of the callable
+        :type funcname: str
+        :param funcargs: arguments of the callable, in JSON
+        :type funcargs: str
+        :param logger_name:
+        :type logger_name: Optional[str]
+        :param timeout: timeout after this many seconds
+        :type timeout: Optional[int]
+        :param kill_children: kill the child processes of the callable
+        :type kill_children: bool
+        :param offload_threshold: offload results longer than this many bytes, see `write_result`
+        :type offload_threshold: Optional[int]
+        :return: the response: {"result": <JSON result>} or {"error": <JSON error details>}
+        :rtype: dict[str, str]
+        """
+        request = json_dumps({
+            'funcname': funcname,
+            'funcargs': funcargs,
+            'logger_name': logger_name,
+            'kill_children': kill_children,
+            'offload_threshold': offload_threshold,
+        })
+        try:
+            self._requests.write(request.encode('utf-8') + b'\n')
+            self._requests.flush()
+        except (IOError, OSError):
+            raise ExecutionError('interpreter server exited with code {}'.format(self.process.wait()))
+
+        response = self._read_response(timeout)
+        if response is None:
+            self.process.terminate()
+            raise ExecutionTimeoutError(command=self.command + [funcname, funcargs], timeout_value=timeout)
+        if not response:
+            raise ExecutionError('interpreter server exited with code {}'.format(self.process.wait()))
+        self.calls += 1
+        return response
+
+    def _read_response(self, timeout=None):
+        """
+        Read a response line and the *result_size* bytes of JSON result that
+        follow it, if any. A response written in several chunks doesn't
+        extend the timeout.
+
+        :param timeout: seconds
+        :type timeout: Optional[int]
+        :return: the response, {} if the server exited, None on timeout
+        :rtype: Optional[dict[str, str]]
+        """
+        deadline = time.time() + timeout if timeout else None
+        while b'\n' not in self._buffer:
+            chunk = self._read_chunk(deadline)
+            if not chunk:
+                return None if chunk is None else {}
+        line_size = self._buffer.index(b'\n') + 1
+        response = json.loads(self._buffer[:line_size].decode('utf-8'))
+        size = response.pop('result_size', 0)
+        while len(self._buffer) < line_size + size:
+            chunk = self._read_chunk(deadline)
+            if not chunk:
+                return None if chunk is None else {}
+
+        del self._buffer[:line_size]
+        if size:
+            if len(self._buffer) == size:
+                # Usual case, the server waits for the next request: don't copy the result
+                result, self._buffer = self._buffer, bytearray()
+            else:
+                result = self._buffer[:size]
+                del self._buffer[:size]
+            response['result'] = result.decode('utf-8')
+        return response
+
+    def _read_chunk(self, deadline=None):
+        """
+        Append what the server wrote to the buffer.
+
+        :param deadline: give up at this time
+        :type deadline: Optional[float]
+        :return: the chunk read, b'' if the server exited, None on timeout
+        :rtype: Optional[bytes]
+        """
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not select.select([self._responses_fd], [], [], remaining)[0]:
+                return None
+        chunk = os.read(self._responses_fd, 65536)
+        self._buffer += chunk
+        return chunk
+
+    def close(self, timeout=None):
+        """
+        Stop the server: it exits on EOF once idle. It is killed if it is
+        still running after *timeout* seconds (default: `close_timeout`).
+
+        :param timeout: seconds
+        :type timeout: Optional[float]
+        """
+        try:
+            self._requests.close()
+        except (IOError, OSError):
+            pass
+        os.close(self._responses_fd)
+
+        watcher = ProcessWatcher()
+        watcher.add(self.process)
+        try:
+            exited, _ = watcher.wait(self.close_timeout if timeout is None else timeout)
+        finally:
+            watcher.close()
+        if not exited:
+            self.process.kill()
+        self.process.wait()
+
+
+class InterpreterPool(object):
+    """
+    Idle interpreter servers, by interpreter and module of the callable:
+    calls to the same module reuse a server where it is already imported.
+    Concurrent calls each get their own server.
+
+    Servers inherited through a fork are left to the parent.
+    """
+    def __init__(self):
+        self._idle = collections.defaultdict(list)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _acquire(self, key):
+        if self._pid != os.getpid():
+            self._idle = collections.defaultdict(list)
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+        with self._lock:
+            if self._idle[key]:
+                return self._idle[key].pop()
+        return InterpreterServer(key[0])
+
+    def _release(self, key, server):
+        with self._lock:
+            self._idle[key].append(server)
+
+    def call(self, interpreter, funcname, funcargs, logger_name=None, timeout=None, kill_children=False,
+             max_calls=None, offload_threshold=None):
+        """
+        Execute a callable in a server.
+
+        :param interpreter:
+        :type interpreter: str
+        :param funcname: name of the callable
+        :type funcname: str
+        :param funcargs: arguments of the callable, in JSON
+        :type funcargs: str
+        :param logger_name:
+        :type logger_name: Optional[str]
+        :param timeout: timeout after this many seconds
+        :type timeout: Optional[int]
+        :param kill_children: kill the child processes of the callable
+        :type kill_children: bool
+        :param max_calls: replace the server after this many calls
+        :type max_calls: Optional[int]
+        :param offload_threshold: offload results longer than this many bytes, see `write_result`
+        :type offload_threshold: Optional[int]
+        :return: the JSON result
+        :rtype: str
+        """
+        key = (interpreter, funcname.rsplit('.', 1)[0])
+        server = self._acquire(key)
+        try:
+            response = server.call(funcname, funcargs, logger_name, timeout, kill_children, offload_threshold)
+        except Exception:
+            server.close()
+            raise
+        if max_calls and server.calls >= max_calls:
+            server.close()
+        else:
+            self._release(key, server)
+        if 'error' in response:
+            raise ExecutionError(response['error'])
+        return response['result']
+
+    def close(self):
+        """
+        Stop the idle servers.
+        """
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            servers = [server for servers in self._idle.values() for server in servers]
+            self._idle.clear()
+        for server in servers:
+            server.close()
+
+
+interpreter_pool = InterpreterPool()
+atexit.register(interpreter_pool.close)
+
+
+def python(interpreter='python', logger_name=__name__, timeout=None, kill_children=False,
+           persistent=False, max_calls=None, offload_threshold=None):
     """
     Execute a callable as an external Python program.
 
@@ -183,6 +538,16 @@ def python(interpreter='python', logger_name=__name__, timeout=None, kill_childr
 
     Arguments of the decorated callable must be serializable in JSON.
 
+    With *persistent*, calls are sent to a long-lived interpreter per
+    interpreter and module instead of starting one per call, see
+    `InterpreterPool`; it is replaced after *max_calls* calls.
+
+    Results longer than *offload_threshold* bytes are pushed to the jumbo
+    fields bucket by the interpreter, if one is configured: the call then
+    returns a lazy proxy downloading them on first use, see `write_result`.
+    An activity returning it as is completes with the same jumbo field.
+    A persistent interpreter sends the signature back instead of the result.
+
     """
 
     def wrap_callable(func):
@@ -192,7 +557,18 @@ def python(interpreter='python', logger_name=__name__, timeout=None, kill_childr
             command = 'simpleflow.execute'  # name of a module.
             sys.stdout.flush()
             sys.stderr.flush()
-            result_str = None  # useless
+            if persistent:
+                result_str = interpreter_pool.call(
+                    interpreter,
+                    get_name(func),
+                    format_arguments_json(*args, **kwargs),
+                    logger_name=logger_name,
+                    timeout=timeout,
+                    kill_children=kill_children,
+                    max_calls=max_calls,
+                    offload_threshold=offload_threshold,
+                )
+                return decode_result(result_str, logger)
             with tempfile.TemporaryFile() as result_fd, tempfile.TemporaryFile() as error_fd:
                 dup_result_fd = os.dup(result_fd.fileno())  # remove FD_CLOEXEC
                 dup_error_fd = os.dup(error_fd.fileno())  # remove FD_CLOEXEC
@@ -206,6 +582,8 @@ def python(interpreter='python', logger_name=__name__, timeout=None, kill_childr
                 ]
                 if kill_children:
                     full_command.append('--kill-children')
+                if offload_threshold is not None:
+                    full_command.append('--offload-threshold={}'.format(offload_threshold))
                 if compat.PY2:  # close_fds doesn't work with python2 (using its C _posixsubprocess helper)
                     close_fds = False
                     pass_fds = ()
@@ -229,19 +607,7 @@ def python(interpreter='python', logger_name=__name__, timeout=None, kill_childr
                             err_output = err_output.decode('utf-8', errors='replace')
                     raise ExecutionError(err_output)
 
-                result_fd.seek(0)
-                result_str = result_fd.read()
-
-            if not result_str:
-                return None
-            try:
-                if not compat.PY2:
-                    result_str = result_str.decode('utf-8', errors='replace')
-                result = format.decode(result_str)
-                return result
-            except BaseException as ex:
-                logger.exception('Exception in python.execute: {} {}'.format(ex.__class__.__name__, ex))
-                logger.warning('%r', result_str)
+                return load_result(result_fd, logger)
 
         # Not automatically assigned in python < 3.2.
         execute.__wrapped__ = func
@@ -345,6 +711,104 @@ def make_callable(funcname):
     return callable_
 
 
+def kill_child_processes():
+    """
+    Terminate, then kill, the child processes of the current process.
+    """
+    process = psutil.Process(os.getpid())
+    children = process.children(recursive=True)
+
+    for child in children:
+        try:
+            child.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, still_alive = psutil.wait_procs(children, timeout=0.3)
+    for child in still_alive:
+        try:
+            child.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+
+def call_callable(funcname, arguments):
+    """
+    Call a callable, or execute a class with an `execute` method.
+
+    :param funcname: name of the callable
+    :type funcname: str
+    :param arguments: {"args": [...], "kwargs": {...}}
+    :type arguments: dict
+    :return: the result
+    :rtype: Any
+    """
+    callable_ = make_callable(funcname)
+    if hasattr(callable_, '__wrapped__'):
+        callable_ = callable_.__wrapped__
+    args = arguments.get('args', ())
+    kwargs = arguments.get('kwargs', {})
+    if hasattr(callable_, 'execute'):
+        return callable_(*args, **kwargs).execute()
+    return callable_(*args, **kwargs)
+
+
+def format_error():
+    """
+    JSON details of the exception being handled.
+
+    :rtype: str
+    """
+    exc_type, exc_value, exc_traceback = sys.exc_info()
+    tb = traceback.format_tb(exc_traceback)
+    return json_dumps(
+        {
+            'error': exc_type.__name__,
+            'message': str(exc_value),
+            'traceback': tb,
+        },
+        default=repr,
+    )
+
+
+def serve(request_fd, response_fd):
+    """
+    Execute the callables requested on *request_fd* until EOF, see
+    `InterpreterServer`. Modules stay imported between calls.
+
+    Results are written by `write_result` to a temporary file, then copied
+    after the response line, so that they are neither encoded in memory nor
+    escaped in it.
+
+    :param request_fd: JSON lines: {"funcname", "funcargs", "logger_name", "kill_children", "offload_threshold"}
+    :type request_fd: int
+    :param response_fd: JSON lines: {"result_size": <int>} followed by the JSON result,
+    or {"error": <JSON error details>}
+    :type response_fd: int
+    """
+    requests = os.fdopen(request_fd, 'rb')
+    responses = os.fdopen(response_fd, 'wb')
+    for line in iter(requests.readline, b''):
+        request = json.loads(line.decode('utf-8'))
+        logger = logging.getLogger(request['logger_name'] or __name__)
+        with tempfile.TemporaryFile() as result_file:
+            try:
+                result = call_callable(request['funcname'], format.decode(request['funcargs']))
+                write_result(result, result_file.fileno(), request['offload_threshold'])
+                response = {'result_size': os.fstat(result_file.fileno()).st_size}
+            except Exception as err:
+                logger.error('Exception: {}'.format(err))
+                response = {'error': format_error()}
+            sys.stdout.flush()
+            sys.stderr.flush()
+            if request['kill_children']:
+                kill_child_processes()
+            responses.write(json_dumps(response).encode('utf-8') + b'\n')
+            if 'result_size' in response:
+                result_file.seek(0)
+                shutil.copyfileobj(result_file, responses)
+        responses.flush()
+
+
 def main():
     """
     When executed as a script, this module expects the name of a callable as
@@ -387,10 +851,12 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         'funcname',
+        nargs='?',
         help='name of the callable to execute',
     )
     parser.add_argument(
         'funcargs',
+        nargs='?',
         help='callable arguments in JSON',
     )
     parser.add_argument(
@@ -416,23 +882,38 @@ def main():
         action='store_true',
         help='kill child processes on exit',
     )
+    parser.add_argument(
+        '--offload-threshold',
+        type=int,
+        metavar='N',
+        help='push results longer than N bytes to the jumbo fields bucket',
+    )
+    parser.add_argument(
+        '--serve',
+        action='store_true',
+        help='execute the callables requested on --request-fd',
+    )
+    parser.add_argument(
+        '--request-fd',
+        type=int,
+        default=0,
+        metavar='N',
+        help='request file descriptor (with --serve)',
+    )
+    parser.add_argument(
+        '--response-fd',
+        type=int,
+        default=1,
+        metavar='N',
+        help='response file descriptor (with --serve)',
+    )
     cmd_arguments = parser.parse_args()
 
-    def kill_child_processes():
-        process = psutil.Process(os.getpid())
-        children = process.children(recursive=True)
-
-        for child in children:
-            try:
-                child.terminate()
-            except psutil.NoSuchProcess:
-                pass
-        _, still_alive = psutil.wait_procs(children, timeout=0.3)
-        for child in still_alive:
-            try:
-                child.kill()
-            except psutil.NoSuchProcess:
-                pass
+    if cmd_arguments.serve:
+        serve(cmd_arguments.request_fd, cmd_arguments.response_fd)
+        return
+    if cmd_arguments.funcname is None or cmd_arguments.funcargs is None:
+        parser.error('funcname and funcargs are required')
 
     funcname = cmd_arguments.funcname
     try:
@@ -444,28 +925,11 @@ def main():
         logger = logging.getLogger(cmd_arguments.logger_name)
     else:
         logger = logging.getLogger(__name__)
-    callable_ = make_callable(funcname)
-    if hasattr(callable_, '__wrapped__'):
-        callable_ = callable_.__wrapped__
-    args = arguments.get('args', ())
-    kwargs = arguments.get('kwargs', {})
     try:
-        if hasattr(callable_, 'execute'):
-            result = callable_(*args, **kwargs).execute()
-        else:
-            result = callable_(*args, **kwargs)
+        result = call_callable(funcname, arguments)
     except Exception as err:
         logger.error('Exception: {}'.format(err))
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        tb = traceback.format_tb(exc_traceback)
-        details = json_dumps(
-            {
-                'error': exc_type.__name__,
-                'message': str(exc_value),
-                'traceback': tb,
-            },
-            default=repr,
-        )
+        details = format_error()
         if cmd_arguments.error_fd == 2:
             sys.stderr.flush()
         if not compat.PY2:
@@ -478,10 +942,7 @@ def main():
     if cmd_arguments.result_fd == 1:  # stdout (legacy)
         sys.stdout.flush()  # may have print's in flight
         os.write(cmd_arguments.result_fd, b'\n')
-    result = json_dumps(result)
-    if not compat.PY2:
-        result = result.encode('utf-8')
-    os.write(cmd_arguments.result_fd, result)
+    write_result(result, cmd_arguments.result_fd, cmd_arguments.offload_threshold)
     if cmd_arguments.kill_children:
         kill_child_processes()
 
@@ -2,6 +2,7 @@ import abc
 import logging
 
 from ._decorators import deprecated
+from .exceptions import ContinueAsNew
 
 if False:
     from typing import Type
@@ -135,6 +136,33 @@ class Executor(object):
         """
         pass
 
+    def continue_as_new(self, *args, **kwargs):
+        """
+        Explicitly closes the workflow and starts a new run of it, called with
+        *args* and *kwargs*.
+
+        :raise: exceptions.ContinueAsNew
+        """
+        raise ContinueAsNew(*args, **kwargs)
+
+    def get_history(self):
+        """
+        Parsed history of the execution so far, for
+        continue_as_new_if_needed(). None if the executor doesn't keep one.
+
+        :rtype: Optional[simpleflow.history.History]
+        """
+        return None
+
+    def continue_as_new_if_needed(self, *args, **kwargs):
+        """
+        Continues as new if the history of the execution is too large, see
+        Workflow.should_continue_as_new. Never happens without a history.
+        """
+        history = self.get_history()
+        if history is not None and self._workflow.should_continue_as_new(history):
+            self.continue_as_new(*args, **kwargs)
+
     def before_replay(self):
         pass
 
@@ -1,5 +1,16 @@
 import collections
 import logging
+import os
+import pickle
+from sqlite3 import OperationalError
+
+from diskcache import Cache
+
+from simpleflow.constants import DAY, SIMPLEFLOW_ENV
+from simpleflow.utils import json_dumps
+from swf import constants
+from swf.models.event import EventFactory
+from swf.models.history import History as SWFHistory
 
 logger = logging.getLogger(__name__)
 
@@ -23,12 +34,35 @@ class History(object):
     :type _signals: collections.OrderedDict[str, dict[str, Any]]
     :ivar _markers: marker events
     :type _markers: collections.OrderedDict[str, list[dict[str, Any]]]
+    :ivar _recorded_markers: last recorded marker by (name, details)
+    :type _recorded_markers: dict[(str, Optional[str]), dict[str, Any]]
+    :ivar _last_recorded_markers: last recorded marker by name
+    :type _last_recorded_markers: dict[str, dict[str, Any]]
+    :ivar _signaled_workflows_index: first signaled workflow by (signal name, workflow ID, run ID);
+        also indexed with a None run ID
+    :type _signaled_workflows_index: dict[(str, str, Optional[str]), dict[str, Any]]
     :ivar _timers: timer events
     :type _timers: dict[str, dict[str, Any]]]
     :ivar _tasks: ordered list of tasks/etc
     :type _tasks: list[dict[str, Any]]
+    :ivar _last_event_id: ID of the last event processed by parse()
+    :type _last_event_id: int
+    :ivar _size: serialized size of the events up to _sized_event_id
+    :type _size: int
+    :ivar _checkpoint_event_id: last event ID of the checkpoint it was
+        restored from; the events up to it are None unless they were saved
+    :type _checkpoint_event_id: int
     """
 
+    # No event refers to the scheduled or initiated event of a task after
+    # these states.
+    CLOSED_ACTIVITY_STATES = frozenset([
+        'schedule_failed', 'completed', 'failed', 'timed_out', 'cancelled',
+    ])
+    CLOSED_CHILD_WORKFLOW_STATES = frozenset([
+        'start_failed', 'completed', 'failed', 'timed_out', 'canceled', 'terminated',
+    ])
+
     def __init__(self, history):
         self._history = history
         self._activities = collections.OrderedDict()
@@ -38,12 +72,19 @@ class History(object):
         self._signals = collections.OrderedDict()
         self._signaled_workflows = collections.defaultdict(list)
         self._markers = collections.OrderedDict()
+        self._recorded_markers = {}
+        self._last_recorded_markers = {}
+        self._signaled_workflows_index = {}
         self._timers = {}
         self._tasks = []
         self._cancel_requested = None
         self._cancel_failed = None
         self.started_decision_id = None
         self.completed_decision_id = None
+        self._last_event_id = 0
+        self._size = 0
+        self._sized_event_id = 0
+        self._checkpoint_event_id = 0
 
     @property
     def swf_history(self):
@@ -135,6 +176,43 @@ class History(object):
         """
         return self._markers
 
+    def find_recorded_marker(self, name, details):
+        """
+        Last marker recorded with this name and (JSON) details.
+
+        :param name:
+        :type name: str
+        :param details:
+        :type details: Optional[str]
+        :rtype: Optional[dict[str, Any]]
+        """
+        return self._recorded_markers.get((name, details))
+
+    def find_last_recorded_marker(self, name):
+        """
+        Last marker recorded with this name.
+
+        :param name:
+        :type name: str
+        :rtype: Optional[dict[str, Any]]
+        """
+        return self._last_recorded_markers.get(name)
+
+    def find_signaled_workflow(self, signal_name, workflow_id, run_id=None):
+        """
+        First workflow we signaled with *signal_name*, with any run ID if
+        *run_id* is None.
+
+        :param signal_name:
+        :type signal_name: str
+        :param workflow_id:
+        :type workflow_id: str
+        :param run_id:
+        :type run_id: Optional[str]
+        :rtype: Optional[dict[str, Any]]
+        """
+        return self._signaled_workflows_index.get((signal_name, workflow_id, run_id))
+
     @property
     def timers(self):
         # type: () -> Dict[str, Dict[str, Any]]
@@ -151,11 +229,38 @@ class History(object):
     @property
     def events(self):
         """
+        When restored from a checkpoint, only the events that were saved with
+        it and the ones added since are available.
 
         :return:
         :rtype: list[swf.models.event.Event]
         """
-        return self._history.events
+        events = self._history.events
+        if not self._checkpoint_event_id:
+            return events
+        return [event for event in events if event is not None]
+
+    @property
+    def last_event_id(self):
+        """
+        :return: ID of the last parsed event, 0 if nothing was parsed yet.
+        :rtype: int
+        """
+        return self._last_event_id
+
+    @property
+    def size(self):
+        """
+        Approximate size of the events in bytes, as serialized by SWF.
+        Only the events that weren't measured yet are serialized.
+        :rtype: int
+        """
+        events = self._history.events
+        for event in events[self._sized_event_id:]:
+            self._size += len(json_dumps(event.raw))
+        if events:
+            self._sized_event_id = events[-1].id
+        return self._size
 
     def parse_activity_event(self, events, event):
         """
@@ -480,6 +585,11 @@ class History(object):
             workflow['signaled_event_id'] = event.id
             workflow['signaled_timestamp'] = event.timestamp
             self._signaled_workflows[workflow['signal_name']].append(workflow)
+            for run_id in (workflow['run_id'], None):
+                self._signaled_workflows_index.setdefault(
+                    (workflow['signal_name'], workflow['workflow_id'], run_id),
+                    workflow,
+                )
         elif event.state == 'request_cancel_execution_initiated':
             workflow = {
                 'type': 'external_workflow',
@@ -524,6 +634,8 @@ class History(object):
                 'timestamp': event.timestamp,
             }
             self._markers.setdefault(event.marker_name, []).append(marker)
+            self._recorded_markers[(marker['name'], marker['details'])] = marker
+            self._last_recorded_markers[marker['name']] = marker
         elif event.state == 'record_failed':
             marker = {
                 'type': 'marker',
@@ -601,10 +713,324 @@ class History(object):
         """
         Parse the events.
         Update the corresponding statuses.
+
+        Only the events that weren't parsed yet are processed, so calling it
+        again after new events were appended is incremental.
         """
 
-        events = self.events
-        for event in events:
+        events = self._history.events
+        # Event IDs start at 1 and are contiguous: event N is at index N - 1.
+        for event in events[self._last_event_id:]:
             parser = self.TYPE_TO_PARSER.get(event.type)
             if parser:
                 parser(self, events, event)
+        if events:
+            self._last_event_id = events[-1].id
+
+    def is_prefix_of(self, history):
+        """
+        Check whether the events parsed so far are the beginning of *history*,
+        i.e. *history* is a newer version of the same execution's history.
+
+        :param history: SWF history
+        :type history: swf.models.history.History
+        :rtype: bool
+        """
+        if not self._last_event_id:
+            return True
+        events = history.events
+        if len(events) < self._last_event_id:
+            return False
+        return self.is_last_event(events[self._last_event_id - 1])
+
+    def is_last_event(self, event):
+        """
+        Check whether *event* is the last parsed event.
+
+        :param event:
+        :type event: swf.models.event.Event
+        :rtype: bool
+        """
+        if not self._last_event_id:
+            return False
+        last_event = self._history.events[self._last_event_id - 1]
+        return (event.id == last_event.id and
+                event.name == last_event.name and
+                event.timestamp == last_event.timestamp)
+
+    def update(self, history):
+        """
+        Switch to a newer SWF history of the same execution and only parse the
+        events that were added since the last parse.
+
+        :param history: SWF history
+        :type history: swf.models.history.History
+        """
+        if not self.is_prefix_of(history):
+            raise ValueError('history does not extend the parsed one (last event ID: {})'.format(
+                self._last_event_id))
+        self._history = history
+        self.parse()
+
+    def get_state(self):
+        """
+        Aggregated state, used to compare two histories.
+
+        :rtype: dict[str, Any]
+        """
+        return {
+            'activities': self._activities,
+            'child_workflows': self._child_workflows,
+            'external_workflows_signaling': self._external_workflows_signaling,
+            'external_workflows_canceling': self._external_workflows_canceling,
+            'signals': self._signals,
+            'signaled_workflows': dict(self._signaled_workflows),
+            'markers': self._markers,
+            'recorded_markers': self._recorded_markers,
+            'last_recorded_markers': self._last_recorded_markers,
+            'signaled_workflows_index': self._signaled_workflows_index,
+            'timers': self._timers,
+            'tasks': self._tasks,
+            'cancel_requested': self._cancel_requested,
+            'cancel_failed': self._cancel_failed,
+            'started_decision_id': self.started_decision_id,
+            'completed_decision_id': self.completed_decision_id,
+            'last_event_id': self._last_event_id,
+        }
+
+    def get_checkpoint(self):
+        """
+        Aggregated state, without the events except the ones that parse()
+        or the executor may still look up: the started event, the last parsed
+        event and the scheduled or initiated events of open tasks.
+        Restore it with from_checkpoint().
+
+        :rtype: dict[str, Any]
+        """
+        self.size  # Measure the events while we have them
+        events = self._history.events
+        event_ids = {1, self._last_event_id}
+        event_ids.update(
+            activity['scheduled_id'] for activity in self._activities.values()
+            # A cancel_requested activity may never have been scheduled
+            if activity['state'] not in self.CLOSED_ACTIVITY_STATES and 'scheduled_id' in activity
+        )
+        event_ids.update(
+            workflow['initiated_event_id'] for workflow in self._child_workflows.values()
+            if workflow['state'] not in self.CLOSED_CHILD_WORKFLOW_STATES
+        )
+        event_ids.update(
+            workflow['initiated_event_id'] for workflow in self._external_workflows_canceling.values()
+            if workflow['state'] != 'request_cancel_execution_failed' and
+            'cancel_requested_event_id' not in workflow
+        )
+        checkpoint = dict(self.__dict__)
+        del checkpoint['_history']
+        checkpoint['_events'] = {
+            event_id: events[event_id - 1].raw
+            for event_id in event_ids if 0 < event_id <= self._last_event_id
+        }
+        return checkpoint
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint):
+        """
+        Rebuild a parsed history from get_checkpoint(). Its events are None
+        except the ones saved; new events can be appended and parsed.
+
+        :param checkpoint:
+        :type checkpoint: dict[str, Any]
+        :rtype: History
+        """
+        state = dict(checkpoint)
+        events = [None] * state['_last_event_id']
+        for event_id, raw_event in state.pop('_events').items():
+            events[event_id - 1] = EventFactory(raw_event)
+        history = cls(SWFHistory(events=events))
+        history.__dict__.update(state)
+        history._checkpoint_event_id = history._last_event_id
+        return history
+
+
+class HistoryCache(object):
+    """
+    LRU cache of parsed histories, by (workflow_id, run_id).
+
+    A long-lived decider gets the full history with each decision task; with
+    this cache, only the events added since the previous decision task of the
+    same execution are parsed.
+
+    :ivar max_size: max number of executions kept
+    :type max_size: int
+    :ivar check: compare each incremental parse with a full one (slow)
+    :type check: bool
+    :ivar hits: number of incremental parses
+    :type hits: int
+    :ivar misses: number of full parses
+    :type misses: int
+    """
+
+    def __init__(self, max_size=100, check=None):
+        if max_size < 1:
+            raise ValueError('history cache size must be >= 1')
+        self.max_size = max_size
+        self.check = SIMPLEFLOW_ENV == 'test' if check is None else check
+        self.hits = 0
+        self.misses = 0
+        self._histories = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._histories)
+
+    def __contains__(self, key):
+        return key in self._histories
+
+    def get(self, workflow_id, run_id, swf_history):
+        """
+        Get the parsed history for this execution, parsing only new events
+        if a previous version is in the cache.
+
+        :param workflow_id:
+        :type workflow_id: str
+        :param run_id:
+        :type run_id: str
+        :param swf_history: full SWF history
+        :type swf_history: swf.models.history.History
+        :rtype: History
+        """
+        key = (workflow_id, run_id)
+        history = self._histories.pop(key, None)
+        if history is not None and history.is_prefix_of(swf_history):
+            logger.debug('history cache: hit for {} (last event ID: {})'.format(key, history.last_event_id))
+            self.hits += 1
+            history.update(swf_history)
+        else:
+            if history is not None:
+                logger.warning('history cache: stale entry for {}, parsing the full history'.format(key))
+            self.misses += 1
+            history = History(swf_history)
+            history.parse()
+
+        self._histories[key] = history
+        while len(self._histories) > self.max_size:
+            self._histories.popitem(last=False)
+
+        if self.check:
+            self._check(history, swf_history)
+        return history
+
+    def peek(self, workflow_id, run_id):
+        """
+        Get the parsed history for this execution if it's in the cache.
+
+        :param workflow_id:
+        :type workflow_id: str
+        :param run_id:
+        :type run_id: str
+        :rtype: Optional[History]
+        """
+        return self._histories.get((workflow_id, run_id))
+
+    def put(self, workflow_id, run_id, history):
+        """
+        Add a parsed history, e.g. loaded from a checkpoint.
+
+        :param workflow_id:
+        :type workflow_id: str
+        :param run_id:
+        :type run_id: str
+        :param history:
+        :type history: History
+        """
+        key = (workflow_id, run_id)
+        self._histories.pop(key, None)
+        self._histories[key] = history
+        while len(self._histories) > self.max_size:
+            self._histories.popitem(last=False)
+
+    def _check(self, history, swf_history):
+        if any(event is None for event in swf_history.events):
+            # Resumed from a checkpoint: we don't have the full history
+            return
+        full_history = History(swf_history)
+        full_history.parse()
+        state, expected = history.get_state(), full_history.get_state()
+        if state != expected:
+            different = sorted(k for k in expected if state[k] != expected[k])
+            raise AssertionError('history cache: incremental parse differs from a full one on {}'.format(
+                ', '.join(different)))
+
+    def clear(self):
+        self._histories.clear()
+
+
+class HistoryCheckpoints(object):
+    """
+    Parsed histories saved on disk by run ID, so that the next decision task
+    of an execution only needs the events added since, even when the
+    previous one was handled by another process on this host.
+
+    Only the aggregated state is saved, see History.get_checkpoint().
+
+    :ivar directory: disk cache directory
+    :type directory: str
+    :ivar expire: drop checkpoints after this many seconds
+    :type expire: Optional[int]
+    """
+    key_prefix = 'history_checkpoints/'
+
+    def __init__(self, directory=None, expire=7 * DAY):
+        self.directory = directory or constants.CACHE_DIR
+        self.expire = expire
+        self._disk = None
+        self._disk_pid = None
+
+    @property
+    def disk(self):
+        """
+        Disk cache, opened once per process: diskcache objects don't survive
+        forks.
+
+        :rtype: Cache
+        """
+        pid = os.getpid()
+        if self._disk_pid != pid:
+            self._disk = Cache(self.directory)
+            self._disk_pid = pid
+        return self._disk
+
+    def load(self, run_id):
+        """
+        Load the checkpoint of this execution, if any.
+
+        :param run_id:
+        :type run_id: str
+        :rtype: Optional[History]
+        """
+        try:
+            checkpoint = self.disk.get(self.key_prefix + run_id)
+            history = History.from_checkpoint(checkpoint) if checkpoint is not None else None
+        except (OperationalError, pickle.UnpicklingError, EOFError, AttributeError, ImportError,
+                KeyError, TypeError) as err:
+            logger.warning('history checkpoints: cannot load {}: {}'.format(run_id, err))
+            return None
+        if history is not None:
+            logger.debug('history checkpoints: loaded {} (last event ID: {})'.format(
+                run_id, history.last_event_id))
+        return history
+
+    def save(self, run_id, history):
+        """
+        Save a parsed history as the checkpoint of this execution.
+
+        :param run_id:
+        :type run_id: str
+        :param history:
+        :type history: History
+        """
+        try:
+            self.disk.set(self.key_prefix + run_id, history.get_checkpoint(), expire=self.expire)
+        except OperationalError as err:
+            logger.warning('history checkpoints: cannot save {}: {}'.format(run_id, err))
+            return
+        logger.debug('history checkpoints: saved {} (last event ID: {})'.format(run_id, history.last_event_id))
@@ -15,6 +15,7 @@ from simpleflow.utils import format_exc
 from simpleflow.workflow import Workflow
 from swf.models.history import builder
 from simpleflow.history import History
+from .pool import PoolFuture, execute_activity_task, make_pool
 
 
 logger = logging.getLogger(__name__)
@@ -26,12 +27,27 @@ class Executor(executor.Executor):
 
     """
 
-    def __init__(self, workflow_class):
+    def __init__(self, workflow_class, pool_size=None, pool_type='thread'):
+        """
+        :param pool_size: run up to N activities at once in a pool, their
+            futures waiting for them; if not set, they run one at a time
+            when submitted.
+        :type pool_size: Optional[int]
+        :param pool_type: 'thread' or 'process'; activities are sent to the
+            processes by name, so they must be importable. In threads, the
+            activity functions share their ``context`` attribute.
+        :type pool_type: str
+        """
         super(Executor, self).__init__(workflow_class)
         self.update_workflow_class()
         self.nb_activities = 0
         self.signals_sent = set()
         self._markers = collections.OrderedDict()
+        self.pool_size = pool_size
+        self.pool_type = pool_type
+        self._pool = None
+        self._pool_tasks = collections.deque()  # pool tasks to record in the history, in order
+        self._parsed_history = None
 
     def update_workflow_class(self):
         """
@@ -50,6 +66,8 @@ class Executor(executor.Executor):
         self._history = builder.History(
             self._workflow_class,
             input=input)
+        # Parsed as events are added, see get_history()
+        self._parsed_history = History(self._history)
 
     def submit(self, func, *args, **kwargs):
         logger.info('executing task {}(args={}, kwargs={})'.format(
@@ -85,6 +103,9 @@ class Executor(executor.Executor):
             raise TypeError('invalid type {} for {}'.format(
                 type(func), func))
 
+        if self._pool is not None and isinstance(task, ActivityTask):
+            return self.submit_to_pool(task, context, args, kwargs)
+
         try:
             future._result = task.execute()
             state = 'completed'
@@ -108,22 +129,101 @@ class Executor(executor.Executor):
                 result=future.result)
         return future
 
+    def submit_to_pool(self, task, context, args, kwargs):
+        """
+        Run an activity task in the pool.
+        Its events are added to the history once it and the tasks submitted
+        before it returned, so they keep the submission order.
+
+        :type task: ActivityTask
+        :rtype: PoolFuture
+        """
+        self.record_pool_tasks()
+        if self.pool_type == 'process':
+            async_result = self._pool.apply_async(
+                execute_activity_task,
+                (task.activity.name, task.args, task.kwargs, task.context),
+            )
+        else:
+            async_result = self._pool.apply_async(task.execute)
+        future = PoolFuture(async_result, task.activity)
+        self._pool_tasks.append((future, context["activity_id"], args, kwargs))
+        return future
+
+    def record_pool_tasks(self, wait=False):
+        """
+        Add the events of the pool tasks that returned to the history, up to
+        the first one still running.
+
+        :param wait: wait for all of them
+        :type wait: bool
+        """
+        while self._pool_tasks:
+            future, activity_id, args, kwargs = self._pool_tasks[0]
+            if wait:
+                future.join()
+            elif not future.finished:
+                break
+            self._pool_tasks.popleft()
+            self._history.add_activity_task(
+                future.activity,
+                decision_id=None,
+                last_state='failed' if future.exception else 'completed',
+                activity_id=activity_id,
+                input={'args': args, 'kwargs': kwargs},
+                result=future._result)
+
+    def wait_pool_tasks(self):
+        """
+        Wait for the pool tasks, raising TaskFailed if one raises on failure.
+        """
+        pending = [future for future, _, _, _ in self._pool_tasks]
+        self.record_pool_tasks(wait=True)
+        for future in pending:
+            future.wait()
+
     def run(self, input=None):
         if input is None:
             input = {}
         args = input.get('args', ())
         kwargs = input.get('kwargs', {})
         self.create_workflow()
+        if self.pool_size:
+            self._pool = make_pool(self.pool_type, self.pool_size)
+        try:
+            return self._run(input, args, kwargs)
+        finally:
+            if self._pool is not None:
+                # Tasks are left only if the workflow failed
+                if self._pool_tasks:
+                    self._pool.terminate()
+                else:
+                    self._pool.close()
+                self._pool.join()
+                self._pool = None
+                self._pool_tasks.clear()
 
-        self.initialize_history(input)
+    def _run(self, input, args, kwargs):
+        while True:
+            self.initialize_history(input)
 
-        self.before_replay()
-        result = self.run_workflow(*args, **kwargs)
+            self.before_replay()
+            try:
+                result = self.run_workflow(*args, **kwargs)
+                self.wait_pool_tasks()
+                break
+            except exceptions.ContinueAsNew as err:
+                self.record_pool_tasks(wait=True)
+                logger.info('continuing as new after {} events'.format(len(self._history.events)))
+                input = err.input
+                args = input.get('args', ())
+                kwargs = input.get('kwargs', {})
+                self.signals_sent = set()
+                self._markers = collections.OrderedDict()
 
         # Hack: self._history must be available to the callback as a
         # simpleflow.history.History, not a swf.models.history.builder.History
-        self._history = History(self._history)
-        self._history.parse()
+        self._history = self.get_history()
         self.after_replay()
         self.on_completed()
         self.after_closed()
@@ -132,6 +232,12 @@ class Executor(executor.Executor):
     def after_closed(self):
         return self._workflow.after_closed(self._history)
 
+    def get_history(self):
+        if self._parsed_history is not None:
+            # Only parses the events added since the last call
+            self._parsed_history.parse()
+        return self._parsed_history
+
     def get_run_context(self):
         return {
             "name": "local",
@@ -0,0 +1,103 @@
+import logging
+import multiprocessing
+import multiprocessing.pool
+
+from simpleflow import exceptions, futures
+from simpleflow.dispatch import dynamic_dispatcher
+from simpleflow.task import ActivityTask
+from simpleflow.utils import format_exc
+
+
+logger = logging.getLogger(__name__)
+
+POOL_TYPES = ('thread', 'process')
+
+
+def make_pool(pool_type, size):
+    """
+    Pool running the activities of the local executor.
+
+    :param pool_type: 'thread' or 'process'
+    :type pool_type: str
+    :param size: number of workers
+    :type size: int
+    :rtype: multiprocessing.pool.Pool
+    """
+    if pool_type == 'thread':
+        return multiprocessing.pool.ThreadPool(size)
+    if pool_type == 'process':
+        return multiprocessing.Pool(size)
+    raise ValueError('pool type should be one of {}, got {!r}'.format(POOL_TYPES, pool_type))
+
+
+def execute_activity_task(name, args, kwargs, context):
+    """
+    Run an activity in a pool process: it is sent by name, as Activity
+    objects wrap functions that cannot be pickled.
+    """
+    activity = dynamic_dispatcher.Dispatcher().dispatch_activity(name)
+    kwargs = dict(kwargs, context=context)
+    return ActivityTask(activity, *args, **kwargs).execute()
+
+
+class PoolFuture(futures.Future):
+    """
+    Future of an activity task running in a pool.
+
+    It is running until the task returns; reading its result or exception
+    waits for it. As on SWF, reading the result of a failed activity that
+    raises on failure raises TaskFailed.
+
+    :ivar activity:
+    :type activity: simpleflow.activity.Activity
+    """
+    def __init__(self, async_result, activity):
+        self._async_result = async_result
+        super(PoolFuture, self).__init__()
+        self.activity = activity
+        self._state = futures.RUNNING
+
+    def __deepcopy__(self, memo):
+        # Tasks copy their arguments, which may be futures
+        return self
+
+    @property
+    def _state(self):
+        if self.__state == futures.RUNNING and self._async_result.ready():
+            self._collect()
+        return self.__state
+
+    @_state.setter
+    def _state(self, value):
+        self.__state = value
+
+    def _collect(self):
+        try:
+            self._result = self._async_result.get()
+        except Exception as err:
+            logger.error('rescuing exception: {}'.format(format_exc(err)))
+            self._exception = err
+        self.__state = futures.FINISHED
+
+    def join(self):
+        """
+        Wait for the task to return.
+        """
+        if self.__state == futures.RUNNING:
+            self._async_result.wait()
+            self._collect()
+
+    def wait(self):
+        self.join()
+        if self._exception is not None and self.activity.raises_on_failure:
+            raise exceptions.TaskFailed(self.activity.name, format_exc(self._exception))
+        return self._result
+
+    @property
+    def result(self):
+        return self.wait()
+
+    @property
+    def exception(self):
+        self.join()
+        return self._exception
@@ -1,2 +1,4 @@
 from .supervisor import Supervisor, reset_signal_handlers  # NOQA
 from .named_mixin import NamedMixin, with_state  # NOQA
+from .preload import preload_modules  # NOQA
+from .watcher import ProcessWatcher, watch_sigchld  # NOQA
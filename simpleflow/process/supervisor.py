@@ -3,12 +3,10 @@ import logging
 import multiprocessing
 import os
 import signal
-import time
 import types
 
-import psutil
-
 from .named_mixin import NamedMixin, with_state
+from .watcher import ProcessWatcher, watch_sigchld
 
 logger = logging.getLogger(__name__)
 
@@ -31,22 +29,6 @@ def reset_signal_handlers(func):
     return wrapped
 
 
-def _void_handle_sigchld(signum, frame):
-    """
-    Default action for a SIGCHLD signal handling is to ignore it
-    which in practice has no effect on the running program. Having
-    a handler that does nothing is a bit different, in the sense
-    it will interrupt the execution of any "time.sleep()" routing.
-    From "time" module docs:
-
-        The actual suspension time may be less than that requested
-        because any caught signal will terminate the sleep()
-        following execution of that signal's catching routine.
-
-    """
-    pass
-
-
 class Supervisor(NamedMixin):
     """
     The `Supervisor` class is responsible for managing one or many worker processes
@@ -60,6 +42,10 @@ class Supervisor(NamedMixin):
     style.
     """
 
+    # Re-check the children at least this often (seconds); exits are seen
+    # right away anyway.
+    check_interval = 5
+
     def __init__(self, payload, arguments=None, nb_children=None, background=False):
         """
         Initializes a Manager() instance, with a payload (a callable that will be
@@ -88,6 +74,7 @@ class Supervisor(NamedMixin):
         self._background = background
 
         self._processes = {}
+        self._watcher = ProcessWatcher()
         self._terminating = False
 
         super(Supervisor, self).__init__()
@@ -106,23 +93,12 @@ class Supervisor(NamedMixin):
             self.target()
 
     def _cleanup_worker_processes(self):
-        # cleanup children
-        to_remove = []
-        for pid, child in self._processes.items():
-            try:
-                name, status = child.name(), child.status()
-            except psutil.NoSuchProcess:  # May be untimely deceased
-                name, status = "unknown", "unknown"
-            logger.debug("  child: name=%s pid=%d status=%s" % (name, child.pid, status))
-            if status in (psutil.STATUS_ZOMBIE, "unknown"):
-                logger.debug("  process {} is zombie, will cleanup".format(child.pid))
-                # join process to clean it up
-                child.wait()
-                # set the process to be removed from self._processes
-                to_remove.append(pid)
-
-        # cleanup our internal state (self._processes)
-        for pid in to_remove:
+        # cleanup children; is_alive() reaps the dead ones
+        for pid, child in list(self._processes.items()):
+            if child.is_alive():
+                continue
+            logger.debug("  process {} exited with code {}, will cleanup".format(pid, child.exitcode))
+            self._watcher.remove(child)
             del self._processes[pid]
 
     def _start_worker_processes(self):
@@ -146,7 +122,8 @@ class Supervisor(NamedMixin):
             # fork. So no big risk, but I add an assertion just in case anyway.
             pid = child.pid
             assert pid, "Cannot add process with pid={}: {}".format(pid, child)
-            self._processes[pid] = psutil.Process(pid)
+            self._processes[pid] = child
+            self._watcher.add(child)
 
     def target(self):
         """
@@ -167,27 +144,23 @@ class Supervisor(NamedMixin):
             if self._terminating:
                 for proc in self._processes.values():
                     logger.info("process: waiting for proces={} to finish.".format(proc))
-                    proc.wait()
+                    proc.join()
+                self._watcher.close()
                 break
 
             # start worker processes
             self._cleanup_worker_processes()
             self._start_worker_processes()
 
-            # re-evaluate state at least every 5 seconds ; if a SIGCHLD happens during
-            # the "time.sleep()" below, it will be interrupted, making the code above
-            # run nearly immediately ; but if a SIGCHLD happens during the two calls
-            # above, the "time.sleep()" here won't be stopped, so better have it
-            # relatively short, but not too short since the above methods involve
-            # scanning a bunch of entries in /proc so that could become slow if we do
-            # it every 0.1s.
-            time.sleep(5)
+            # wait for a child to exit; re-evaluate state at least every
+            # check_interval seconds, e.g. after a SIGTERM.
+            self._watcher.wait(self.check_interval)
 
     def bind_signal_handlers(self):
         """
         Binds signals for graceful shutdown:
         - SIGTERM and SIGINT lead to a graceful shutdown
-        - SIGCHLD is intentionally left to a void handler, see comment
+        - SIGCHLD wakes up the main loop when a child exits, see watch_sigchld()
         - other signals are not modified for now
         """
 
@@ -204,7 +177,7 @@ class Supervisor(NamedMixin):
         signal.signal(signal.SIGINT, _handle_graceful_shutdown)
 
         # bind SIGCHLD
-        signal.signal(signal.SIGCHLD, _void_handle_sigchld)
+        watch_sigchld()
 
     @with_state("stopping")
     def terminate(self):
@@ -0,0 +1,181 @@
+import errno
+import fcntl
+import os
+import select
+import signal
+import time
+
+# Longest sleep between two checks of a process we cannot get a file
+# descriptor for, unless watch_sigchld() was called.
+POLL_INTERVAL = 0.1
+
+# Pipe written to on SIGCHLD, and the process that created it
+_sigchld_pipe = None
+_sigchld_pipe_pid = None
+
+
+def _handle_sigchld(signum, frame):
+    try:
+        os.write(_sigchld_pipe[1], b'\0')
+    except OSError:
+        # The pipe is full: a wake-up is already pending.
+        pass
+
+
+def watch_sigchld():
+    """
+    Install a SIGCHLD handler waking up `ProcessWatcher.wait()` when a child
+    exits, so that the processes it has no file descriptor for are checked
+    then instead of being polled. Must be called from the main thread.
+
+    The handler writes to a pipe: unlike an interrupted sleep, a child
+    exiting right before wait() blocks isn't missed, and Python 3 doesn't
+    resume select() after a signal.
+    """
+    global _sigchld_pipe, _sigchld_pipe_pid
+    if _sigchld_pipe_pid != os.getpid():
+        _sigchld_pipe = os.pipe()
+        _sigchld_pipe_pid = os.getpid()
+        for fd in _sigchld_pipe:
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+            fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+    signal.signal(signal.SIGCHLD, _handle_sigchld)
+
+
+def _sigchld_fd():
+    """
+    Readable end of the SIGCHLD pipe if watch_sigchld() is in effect in this
+    process, else None.
+    """
+    if _sigchld_pipe_pid != os.getpid() or signal.getsignal(signal.SIGCHLD) is not _handle_sigchld:
+        return None
+    return _sigchld_pipe[0]
+
+
+def _drain(fd):
+    try:
+        while os.read(fd, 4096):
+            pass
+    except OSError as err:
+        if err.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+            raise
+
+
+def _has_exited(process):
+    """
+    Whether a child process exited; it is reaped if so.
+
+    :param process:
+    :type process: multiprocessing.Process | subprocess.Popen
+    :rtype: bool
+    """
+    if hasattr(process, 'poll'):
+        return process.poll() is not None
+    return not process.is_alive()
+
+
+def _select(fds, timeout):
+    """
+    select() on readable *fds*, an interrupted call returns nothing.
+    """
+    try:
+        ready, _, _ = select.select(fds, [], [], timeout)
+    except (select.error, OSError, IOError) as err:
+        if err.args[0] != errno.EINTR:
+            raise
+        return []
+    return ready
+
+
+class ProcessWatcher(object):
+    """
+    Wait for any of a set of child processes to exit in a single select()
+    call, so that an exit is seen right away and idle wake-ups don't grow
+    with the number of processes.
+
+    A process is watched through a file descriptor that becomes readable
+    when it exits: its sentinel for a `multiprocessing.Process` (Python 3),
+    else a pidfd (Linux 5.3+, Python 3.9+). Other processes are checked
+    on SIGCHLD if `watch_sigchld()` was called, else with a backoff of up to
+    POLL_INTERVAL seconds.
+
+    Exited processes are not removed: callers reap and `remove` them.
+    """
+    def __init__(self):
+        self._sentinels = {}  # process -> fd or None
+        self._pidfds = {}  # process -> pidfd we opened
+
+    def __len__(self):
+        return len(self._sentinels)
+
+    def add(self, process):
+        """
+        Watch a child process.
+
+        :param process:
+        :type process: multiprocessing.Process | subprocess.Popen
+        """
+        sentinel = getattr(process, 'sentinel', None)
+        if sentinel is None and hasattr(os, 'pidfd_open'):
+            try:
+                sentinel = self._pidfds[process] = os.pidfd_open(process.pid)
+            except OSError:
+                # Already reaped, or not supported by the kernel
+                pass
+        self._sentinels[process] = sentinel
+
+    def remove(self, process):
+        """
+        Stop watching a process.
+        """
+        self._sentinels.pop(process, None)
+        pidfd = self._pidfds.pop(process, None)
+        if pidfd is not None:
+            os.close(pidfd)
+
+    def close(self):
+        """
+        Stop watching all processes.
+        """
+        for process in list(self._sentinels):
+            self.remove(process)
+
+    def wait(self, timeout=None, fds=()):
+        """
+        Wait until a process exits, one of *fds* is readable or *timeout*
+        expires.
+
+        :param timeout: seconds, None to wait forever
+        :type timeout: Optional[float]
+        :param fds: file descriptors or objects with a fileno() method
+        :type fds: list
+        :return: the exited processes, the readable *fds*
+        :rtype: (list, list)
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        delay = 0.001
+        while True:
+            by_sentinel = {s: p for p, s in self._sentinels.items() if s is not None}
+            polled = [p for p, s in self._sentinels.items() if s is None]
+            sigchld_fd = _sigchld_fd() if polled else None
+            exited = [p for p in polled if _has_exited(p)]
+
+            remaining = max(0, deadline - time.time()) if deadline is not None else None
+            if exited:
+                select_timeout = 0
+            elif polled and sigchld_fd is None:
+                select_timeout = delay if remaining is None else min(delay, remaining)
+            else:
+                select_timeout = remaining
+            wake_fds = [sigchld_fd] if sigchld_fd is not None else []
+            ready = _select(list(by_sentinel) + wake_fds + list(fds), select_timeout)
+            if sigchld_fd in ready:
+                _drain(sigchld_fd)
+
+            exited.extend(by_sentinel[fd] for fd in ready if fd in by_sentinel)
+            ready_fds = [fd for fd in ready if fd not in by_sentinel and fd != sigchld_fd]
+            if exited or ready_fds:
+                return exited, ready_fds
+            if deadline is not None and time.time() >= deadline:
+                return [], []
+            delay = min(delay * 2, POLL_INTERVAL)
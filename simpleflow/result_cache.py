@@ -0,0 +1,244 @@
+import abc
+import hashlib
+import logging
+import os
+import time
+from sqlite3 import OperationalError
+
+from boto.exception import S3ResponseError
+from diskcache import Cache
+from future.utils import with_metaclass
+
+from simpleflow import storage
+from simpleflow.constants import DAY
+from simpleflow.utils import json_dumps, json_loads_or_raw
+from swf import constants
+
+logger = logging.getLogger(__name__)
+
+
+def hash_arguments(args, kwargs):
+    """
+    Hash the JSON arguments of a task, as done for the IDs of idempotent tasks.
+
+    :param args:
+    :type args: tuple | list
+    :param kwargs:
+    :type kwargs: dict
+    :rtype: str
+    """
+    arguments = json_dumps({"args": args, "kwargs": kwargs})
+    return hashlib.md5(arguments.encode('utf-8')).hexdigest()
+
+
+class ResultCache(with_metaclass(abc.ABCMeta, object)):
+    """
+    Results of idempotent activities, by activity name, version and
+    arguments hash. Results are stored as encoded in the history: JSON,
+    possibly compressed, or the signature of a jumbo field.
+
+    Subclasses implement the storage with `_get` and `_set`.
+
+    :ivar expire: drop results after this many seconds
+    :type expire: Optional[int]
+    :ivar hits: lookups returning a result
+    :type hits: int
+    :ivar misses: lookups returning nothing
+    :type misses: int
+    :ivar stores: results stored
+    :type stores: int
+    :ivar errors: lookups or stores that failed
+    :type errors: int
+    """
+    storage_errors = ()  # exceptions counted as errors instead of raised
+
+    def __init__(self, expire=7 * DAY):
+        self.expire = expire
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+
+    @staticmethod
+    def make_key(name, version, args, kwargs):
+        """
+        :param name: activity name
+        :type name: str
+        :param version: activity version
+        :type version: str
+        :param args:
+        :type args: tuple | list
+        :param kwargs:
+        :type kwargs: dict
+        :rtype: str
+        """
+        return '{}/{}/{}'.format(name, version, hash_arguments(args, kwargs))
+
+    def get(self, key):
+        """
+        Get a cached result.
+
+        :param key:
+        :type key: str
+        :return: the encoded result, None if not found
+        :rtype: Optional[str]
+        """
+        try:
+            result = self._get(key)
+        except self.storage_errors as err:
+            logger.warning('result cache: cannot get {}: {}'.format(key, err))
+            self.errors += 1
+            result = None
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        logger.debug('result cache: {} {}'.format('hit' if result is not None else 'miss', key))
+        return result
+
+    def set(self, key, result):
+        """
+        Cache a result.
+
+        :param key:
+        :type key: str
+        :param result: encoded result
+        :type result: str
+        """
+        try:
+            self._set(key, result)
+        except self.storage_errors as err:
+            logger.warning('result cache: cannot set {}: {}'.format(key, err))
+            self.errors += 1
+            return
+        self.stores += 1
+        logger.debug('result cache: stored {}'.format(key))
+
+    def get_stats(self):
+        """
+        :rtype: dict[str, Any]
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'errors': self.errors,
+            'hit_ratio': float(self.hits) / lookups if lookups else None,
+        }
+
+    @abc.abstractmethod
+    def _get(self, key):
+        """
+        :return: the encoded result, None if not found
+        :rtype: Optional[str]
+        """
+
+    @abc.abstractmethod
+    def _set(self, key, result):
+        pass
+
+
+class DiskResultCache(ResultCache):
+    """
+    Results cached on local disk. Past `size_limit` bytes, diskcache culls the
+    least recently stored results.
+
+    :ivar directory: disk cache directory; not shared with the other caches
+        since its size limit applies to the whole directory
+    :type directory: str
+    :ivar size_limit: max size of the disk cache, in bytes
+    :type size_limit: int
+    """
+    key_prefix = 'result_cache/'
+    storage_errors = (OperationalError,)
+
+    def __init__(self, directory=None, expire=7 * DAY, size_limit=1024 ** 3):
+        super(DiskResultCache, self).__init__(expire=expire)
+        self.directory = directory or os.path.join(constants.CACHE_DIR, 'results')
+        self.size_limit = size_limit
+        self._disk = None
+        self._disk_pid = None
+
+    @property
+    def disk(self):
+        """
+        Disk cache, opened once per process: diskcache objects don't survive
+        forks.
+
+        :rtype: Cache
+        """
+        pid = os.getpid()
+        if self._disk_pid != pid:
+            self._disk = Cache(self.directory, size_limit=self.size_limit)
+            self._disk_pid = pid
+        return self._disk
+
+    def _get(self, key):
+        return self.disk.get(self.key_prefix + key)
+
+    def _set(self, key, result):
+        self.disk.set(self.key_prefix + key, result, expire=self.expire)
+
+
+class S3ResultCache(ResultCache):
+    """
+    Results cached on S3, to be shared between hosts. The expiration time is
+    stored with the result and checked on read; there is no size limit, use
+    lifecycle rules on the bucket to bound it.
+
+    :ivar bucket: S3 bucket
+    :type bucket: str
+    :ivar prefix: S3 path prefix
+    :type prefix: str
+    """
+    storage_errors = (S3ResponseError,)
+
+    def __init__(self, bucket, prefix='', expire=7 * DAY):
+        super(S3ResultCache, self).__init__(expire=expire)
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+
+    def _path(self, key):
+        return '/'.join(filter(None, [self.prefix, 'result_cache', key]))
+
+    def _get(self, key):
+        stream = storage.open_content(self.bucket, self._path(key))
+        if stream is None:
+            return None
+        try:
+            entry = json_loads_or_raw(stream.read().decode('utf-8'))
+        finally:
+            stream.close()
+        if entry['expires_at'] is not None and entry['expires_at'] < time.time():
+            return None
+        return entry['result']
+
+    def _set(self, key, result):
+        expires_at = time.time() + self.expire if self.expire else None
+        content = json_dumps({'expires_at': expires_at, 'result': result})
+        storage.push_content(self.bucket, self._path(key), content, content_type='application/json')
+
+
+def make_result_cache(location, expire=None, size_limit=None):
+    """
+    Build a result cache from its location: a local directory, or
+    "s3://<bucket>[/<prefix>]".
+
+    :param location:
+    :type location: str
+    :param expire: drop results after this many seconds
+    :type expire: Optional[int]
+    :param size_limit: max size of a disk cache, in bytes
+    :type size_limit: Optional[int]
+    :rtype: ResultCache
+    """
+    kwargs = {}
+    if expire is not None:
+        kwargs['expire'] = expire
+    if location.startswith('s3://'):
+        bucket, _, prefix = location[len('s3://'):].partition('/')
+        return S3ResultCache(bucket, prefix, **kwargs)
+    if size_limit is not None:
+        kwargs['size_limit'] = size_limit
+    return DiskResultCache(location, **kwargs)
@@ -74,6 +74,8 @@ ACTIVITY_HEARTBEAT_TIMEOUT = str
 LOGGING = dict
 
 SIMPLEFLOW_S3_HOST = str
+SIMPLEFLOW_STORAGE_BACKEND = str
+SIMPLEFLOW_STORAGE_DIRECTORY = str
 
 STEP_BUCKET = str
 
@@ -81,4 +83,6 @@ METROLOGY_BUCKET = str
 METROLOGY_PATH_PREFIX = str_or_none
 
 SIMPLEFLOW_ENABLE_DISK_CACHE = bool
+SIMPLEFLOW_JUMBO_FIELDS_CACHE_SIZE = int
+SIMPLEFLOW_JUMBO_FIELDS_PREFETCH_THREADS = int
 SIMPLEFLOW_BINARIES_DIRECTORY = str
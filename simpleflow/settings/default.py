@@ -19,6 +19,10 @@ ACTIVITY_HEARTBEAT_TIMEOUT = ACTIVITY_DEFAULT_TIMEOUT
 
 SIMPLEFLOW_S3_HOST = 's3.amazonaws.com'
 
+# "s3", or "local" to store objects in SIMPLEFLOW_STORAGE_DIRECTORY
+SIMPLEFLOW_STORAGE_BACKEND = 's3'
+SIMPLEFLOW_STORAGE_DIRECTORY = '/tmp/simpleflow-storage'
+
 STEP_BUCKET = 'step_bucket'
 
 METROLOGY_BUCKET = 'metrology_bucket'
@@ -53,4 +57,6 @@ LOGGING = {
 }
 
 SIMPLEFLOW_ENABLE_DISK_CACHE = False
+SIMPLEFLOW_JUMBO_FIELDS_CACHE_SIZE = 64 * 1024 ** 2
+SIMPLEFLOW_JUMBO_FIELDS_PREFETCH_THREADS = 8
 SIMPLEFLOW_BINARIES_DIRECTORY = '/tmp/simpleflow-binaries'
@@ -1,15 +1,21 @@
+import abc
+import errno
+import io
 import logging
+import os
+import shutil
+import threading
 
 from boto.s3 import connect_to_region, connection
 from boto.s3.key import Key
 from boto.exception import S3ResponseError
+from future.utils import with_metaclass
 
 from . import settings
 
 
 logger = logging.getLogger(__name__)
 
-BUCKET_CACHE = {}
 BUCKET_LOCATIONS_CACHE = {}
 
 
@@ -69,45 +75,280 @@ def sanitize_bucket_and_host(bucket):
     return bucket, location
 
 
+class StorageBackend(with_metaclass(abc.ABCMeta, object)):
+    """
+    Where simpleflow stores objects (jumbo fields, steps, metrology,
+    binaries...): buckets of objects identified by a path.
+    """
+
+    @abc.abstractmethod
+    def pull(self, bucket, path, dest_file):
+        """
+        Download an object to a file.
+        """
+
+    @abc.abstractmethod
+    def pull_content(self, bucket, path, encoding='utf-8'):
+        """
+        Get the content of an object.
+
+        :param encoding: None to get bytes
+        :type encoding: Optional[str]
+        :rtype: str | bytes
+        """
+
+    @abc.abstractmethod
+    def open(self, bucket, path):
+        """
+        Stream the content of an object.
+
+        :returns: a binary file-like object to read and close, None if the
+                  object doesn't exist
+        """
+
+    @abc.abstractmethod
+    def push(self, bucket, path, src_file, content_type=None):
+        """
+        Upload a file.
+        """
+
+    @abc.abstractmethod
+    def push_file(self, bucket, path, fileobj, content_type=None):
+        """
+        Upload the content of a binary file object, from its current position.
+        """
+
+    @abc.abstractmethod
+    def push_content(self, bucket, path, content, content_type=None):
+        """
+        Upload a string or bytes.
+        """
+
+    @abc.abstractmethod
+    def list_keys(self, bucket, path=None):
+        """
+        List the objects under a path.
+
+        :returns: objects with `key` (their path), `name` and
+                  `get_contents_as_string(encoding)`, like boto keys
+        :rtype: iterable
+        """
+
+    def get_bucket(self, bucket_name):
+        """
+        Get the boto bucket object, for S3 specific operations.
+
+        :raise NotImplementedError: not an S3 backend
+        """
+        raise NotImplementedError('get_bucket() needs the "s3" storage backend, not {}'.format(
+            self.__class__.__name__))
+
+
+class S3Backend(StorageBackend):
+    """
+    S3 storage. Connections and bucket objects are created once per process
+    and thread, and reused: boto connections are not thread-safe, and
+    sockets must not be shared with forked children.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def _buckets(self):
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        if not hasattr(self._local, 'buckets'):
+            self._local.connections = {}
+            self._local.buckets = {}
+        return self._local.buckets
+
+    def get_bucket(self, bucket_name):
+        buckets = self._buckets()
+        if bucket_name not in buckets:
+            name, location = sanitize_bucket_and_host(bucket_name)
+            connections = self._local.connections
+            if location not in connections:
+                connections[location] = get_connection(location)
+            buckets[bucket_name] = connections[location].get_bucket(name, validate=False)
+        return buckets[bucket_name]
+
+    def pull(self, bucket, path, dest_file):
+        key = self.get_bucket(bucket).get_key(path)
+        key.get_contents_to_filename(dest_file)
+
+    def pull_content(self, bucket, path, encoding='utf-8'):
+        key = self.get_bucket(bucket).get_key(path)
+        return key.get_contents_as_string(encoding=encoding)
+
+    def open(self, bucket, path):
+        return self.get_bucket(bucket).get_key(path)
+
+    @staticmethod
+    def _headers(content_type):
+        headers = {}
+        if content_type:
+            headers["content_type"] = content_type
+        return headers
+
+    def push(self, bucket, path, src_file, content_type=None):
+        key = Key(self.get_bucket(bucket), path)
+        key.set_contents_from_filename(src_file, headers=self._headers(content_type))
+
+    def push_file(self, bucket, path, fileobj, content_type=None):
+        key = Key(self.get_bucket(bucket), path)
+        key.set_contents_from_file(fileobj, headers=self._headers(content_type))
+
+    def push_content(self, bucket, path, content, content_type=None):
+        key = Key(self.get_bucket(bucket), path)
+        key.set_contents_from_string(content, headers=self._headers(content_type))
+
+    def list_keys(self, bucket, path=None):
+        return self.get_bucket(bucket).list(path)
+
+
+class LocalKey(object):
+    """
+    Object listed by `LocalBackend.list_keys`.
+    """
+
+    def __init__(self, filename, key):
+        self.filename = filename
+        self.key = self.name = key
+
+    def get_contents_as_string(self, encoding=None):
+        with open(self.filename, 'rb') as f:
+            content = f.read()
+        return content.decode(encoding) if encoding else content
+
+
+class LocalBackend(StorageBackend):
+    """
+    Storage in a local directory, a sub-directory per bucket, e.g. to run
+    workflows and benchmarks offline.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _filename(self, bucket, path):
+        return os.path.join(self.directory, bucket, path.lstrip('/'))
+
+    def _create(self, bucket, path):
+        filename = self._filename(bucket, path)
+        try:
+            os.makedirs(os.path.dirname(filename))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        return filename
+
+    def pull(self, bucket, path, dest_file):
+        shutil.copyfile(self._filename(bucket, path), dest_file)
+
+    def pull_content(self, bucket, path, encoding='utf-8'):
+        with open(self._filename(bucket, path), 'rb') as f:
+            content = f.read()
+        return content.decode(encoding) if encoding else content
+
+    def open(self, bucket, path):
+        try:
+            return open(self._filename(bucket, path), 'rb')
+        except IOError as e:
+            if e.errno == errno.ENOENT:
+                return None
+            raise
+
+    def push(self, bucket, path, src_file, content_type=None):
+        shutil.copyfile(src_file, self._create(bucket, path))
+
+    def push_file(self, bucket, path, fileobj, content_type=None):
+        with open(self._create(bucket, path), 'wb') as f:
+            shutil.copyfileobj(fileobj, f)
+
+    def push_content(self, bucket, path, content, content_type=None):
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        filename = self._create(bucket, path)
+        # Write then rename, so that readers never see a partial object.
+        tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with io.open(tmp_filename, 'wb') as f:
+            f.write(content)
+        os.rename(tmp_filename, filename)
+
+    def list_keys(self, bucket, path=None):
+        root = os.path.join(self.directory, bucket)
+        prefix = path or ''
+        keys = []
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                full_filename = os.path.join(dirpath, filename)
+                key = os.path.relpath(full_filename, root)
+                if key.startswith(prefix) and not filename.endswith('.tmp'):
+                    keys.append(LocalKey(full_filename, key))
+        return sorted(keys, key=lambda k: k.key)
+
+
+_backend = None
+
+
+def get_backend():
+    """
+    Storage backend of this process, from the SIMPLEFLOW_STORAGE_BACKEND
+    setting: "s3" (default) or "local" (in SIMPLEFLOW_STORAGE_DIRECTORY).
+
+    :rtype: StorageBackend
+    """
+    global _backend
+    if _backend is None:
+        if settings.SIMPLEFLOW_STORAGE_BACKEND == 'local':
+            _backend = LocalBackend(settings.SIMPLEFLOW_STORAGE_DIRECTORY)
+        elif settings.SIMPLEFLOW_STORAGE_BACKEND == 's3':
+            _backend = S3Backend()
+        else:
+            raise ValueError('invalid storage backend "{}"'.format(settings.SIMPLEFLOW_STORAGE_BACKEND))
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replace the storage backend, e.g. in tests; None to reload it from the
+    settings.
+
+    :type backend: Optional[StorageBackend]
+    """
+    global _backend
+    _backend = backend
+
+
 def get_bucket(bucket_name):
-    bucket_name, location = sanitize_bucket_and_host(bucket_name)
-    conn = get_connection(location)
-    if bucket_name not in BUCKET_CACHE:
-        bucket = conn.get_bucket(bucket_name, validate=False)
-        BUCKET_CACHE[bucket_name] = bucket
-    return BUCKET_CACHE[bucket_name]
+    return get_backend().get_bucket(bucket_name)
 
 
 def pull(bucket, path, dest_file):
-    bucket = get_bucket(bucket)
-    key = bucket.get_key(path)
-    key.get_contents_to_filename(dest_file)
+    get_backend().pull(bucket, path, dest_file)
 
 
-def pull_content(bucket, path):
-    bucket = get_bucket(bucket)
-    key = bucket.get_key(path)
-    return key.get_contents_as_string(encoding='utf-8')
+def pull_content(bucket, path, encoding='utf-8'):
+    return get_backend().pull_content(bucket, path, encoding=encoding)
+
+
+def open_content(bucket, path):
+    return get_backend().open(bucket, path)
 
 
 def push(bucket, path, src_file, content_type=None):
-    bucket = get_bucket(bucket)
-    key = Key(bucket, path)
-    headers = {}
-    if content_type:
-        headers["content_type"] = content_type
-    key.set_contents_from_filename(src_file, headers=headers)
+    get_backend().push(bucket, path, src_file, content_type=content_type)
+
+
+def push_file(bucket, path, fileobj, content_type=None):
+    get_backend().push_file(bucket, path, fileobj, content_type=content_type)
 
 
 def push_content(bucket, path, content, content_type=None):
-    bucket = get_bucket(bucket)
-    key = Key(bucket, path)
-    headers = {}
-    if content_type:
-        headers["content_type"] = content_type
-    key.set_contents_from_string(content, headers=headers)
+    get_backend().push_content(bucket, path, content, content_type=content_type)
 
 
 def list_keys(bucket, path=None):
-    bucket = get_bucket(bucket)
-    return bucket.list(path)
+    return get_backend().list_keys(bucket, path)
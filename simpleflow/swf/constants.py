@@ -17,3 +17,6 @@ VALID_PROCESS_MODES = {
     "local",
     "kubernetes",
 }
+
+# Name of the markers recording the cached results of idempotent activities
+CACHED_RESULT_MARKER = "_simpleflow_cached_result"
@@ -4,9 +4,7 @@ import copy
 import inspect
 
 import hashlib
-import json
 import logging
-import multiprocessing
 import re
 import traceback
 
@@ -25,9 +23,9 @@ from simpleflow.activity import Activity, PRIORITY_NOT_SET
 from simpleflow.base import Submittable
 from simpleflow.history import History
 from simpleflow.marker import Marker
+from simpleflow.result_cache import hash_arguments
 from simpleflow.signal import WaitForSignal
 from simpleflow.swf import constants
-from simpleflow.swf.helpers import swf_identity
 from simpleflow.swf.utils import DecisionsAndContext
 from simpleflow.swf.task import (
     SwfTask,
@@ -37,15 +35,13 @@ from simpleflow.swf.task import (
     MarkerTask,
     TimerTask,
     CancelTimerTask,
+    CachedResultTask,
 )
 from simpleflow.utils import (
     hex_hash,
     issubclass_,
-    json_dumps,
-    retry,
 )
 from simpleflow.workflow import Workflow
-from swf.core import ConnectedSWFObject
 
 
 logger = logging.getLogger(__name__)
@@ -53,76 +49,6 @@ logger = logging.getLogger(__name__)
 __all__ = ['Executor']
 
 
-# if "poll_for_activity_task" doesn't contain a "taskToken"
-# key, then retry ; it happens (not often) that the decider
-# doesn't get the scheduled task while it should...
-@retry.with_delay(nb_times=3,
-                  delay=retry.exponential,
-                  on_exceptions=KeyError)
-def run_fake_activity_task(domain, task_list, result):
-    conn = ConnectedSWFObject().connection
-    resp = conn.poll_for_activity_task(
-        domain,
-        task_list,
-        identity=swf_identity(),
-    )
-    conn.respond_activity_task_completed(
-        resp['taskToken'],
-        result,
-    )
-
-
-# Same retry condition as run_fake_activity_task
-@retry.with_delay(nb_times=3,
-                  delay=retry.exponential,
-                  on_exceptions=KeyError)
-def run_fake_child_workflow_task(domain, task_list, result=None):
-    conn = ConnectedSWFObject().connection
-    resp = conn.poll_for_decision_task(
-        domain,
-        task_list,
-        identity=swf_identity(),
-    )
-    conn.respond_decision_task_completed(
-        resp['taskToken'],
-        decisions=[
-            {
-                'decisionType': 'CompleteWorkflowExecution',
-                'completeWorkflowExecutionDecisionAttributes': {
-                    'result': result,
-                },
-            }
-        ]
-    )
-
-
-def run_fake_task_worker(domain, task_list, former_event):
-    if former_event['type'] == 'activity':
-        worker_proc = multiprocessing.Process(
-            target=run_fake_activity_task,
-            args=(
-                domain,
-                task_list,
-                former_event['result'],
-            ),
-        )
-    elif former_event['type'] == 'child_workflow':
-        worker_proc = multiprocessing.Process(
-            target=run_fake_child_workflow_task,
-            args=(
-                domain,
-                task_list,
-            ),
-            kwargs={
-                'result': former_event['result'],
-            },
-        )
-    else:
-        raise Exception('Wrong event type {}'.format(former_event['type']))
-
-    worker_proc.start()
-
-
 class TaskRegistry(dict):
     """This registry tracks tasks and assign them an integer identifier.
 
@@ -167,12 +93,22 @@ class Executor(executor.Executor):
     :type _repair_workflow_id: Optional[str]
     :ivar repair_run_id: run ID to repair, if any
     :type _repair_run_id: Optional[str]
+    :ivar history_cache: parsed histories of previous decisions, if any
+    :type history_cache: Optional[simpleflow.history.HistoryCache]
+    :ivar result_cache: results of idempotent activities; cached results
+        are recorded in a marker instead of scheduling the activity
+    :type result_cache: Optional[simpleflow.result_cache.ResultCache]
+    :ivar _cached_results: results recorded from the result cache or the
+        repaired execution, by task ID
+    :type _cached_results: Optional[dict[str, Any]]
 
     """
 
     def __init__(self, domain, workflow_class, task_list=None, repair_with=None,
                  force_activities=None,
                  repair_workflow_id=None, repair_run_id=None,
+                 history_cache=None,
+                 result_cache=None,
                  ):
         super(Executor, self).__init__(workflow_class)
         self._history = None
@@ -182,6 +118,10 @@ class Executor(executor.Executor):
         self.repair_with = repair_with
         self._repair_workflow_id = repair_workflow_id
         self._repair_run_id = repair_run_id
+        self.history_cache = history_cache
+        self.result_cache = result_cache
+        self._cached_results = None
+        self._event_finders = {}  # task class -> TASK_TYPE_TO_EVENT_FINDER entry
         if force_activities:
             self.force_activities = re.compile(force_activities)
         else:
@@ -193,6 +133,7 @@ class Executor(executor.Executor):
         self._idempotent_tasks_to_submit = set()
         self._execution = None
         self.current_priority = None
+        self._continue_as_new_input = None
 
     def reset(self):
         """
@@ -209,6 +150,8 @@ class Executor(executor.Executor):
         self._idempotent_tasks_to_submit = set()
         self._execution = None
         self.current_priority = None
+        self._continue_as_new_input = None
+        self._cached_results = None
         self.create_workflow()
 
     def _make_task_id(self, a_task, workflow_id, run_id, *args, **kwargs):
@@ -234,8 +177,7 @@ class Executor(executor.Executor):
             # If a_task is idempotent, we can do better and hash arguments.
             # It makes the workflow resistant to retries or variations on the
             # same task name (see #11).
-            arguments = json_dumps({"args": args, "kwargs": kwargs})
-            suffix = hashlib.md5(arguments.encode('utf-8')).hexdigest()
+            suffix = hash_arguments(args, kwargs)
 
         if isinstance(a_task, (WorkflowTask,)):
             # Some task types must have globally unique names.
@@ -509,16 +451,11 @@ class Executor(executor.Executor):
         :return:
         :rtype: Optional[dict]
         """
-        # FIXME could look directly in signaled_workflows?
         event = history.signals.get(a_task.name)
         if not event:
             if a_task.workflow_id is None:  # Broadcast, should be in signals
                 return None
-            signaled_workflows = history.signaled_workflows.get(a_task.name, [])
-            for w in signaled_workflows:
-                if w['workflow_id'] == a_task.workflow_id and (a_task.run_id is None or w['run_id'] == a_task.run_id):
-                    event = w
-                    break
+            event = history.find_signaled_workflow(a_task.name, a_task.workflow_id, a_task.run_id)
         return event
 
     def find_marker_event(self, a_task, history):
@@ -532,17 +469,7 @@ class Executor(executor.Executor):
         :return:
         :rtype: Optional[dict[str, Any]]
         """
-        json_details = a_task.get_json_details()
-        marker_list = history.markers.get(a_task.name)
-        if not marker_list:
-            return None
-        marker_list = list(
-            filter(
-                lambda m: m['state'] == 'recorded' and m['details'] == json_details,
-                marker_list
-            )
-        )
-        return marker_list[-1] if marker_list else None
+        return history.find_recorded_marker(a_task.name, a_task.get_json_details())
 
     def find_timer_event(self, a_task, history):
         """
@@ -583,12 +510,18 @@ class Executor(executor.Executor):
         :return:
         :rtype: Optional[dict]
         """
-        for typ in inspect.getmro(type(a_task)):
-            finder = self.TASK_TYPE_TO_EVENT_FINDER.get(typ)
-            if finder:
-                return finder(self, a_task, history)
-        raise TypeError('invalid type {} for task {}'.format(
-            type(a_task), a_task))
+        task_class = type(a_task)
+        finder = self._event_finders.get(task_class)
+        if finder is None:
+            for typ in inspect.getmro(task_class):
+                finder = self.TASK_TYPE_TO_EVENT_FINDER.get(typ)
+                if finder:
+                    self._event_finders[task_class] = finder
+                    break
+            else:
+                raise TypeError('invalid type {} for task {}'.format(
+                    type(a_task), a_task))
+        return finder(self, a_task, history)
 
     def resume_activity(self, a_task, event):
         """
@@ -645,6 +578,74 @@ class Executor(executor.Executor):
 
         return future
 
+    @property
+    def cached_results(self):
+        """
+        Results recorded from the result cache or the repaired execution in
+        previous decisions, by task ID.
+
+        :rtype: dict[str, Any]
+        """
+        if self._cached_results is None:
+            self._cached_results = {}
+            for marker in self._history.markers.get(constants.CACHED_RESULT_MARKER, []):
+                if marker['state'] == 'recorded':
+                    details = format.decode(marker['details'])
+                    self._cached_results[details['id']] = format.decode(details['result'])
+        return self._cached_results
+
+    def record_result(self, a_task, result):
+        """
+        Complete a task with a result obtained without executing it. The
+        result is recorded in a marker, so the next decisions don't depend on
+        where it came from.
+
+        :param a_task:
+        :type a_task: ActivityTask | WorkflowTask
+        :param result: result as encoded in the history, e.g. a jumbo field
+        signature; it isn't decoded again to be recorded
+        :type result: Optional[str]
+        :return: a finished future
+        :rtype: futures.Future
+        """
+        self.schedule_task(CachedResultTask(a_task, result))
+        future = futures.Future()
+        future.set_finished(format.decode(result))
+        return future
+
+    def resume_from_result_cache(self, a_task):
+        """
+        Complete an idempotent activity with its cached result, if any.
+
+        :param a_task:
+        :type a_task: ActivityTask
+        :return: a finished future, None if there is no cached result
+        :rtype: Optional[futures.Future]
+        """
+        activity = a_task.activity
+        key = self.result_cache.make_key(activity.name, activity.version, a_task.args, a_task.kwargs)
+        result = self.result_cache.get(key)
+        if result is None:
+            return None
+        logger.info('completing {} with its cached result'.format(a_task.id))
+        return self.record_result(a_task, result)
+
+    def save_to_result_cache(self, a_task, event):
+        """
+        Cache the result of an idempotent activity that completed since the
+        previous decision.
+
+        :param a_task:
+        :type a_task: ActivityTask
+        :param event: completed activity event
+        :type event: dict[str, Any]
+        """
+        if event['completed_id'] <= (self._history.completed_decision_id or 0):
+            return  # already cached by a previous decision
+        activity = a_task.activity
+        key = self.result_cache.make_key(activity.name, activity.version, a_task.args, a_task.kwargs)
+        self.result_cache.set(key, event['result'])
+
     def schedule_task(self, a_task, task_list=None):
         """
         Let a task schedule itself.
@@ -676,20 +677,16 @@ class Executor(executor.Executor):
         # schedule the requested task and block execution instead, with a timer
         # to wake up the workflow immediately after completing these decisions.
         # See: http://docs.aws.amazon.com/amazonswf/latest/developerguide/swf-dg-limits.html
-        # NB: here we use json.dumps, not json_dumps, since the serialization will
-        # happen inside boto.swf and is out of our control.
-        request_size = len(json.dumps(self._decisions_and_context.decisions + decisions))
         # We keep a 5kB of error margin for headers, json structure, and the
         # timer decision, and 32kB for the context, even if we don't use it now.
-        if request_size > constants.MAX_REQUEST_SIZE - 5000 - 32000:
+        max_size = constants.MAX_REQUEST_SIZE - 5000 - 32000
+        if not self._decisions_and_context.extend_decision(decisions, max_size=max_size):
             # TODO: at this point we may check that self._decisions is not empty
             # If it's the case, it means that a single decision was weighting
             # more than 900kB, so we have bigger problems.
             self._append_timer = True
             raise exceptions.ExecutionBlocked()
 
-        self._decisions_and_context.extend_decision(decisions)
-
         # Check if we won't exceed max decisions -1
         # TODO: if we had exactly MAX_DECISIONS - 1 to take, this will wake up
         # the workflow for no reason. Evaluate if we can do better.
@@ -743,30 +740,31 @@ class Executor(executor.Executor):
         event = self.find_event(a_task, self._history)
         logger.debug('executor: resume {}, event={}'.format(a_task, event))
         future = None
+        if event:
+            # The workflow went on after continue_as_new_if_needed()
+            self._continue_as_new_input = None
+
+        # result recorded by a previous decision instead of executing the task
+        if (not event and isinstance(a_task, (ActivityTask, WorkflowTask)) and
+                a_task.id in self.cached_results):
+            future = futures.Future()
+            future.set_finished(self.cached_results[a_task.id])
 
         # in repair mode, check if we absolutely want to re-execute this task
         force_execution = (self.force_activities and
                            self.force_activities.search(a_task.id))
 
         # try to fill in the blanks with the workflow we're trying to repair if any
-        if not event and is_repair and not force_execution:
+        if not event and not future and is_repair and not force_execution:
             # try to find a former event matching this task
             former_event = self.find_event(a_task, self.repair_with)
             # ... but only keep the event if the task was successful
             if former_event and former_event['state'] == 'completed':
                 logger.info(
-                    'faking task completed successfully in previous '
+                    'reusing result of task completed successfully in previous '
                     'workflow: {}'.format(former_event['id'])
                 )
-                json_hash = hashlib.md5(json_dumps(former_event).encode('utf-8')).hexdigest()
-                fake_task_list = "FAKE-" + json_hash
-
-                # schedule task on a fake task list
-                self.schedule_task(a_task, task_list=fake_task_list)
-                future = futures.Future()
-
-                # start a dedicated process to handle the fake activity
-                run_fake_task_worker(self.domain.name, fake_task_list, former_event)
+                future = self.record_result(a_task, former_event['result'])
 
         # back to normal execution flow
         if event:
@@ -776,6 +774,12 @@ class Executor(executor.Executor):
             if event['type'] == 'activity':
                 if future and future.state in (futures.PENDING, futures.RUNNING):
                     self._open_activity_count += 1
+                elif (self.result_cache is not None and a_task.idempotent and
+                        event['state'] == 'completed'):
+                    self.save_to_result_cache(a_task, event)
+        elif (not future and self.result_cache is not None and
+                isinstance(a_task, ActivityTask) and a_task.idempotent):
+            future = self.resume_from_result_cache(a_task)
 
         if not future:
             self.schedule_task(a_task, task_list=self.task_list)
@@ -903,8 +907,8 @@ class Executor(executor.Executor):
 
         # noinspection PyUnresolvedReferences
         history = decision_response.history
-        self._history = History(history)
-        self._history.parse()
+        self._history = self.parse_history(decision_response)
+        self.prefetch_jumbo_fields()
         self.build_run_context(decision_response)
         # noinspection PyUnresolvedReferences
         self._execution = decision_response.execution
@@ -930,6 +934,8 @@ class Executor(executor.Executor):
             self.propagate_signals()
             result = self.run_workflow(*args, **kwargs)
         except exceptions.ExecutionBlocked:
+            if self._continue_as_new_input is not None:
+                return self._continue_as_new(self._continue_as_new_input, decref_workflow)
             logger.info('{} open activities ({} decisions)'.format(
                 self._open_activity_count,
                 len(self._decisions_and_context.decisions),
@@ -944,6 +950,8 @@ class Executor(executor.Executor):
                 self.maybe_clear_execution_context()
 
             return self._decisions_and_context
+        except exceptions.ContinueAsNew as err:
+            return self._continue_as_new(err.input, decref_workflow)
         except exceptions.TaskException as err:
             reason = 'Workflow execution error in task {}: "{}"'.format(
                 err.task.name,
@@ -994,6 +1002,89 @@ class Executor(executor.Executor):
             self.decref_workflow()
         return DecisionsAndContext([decision])
 
+    def _continue_as_new(self, input, decref_workflow):
+        """
+        Close the execution with a continue-as-new decision, dropping the
+        decisions made by this replay.
+
+        :param input: input of the new run
+        :type input: dict[str, Any]
+        :param decref_workflow: decref workflow once replay is done
+        :type decref_workflow: bool
+        :rtype: DecisionsAndContext
+        """
+        logger.info('continuing as new after {} events'.format(self._history.last_event_id))
+        started_event = self._history.events[0]
+        task_list = getattr(started_event, 'task_list', None)
+        decision = swf.models.decision.WorkflowExecutionDecision()
+        decision.continue_as_new(
+            child_policy=getattr(started_event, 'child_policy', None),
+            execution_timeout=getattr(started_event, 'execution_start_to_close_timeout', None),
+            task_timeout=getattr(started_event, 'task_start_to_close_timeout', None),
+            input=input,
+            tag_list=getattr(started_event, 'tag_list', None),
+            task_list=task_list['name'] if task_list else None,
+        )
+        self.after_replay()
+        self.after_closed()
+        if decref_workflow:
+            self.decref_workflow()
+        return DecisionsAndContext([decision])
+
+    def get_history(self):
+        return self._history
+
+    def continue_as_new_if_needed(self, *args, **kwargs):
+        """
+        Remember to continue as new if the history is too large.
+
+        The workflow goes on: we only continue as new if the replay blocks
+        before finding another task in the history (see resume()), so that
+        the new run starts where this one stopped.
+        """
+        if self._workflow.should_continue_as_new(self.get_history()):
+            self._continue_as_new_input = {
+                'args': args,
+                'kwargs': kwargs,
+            }
+
+    def parse_history(self, decision_response):
+        """
+        Parse the history of a decision task, incrementally if we have a
+        history cache and already parsed a previous version of it.
+
+        :param decision_response: an object wrapping the PollForDecisionTask response
+        :type decision_response: swf.responses.Response
+        :rtype: History
+        """
+        # noinspection PyUnresolvedReferences
+        execution = decision_response.execution
+        # noinspection PyUnresolvedReferences
+        swf_history = decision_response.history
+        if self.history_cache is not None and execution:
+            return self.history_cache.get(execution.workflow_id, execution.run_id, swf_history)
+        history = History(swf_history)
+        history.parse()
+        return history
+
+    def prefetch_jumbo_fields(self):
+        """
+        Pull the jumbo fields the replay is going to decode concurrently: the
+        workflow input, the task results and the marker details.
+        """
+        def contents():
+            events = self._history.events
+            if events and events[0].name == 'WorkflowExecutionStarted':
+                yield events[0].raw['workflowExecutionStartedEventAttributes'].get('input')
+            for a_task in self._history.tasks:
+                if a_task.get('state') == 'completed':
+                    yield a_task.get('result')
+            for markers in self._history.markers.values():
+                for marker in markers:
+                    yield marker.get('details')
+
+        format.prefetch_jumbo_fields(contents())
+
     def maybe_clear_execution_context(self):
         """
         Replace a null execution_context with an empty string if the preceding one was set.
@@ -1045,6 +1136,7 @@ class Executor(executor.Executor):
 
     def fail(self, reason, details=None):
         self.on_failure(reason, details)
+        self._continue_as_new_input = None
 
         decision = swf.models.decision.WorkflowExecutionDecision()
         decision.fail(
@@ -1193,10 +1285,13 @@ class Executor(executor.Executor):
         if all:
             return [
                 Marker(m['name'], format.decode(m['details']))
-                for ml in self._history.markers.values() for m in ml
+                for name, ml in self._history.markers.items() for m in ml
+                if name != constants.CACHED_RESULT_MARKER
             ]
         rc = []
-        for ml in self._history.markers.values():
+        for name, ml in self._history.markers.items():
+            if name == constants.CACHED_RESULT_MARKER:
+                continue
             m = ml[-1]
             if m['state'] == 'recorded':
                 rc.append(Marker(m['name'], format.decode(m['details'])))
@@ -1206,19 +1301,11 @@ class Executor(executor.Executor):
         if event_type == 'signal':
             return self._history.signals.get(event_name)
         elif event_type == 'marker':
-            marker_list = self._history.markers.get(event_name)
-            if not marker_list:
-                return None
-            marker_list = list(
-                filter(
-                    lambda m: m['state'] == 'recorded',
-                    marker_list
-                )
-            )
-            if not marker_list:
+            marker = self._history.find_last_recorded_marker(event_name)
+            if not marker:
                 return None
             # Make pleasing details
-            marker = copy.copy(marker_list[-1])
+            marker = copy.copy(marker)
             marker['details'] = format.decode(marker['details'])
             return marker
         elif event_type == 'timer':
@@ -8,15 +8,21 @@ from swf import format
 import swf.actors
 import swf.exceptions
 import swf.models.decision
+from swf.actors.decider import PageFetcher
+from swf.models.event import EventFactory
+from swf.models.history import History
 
 from simpleflow.process import Supervisor, with_state
 from simpleflow.swf.process import Poller
 from simpleflow.swf.utils import DecisionsAndContext
+from .pool import DeciderPool
 
 
 if False:
     from typing import Any, List, Optional, Union  # NOQA
     from swf.responses import Response  # NOQA
+    from simpleflow.history import HistoryCache, HistoryCheckpoints  # NOQA
+    from simpleflow.result_cache import ResultCache  # NOQA
     from simpleflow.swf.executor import Executor  # NOQA
 
 
@@ -48,6 +54,19 @@ class DeciderPoller(Poller, swf.actors.Decider):
     :type _workflow_executors: Dict[str, Executor]
     :ivar nb_retries: # of retries allowed
     :type nb_retries: int
+    :ivar history_cache: parsed histories cache shared by the executors, if any
+    :type history_cache: Optional[HistoryCache]
+    :ivar pool_size: # of pre-forked decision processes; fork on each decision task if None
+    :type pool_size: Optional[int]
+    :ivar pool_max_decisions: recycle a pool process after this many decisions
+    :type pool_max_decisions: Optional[int]
+    :ivar pool_max_rss: recycle a pool process when its RSS exceeds this many bytes
+    :type pool_max_rss: Optional[int]
+    :ivar history_checkpoints: parsed histories saved after each decision; if
+        set, histories are fetched backwards down to the last known event
+    :type history_checkpoints: Optional[HistoryCheckpoints]
+    :ivar result_cache: results of idempotent activities shared by the executors, if any
+    :type result_cache: Optional[ResultCache]
     """
     def __init__(self,
                  workflow_executors,  # type: List[Executor]
@@ -55,6 +74,12 @@ class DeciderPoller(Poller, swf.actors.Decider):
                  task_list,  # type: str
                  is_standalone,  # type: bool
                  nb_retries=3,  # type: int
+                 history_cache=None,  # type: Optional[HistoryCache]
+                 pool_size=None,  # type: Optional[int]
+                 pool_max_decisions=None,  # type: Optional[int]
+                 pool_max_rss=None,  # type: Optional[int]
+                 history_checkpoints=None,  # type: Optional[HistoryCheckpoints]
+                 result_cache=None,  # type: Optional[ResultCache]
                  *args,
                  **kwargs
                  ):
@@ -77,8 +102,18 @@ class DeciderPoller(Poller, swf.actors.Decider):
 
         :param workflow_executors: executors handling workflow executions.
         :type  workflow_executors: list[simpleflow.swf.executor.Executor]
+        :param pool_size: if set, decision tasks are sent to this many
+                          long-lived processes instead of forking for each one.
+        :type  pool_size: Optional[int]
+        :param history_checkpoints: if set, only fetch the events that
+                                    were added since the previous decision;
+                                    requires a history cache.
+        :type  history_checkpoints: Optional[HistoryCheckpoints]
 
         """
+        if history_checkpoints is not None and history_cache is None:
+            raise ValueError('history checkpoints require a history cache')
+
         self.workflow_name = '{}'.format(','.join(
             [
                 ex.workflow_class.name for ex in workflow_executors
@@ -101,6 +136,13 @@ class DeciderPoller(Poller, swf.actors.Decider):
         self.nb_retries = nb_retries
         self.domain = domain
         self.is_standalone = is_standalone
+        self.history_cache = history_cache
+        self.pool_size = pool_size
+        self.pool_max_decisions = pool_max_decisions
+        self.pool_max_rss = pool_max_rss
+        self._pool = None  # type: Optional[DeciderPool]
+        self.history_checkpoints = history_checkpoints
+        self.result_cache = result_cache
 
         # All executors must have the same domain.
         self._check_all_domains_identical()
@@ -144,10 +186,196 @@ class DeciderPoller(Poller, swf.actors.Decider):
             suffix = ''
         return '{}{}'.format(self.__class__.__name__, suffix)
 
+    def start(self):
+        try:
+            super(DeciderPoller, self).start()
+        finally:
+            self.stop_pool()
+
+    @property
+    def pool(self):
+        """
+        Decision processes pool, started on first use.
+
+        :rtype: Optional[DeciderPool]
+        """
+        if self.pool_size and self._pool is None:
+            self._pool = DeciderPool(
+                self,
+                self.pool_size,
+                max_decisions=self.pool_max_decisions,
+                max_rss=self.pool_max_rss,
+            )
+            self._pool.start()
+        return self._pool
+
+    def stop_pool(self):
+        """
+        Wait for the pool processes to finish their decisions and stop them.
+        """
+        if self._pool is not None:
+            self._pool.stop()
+            self._pool = None
+
     @with_state('polling')
     def poll(self, task_list=None, identity=None, **kwargs):
+        if self.history_checkpoints is not None:
+            return self.poll_since_checkpoint(task_list, identity, **kwargs)
+        if self.history_cache is not None and not self.pool_size:
+            # Parse the history while the next pages are downloaded; the
+            # forked decision process inherits the parsed history.
+            kwargs.setdefault('on_page', self._parse_page)
         return swf.actors.Decider.poll(self, task_list, identity, **kwargs)
 
+    def _parse_page(self, task, history):
+        """
+        Parse the events of a new history page into the history cache.
+
+        :param task: PollForDecisionTask payload
+        :type task: dict[str, Any]
+        :param history: history so far
+        :type history: swf.models.history.History
+        """
+        execution = task['workflowExecution']
+        self.history_cache.get(execution['workflowId'], execution['runId'], history)
+
+    def poll_since_checkpoint(self, task_list=None, identity=None, **kwargs):
+        """
+        Poll a decision task, fetching its history backwards until we reach
+        the last event of the checkpoint, i.e. the history parsed for the
+        previous decision task of this execution. We fall back to fetching
+        the whole history when there is no checkpoint or it doesn't match.
+
+        :returns: a Response object with the full history, token, and execution set
+        :rtype: swf.responses.Response
+        """
+        task_list = task_list or self.task_list
+
+        def get_page(next_page):
+            return self.poll_page(task_list, identity, next_page, reverse_order=True, **kwargs)
+
+        task = get_page(None)
+        execution = task['workflowExecution']
+        workflow_id, run_id = execution['workflowId'], execution['runId']
+        checkpoint = self.get_checkpoint(workflow_id, run_id)
+        last_event_id = checkpoint.last_event_id if checkpoint is not None else 0
+
+        new_events = []  # Newest first
+        found = False
+        fetcher = None
+        try:
+            while not found:
+                events = task.pop('events')
+                next_page = task.get('nextPageToken')
+                fetcher = None
+                if next_page and events and events[-1]['eventId'] > last_event_id:
+                    fetcher = PageFetcher(get_page, next_page)
+                for raw_event in events:
+                    event = EventFactory(raw_event)
+                    if event.id > last_event_id:
+                        new_events.append(event)
+                    elif checkpoint.is_last_event(event):
+                        found = True
+                        break
+                    else:
+                        logger.warning('history checkpoint of {} is stale, fetching the full history'.format(run_id))
+                        checkpoint, last_event_id = None, 0
+                        new_events.append(event)
+                if not next_page:
+                    break
+                if not found:
+                    task = fetcher.result() if fetcher else get_page(next_page)
+        finally:
+            # Don't leave a thread behind, e.g. when the checkpoint was found
+            # or an event can't be converted: deciders fork.
+            if fetcher:
+                fetcher.join()
+
+        new_events.reverse()
+        if checkpoint is not None and not found:
+            # Can't happen with a consistent history
+            logger.warning('history checkpoint of {} not found in the history'.format(run_id))
+            checkpoint = None
+        if checkpoint is None:
+            return self.cache_history(self.response_from_task(task, History(events=new_events)))
+        logger.debug('history of {}: fetched {} events after event {}'.format(
+            run_id, len(new_events), last_event_id))
+        return self.cache_history(self.response_from_checkpoint(task, checkpoint, new_events))
+
+    def response_from_checkpoint(self, task, checkpoint, new_events):
+        """
+        Build a Response from a PollForDecisionTask payload whose history is
+        the checkpoint followed by *new_events*. Its events are None up to
+        the last event of the checkpoint, except the ones saved with it.
+
+        :param task: PollForDecisionTask payload, without events
+        :type task: dict[str, Any]
+        :param checkpoint: parsed history of the previous decision task
+        :type checkpoint: simpleflow.history.History
+        :param new_events: events added since
+        :type new_events: list[swf.models.event.Event]
+        :returns: a Response object with history, token, execution and checkpoint set
+        :rtype: swf.responses.Response
+        """
+        events = checkpoint.swf_history.events[:checkpoint.last_event_id]
+        events.extend(new_events)
+        response = self.response_from_task(task, History(events=events))
+        response.checkpoint = checkpoint
+        return response
+
+    def cache_history(self, decision_response):
+        """
+        Parse the new events of a decision task into the history cache,
+        starting from its checkpoint if any. With a pool, this is left to the
+        pool process taking the decision.
+
+        :param decision_response:
+        :type decision_response: swf.responses.Response
+        :rtype: swf.responses.Response
+        """
+        if self.pool_size:
+            return decision_response
+        execution = decision_response.execution
+        workflow_id, run_id = execution.workflow_id, execution.run_id
+        checkpoint = getattr(decision_response, 'checkpoint', None)
+        if checkpoint is not None and self.history_cache.peek(workflow_id, run_id) is not checkpoint:
+            self.history_cache.put(workflow_id, run_id, checkpoint)
+        # Parse the new events before forking, like _parse_page().
+        self.history_cache.get(workflow_id, run_id, decision_response.history)
+        return decision_response
+
+    def get_checkpoint(self, workflow_id, run_id):
+        """
+        Parsed history of the previous decision task of this execution, from
+        the history cache, else from the checkpoints on disk. With a pool,
+        the histories are parsed by the pool processes, so we only rely on
+        the checkpoints.
+
+        :rtype: Optional[simpleflow.history.History]
+        """
+        history = None
+        if not self.pool_size:
+            history = self.history_cache.peek(workflow_id, run_id)
+        if history is None or not history.last_event_id:
+            history = self.history_checkpoints.load(run_id)
+        if history is None or not history.last_event_id:
+            return None
+        return history
+
+    def save_checkpoint(self, decision_response):
+        """
+        Save the parsed history of this decision task as the checkpoint of
+        its execution.
+
+        :param decision_response:
+        :type decision_response: swf.responses.Response
+        """
+        execution = decision_response.execution
+        history = self.history_cache.peek(execution.workflow_id, execution.run_id)
+        if history is None or history.last_event_id != len(decision_response.history):
+            return
+        self.history_checkpoints.save(execution.run_id, history)
+
     @with_state('completing')
     def complete(self, token, decisions=None, execution_context=None):
         # type: (str, Optional[List], Union[Optional[Any], DecisionsAndContext], Optional) -> None
@@ -168,12 +396,17 @@ class DeciderPoller(Poller, swf.actors.Decider):
         Take a PollForDecisionTask response object and try to complete the
         decision task, by calling self._complete() with the response token and
         a set of decisions. We fork so it protects us reliably against memory
-        leaks on long-running deciders.
+        leaks on long-running deciders; with a pool, the decision is taken by
+        a long-lived process that is recycled periodically instead.
 
         :param decision_response: an object wrapping the PollForDecisionTask response.
         :type  decision_response: swf.responses.Response
         """
-        spawn(self, decision_response)
+        pool = self.pool
+        if pool is not None:
+            pool.submit(decision_response)
+        else:
+            spawn(self, decision_response)
 
     @with_state('deciding')
     def decide(self, decision_response):
@@ -187,7 +420,7 @@ class DeciderPoller(Poller, swf.actors.Decider):
         :return: the decisions.
         :rtype: Union[List[swf.models.decision.base.Decision], DecisionsAndContext]
         """
-        worker = DeciderWorker(self.domain, self._workflow_executors)
+        worker = DeciderWorker(self.domain, self._workflow_executors, self.history_cache, self.result_cache)
         decisions = worker.decide(decision_response, self.task_list if self.is_standalone else None)
         return decisions
 
@@ -199,11 +432,17 @@ class DeciderWorker(object):
     :type _domain: swf.models.Domain
     :ivar _workflow_executors: executors.
     :type _workflow_executors: dict[str, simpleflow.swf.executor.Executor]
+    :ivar _history_cache: parsed histories cache, if any.
+    :type _history_cache: Optional[HistoryCache]
+    :ivar _result_cache: results of idempotent activities, if any.
+    :type _result_cache: Optional[ResultCache]
     """
 
-    def __init__(self, domain, workflow_executors):
+    def __init__(self, domain, workflow_executors, history_cache=None, result_cache=None):
         self._domain = domain
         self._workflow_executors = workflow_executors
+        self._history_cache = history_cache
+        self._result_cache = result_cache
 
     def decide(self, decision_response, task_list):
         """
@@ -227,6 +466,8 @@ class DeciderWorker(object):
                 self._domain,
                 workflow_name,
                 task_list=task_list,
+                history_cache=self._history_cache,
+                result_cache=self._result_cache,
             )
             self._workflow_executors[workflow_name] = workflow_executor
         try:
@@ -249,13 +490,15 @@ def process_decision(poller, decision_response):
     workflow_str = "workflow {} ({})".format(workflow_id, poller.workflow_name)
     logger.debug("process_decision() pid={}".format(os.getpid()))
     logger.info("taking decision for {}".format(workflow_str))
-    format.JUMBO_FIELDS_MEMORY_CACHE.clear()
     decisions = poller.decide(decision_response)
     try:
         logger.info("completing decision for {}".format(workflow_str))
         poller.complete_with_retry(decision_response.token, decisions)
     except Exception as err:
         logger.error("cannot complete decision for {}: {}".format(workflow_str, err))
+    if poller.history_checkpoints is not None:
+        poller.save_checkpoint(decision_response)
+    logger.debug("jumbo fields cache: {}".format(format.JUMBO_FIELDS_MEMORY_CACHE.get_stats()))
 
 
 def spawn(poller, decision_response):
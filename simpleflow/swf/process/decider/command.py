@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 import logging
 
+from simpleflow.process import preload_modules
 from . import helpers
 
 
@@ -10,6 +11,11 @@ logger = logging.getLogger(__name__)
 def start(workflows, domain, task_list, log_level=None, nb_processes=None,
           repair_with=None, force_activities=None, is_standalone=False,
           repair_workflow_id=None, repair_run_id=None,
+          history_cache_size=None,
+          pool_size=None, pool_max_decisions=None, pool_max_rss=None,
+          history_checkpoints=False,
+          result_cache=None, result_cache_expire=None, result_cache_size_limit=None,
+          preload=None,
           ):
     """
     Start a decider.
@@ -33,11 +39,35 @@ def start(workflows, domain, task_list, log_level=None, nb_processes=None,
     :type repair_workflow_id: Optional[str]
     :param repair_run_id: run ID to repair
     :type repair_run_id: Optional[str]
+    :param history_cache_size: keep parsed histories of up to N executions between
+        decision tasks (disabled if not set)
+    :type history_cache_size: Optional[int]
+    :param pool_size: take decisions in N long-lived processes instead of
+        forking on each decision task
+    :type pool_size: Optional[int]
+    :param pool_max_decisions: recycle a pool process after N decisions
+    :type pool_max_decisions: Optional[int]
+    :param pool_max_rss: recycle a pool process when its RSS exceeds N bytes
+    :type pool_max_rss: Optional[int]
+    :param history_checkpoints: save parsed histories on disk and only fetch
+        the new events of the next decision tasks
+    :type history_checkpoints: bool
+    :param result_cache: complete idempotent activities with the results cached
+        at this location: a directory or "s3://<bucket>[/<prefix>]" (disabled if not set)
+    :type result_cache: Optional[str]
+    :param result_cache_expire: drop cached results after N seconds
+    :type result_cache_expire: Optional[int]
+    :param result_cache_size_limit: max size of a disk result cache, in bytes
+    :type result_cache_size_limit: Optional[int]
+    :param preload: modules to import before forking the decider processes, on
+        top of the modules of the workflows
+    :type preload: Optional[list[str]]
     """
     if log_level:
         logger.warning(
             "Deprecated: --log-level will be removed, use LOG_LEVEL environment variable instead"
         )
+    preload_modules([workflow.rsplit('.', 1)[0] for workflow in workflows] + list(preload or []))
     decider = helpers.make_decider(
         workflows, domain, task_list, nb_processes,
         repair_with=repair_with,
@@ -45,6 +75,14 @@ def start(workflows, domain, task_list, log_level=None, nb_processes=None,
         is_standalone=is_standalone,
         repair_workflow_id=repair_workflow_id,
         repair_run_id=repair_run_id,
+        history_cache_size=history_cache_size,
+        pool_size=pool_size,
+        pool_max_decisions=pool_max_decisions,
+        pool_max_rss=pool_max_rss,
+        history_checkpoints=history_checkpoints,
+        result_cache=result_cache,
+        result_cache_expire=result_cache_expire,
+        result_cache_size_limit=result_cache_size_limit,
     )
     decider.is_alive = True
     decider.start()
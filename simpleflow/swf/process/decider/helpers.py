@@ -2,6 +2,8 @@ import logging
 
 import swf.models
 
+from simpleflow.history import HistoryCache, HistoryCheckpoints
+from simpleflow.result_cache import make_result_cache
 from simpleflow.swf.executor import Executor
 from . import (
     Decider,
@@ -14,6 +16,8 @@ logger = logging.getLogger(__name__)
 def load_workflow_executor(domain, workflow_name, task_list=None, repair_with=None,
                            force_activities=None,
                            repair_workflow_id=None, repair_run_id=None,
+                           history_cache=None,
+                           result_cache=None,
                            ):
     """
     Load a workflow executor.
@@ -32,6 +36,10 @@ def load_workflow_executor(domain, workflow_name, task_list=None, repair_with=No
     :type repair_workflow_id: Optional[str]
     :param repair_run_id: run ID to repair
     :type repair_run_id: Optional[str]
+    :param history_cache: parsed histories cache, shared between executors
+    :type history_cache: Optional[HistoryCache]
+    :param result_cache: results of idempotent activities, shared between executors
+    :type result_cache: Optional[simpleflow.result_cache.ResultCache]
     :return: Executor for this workflow
     :rtype: Executor
     """
@@ -51,6 +59,8 @@ def load_workflow_executor(domain, workflow_name, task_list=None, repair_with=No
         force_activities=force_activities,
         repair_workflow_id=repair_workflow_id,
         repair_run_id=repair_run_id,
+        history_cache=history_cache,
+        result_cache=result_cache,
     )
 
 
@@ -58,6 +68,10 @@ def make_decider_poller(workflows, domain, task_list, repair_with=None,
                         force_activities=None,
                         is_standalone=False,
                         repair_workflow_id=None, repair_run_id=None,
+                        history_cache_size=None,
+                        pool_size=None, pool_max_decisions=None, pool_max_rss=None,
+                        history_checkpoints=False,
+                        result_cache=None, result_cache_expire=None, result_cache_size_limit=None,
                         ):
     """
     Factory building a decider poller.
@@ -77,6 +91,24 @@ def make_decider_poller(workflows, domain, task_list, repair_with=None,
     :type repair_workflow_id: Optional[str]
     :param repair_run_id: run ID to repair
     :type repair_run_id: Optional[str]
+    :param history_cache_size: keep parsed histories of up to N executions (disabled if not set)
+    :type history_cache_size: Optional[int]
+    :param pool_size: take decisions in N long-lived processes instead of forking each time
+    :type pool_size: Optional[int]
+    :param pool_max_decisions: recycle a pool process after N decisions
+    :type pool_max_decisions: Optional[int]
+    :param pool_max_rss: recycle a pool process when its RSS exceeds N bytes
+    :type pool_max_rss: Optional[int]
+    :param history_checkpoints: save parsed histories on disk and only fetch
+        the new events of the next decision tasks
+    :type history_checkpoints: bool
+    :param result_cache: complete idempotent activities with the results cached
+        at this location: a directory or "s3://<bucket>[/<prefix>]" (disabled if not set)
+    :type result_cache: Optional[str]
+    :param result_cache_expire: drop cached results after N seconds
+    :type result_cache_expire: Optional[int]
+    :param result_cache_size_limit: max size of a disk result cache, in bytes
+    :type result_cache_size_limit: Optional[int]
     :return:
     :rtype: DeciderPoller
     """
@@ -86,6 +118,13 @@ def make_decider_poller(workflows, domain, task_list, repair_with=None,
         # definition, seems like good practice (?)
         raise ValueError("Sorry you can't repair more than 1 workflow at once!")
 
+    history_cache = None
+    if history_cache_size:
+        history_cache = HistoryCache(history_cache_size)
+    elif history_checkpoints:
+        history_cache = HistoryCache()
+    if result_cache:
+        result_cache = make_result_cache(result_cache, result_cache_expire, result_cache_size_limit)
     executors = [
         load_workflow_executor(
             domain, workflow, task_list if is_standalone else None,
@@ -93,17 +132,30 @@ def make_decider_poller(workflows, domain, task_list, repair_with=None,
             force_activities=force_activities,
             repair_workflow_id=repair_workflow_id,
             repair_run_id=repair_run_id,
+            history_cache=history_cache,
+            result_cache=result_cache,
         )
         for workflow in workflows
         ]
     domain = swf.models.Domain(domain)
-    return DeciderPoller(executors, domain, task_list, is_standalone)
+    return DeciderPoller(executors, domain, task_list, is_standalone,
+                         history_cache=history_cache,
+                         pool_size=pool_size,
+                         pool_max_decisions=pool_max_decisions,
+                         pool_max_rss=pool_max_rss,
+                         history_checkpoints=HistoryCheckpoints() if history_checkpoints else None,
+                         result_cache=result_cache,
+                         )
 
 
 def make_decider(workflows, domain, task_list, nb_children=None,
                  repair_with=None, force_activities=None,
                  is_standalone=False,
                  repair_workflow_id=None, repair_run_id=None,
+                 history_cache_size=None,
+                 pool_size=None, pool_max_decisions=None, pool_max_rss=None,
+                 history_checkpoints=False,
+                 result_cache=None, result_cache_expire=None, result_cache_size_limit=None,
                  ):
     """
     Instantiate a Decider.
@@ -125,6 +177,24 @@ def make_decider(workflows, domain, task_list, nb_children=None,
     :type repair_workflow_id: Optional[str]
     :param repair_run_id: run ID to repair
     :type repair_run_id: Optional[str]
+    :param history_cache_size: keep parsed histories of up to N executions (disabled if not set)
+    :type history_cache_size: Optional[int]
+    :param pool_size: take decisions in N long-lived processes instead of forking each time
+    :type pool_size: Optional[int]
+    :param pool_max_decisions: recycle a pool process after N decisions
+    :type pool_max_decisions: Optional[int]
+    :param pool_max_rss: recycle a pool process when its RSS exceeds N bytes
+    :type pool_max_rss: Optional[int]
+    :param history_checkpoints: save parsed histories on disk and only fetch
+        the new events of the next decision tasks
+    :type history_checkpoints: bool
+    :param result_cache: complete idempotent activities with the results cached
+        at this location: a directory or "s3://<bucket>[/<prefix>]" (disabled if not set)
+    :type result_cache: Optional[str]
+    :param result_cache_expire: drop cached results after N seconds
+    :type result_cache_expire: Optional[int]
+    :param result_cache_size_limit: max size of a disk result cache, in bytes
+    :type result_cache_size_limit: Optional[int]
     :return:
     :rtype: Decider
     """
@@ -134,5 +204,13 @@ def make_decider(workflows, domain, task_list, nb_children=None,
                                  is_standalone=is_standalone,
                                  repair_workflow_id=repair_workflow_id,
                                  repair_run_id=repair_run_id,
+                                 history_cache_size=history_cache_size,
+                                 pool_size=pool_size,
+                                 pool_max_decisions=pool_max_decisions,
+                                 pool_max_rss=pool_max_rss,
+                                 history_checkpoints=history_checkpoints,
+                                 result_cache=result_cache,
+                                 result_cache_expire=result_cache_expire,
+                                 result_cache_size_limit=result_cache_size_limit,
                                  )
     return Decider(poller, nb_children=nb_children)
@@ -0,0 +1,300 @@
+from __future__ import absolute_import
+
+import logging
+import multiprocessing
+import os
+import select
+import signal
+
+import psutil
+
+from simpleflow.history import History
+from swf.core import ConnectedSWFObject
+from swf.models.event import EventFactory
+
+
+if False:
+    from typing import List, Optional  # NOQA
+    from swf.responses import Response  # NOQA
+    from simpleflow.swf.process.decider.base import DeciderPoller  # NOQA
+
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['DeciderPool']
+
+
+def task_from_response(decision_response):
+    """
+    Turn a decision response back into a PollForDecisionTask payload that can
+    be sent to another process. If its history was resumed from a
+    checkpoint, the payload holds the checkpoint and the events added since.
+
+    :param decision_response:
+    :type decision_response: swf.responses.Response
+    :rtype: dict[str, Any]
+    """
+    execution = decision_response.execution
+    events = decision_response.history.events
+    task = {
+        'taskToken': decision_response.token,
+        'workflowType': {
+            'name': execution.workflow_type.name,
+            'version': execution.workflow_type.version,
+        },
+        'workflowExecution': {
+            'workflowId': execution.workflow_id,
+            'runId': execution.run_id,
+        },
+    }
+    checkpoint = getattr(decision_response, 'checkpoint', None)
+    if checkpoint is not None:
+        task['checkpoint'] = checkpoint.get_checkpoint()
+        events = events[checkpoint.last_event_id:]
+    task['events'] = [event.raw for event in events]
+    return task
+
+
+def response_from_task(poller, task):
+    """
+    Rebuild the decision response sent by task_from_response(). A checkpoint
+    is added to the history cache, so that only the new events are parsed.
+
+    :param poller:
+    :type poller: DeciderPoller
+    :param task:
+    :type task: dict[str, Any]
+    :rtype: swf.responses.Response
+    """
+    checkpoint = task.pop('checkpoint', None)
+    if checkpoint is None:
+        return poller.response_from_task(task)
+
+    checkpoint = History.from_checkpoint(checkpoint)
+    new_events = [EventFactory(raw_event) for raw_event in task.pop('events')]
+    response = poller.response_from_checkpoint(task, checkpoint, new_events)
+    execution = response.execution
+    poller.history_cache.put(execution.workflow_id, execution.run_id, checkpoint)
+    return response
+
+
+def run_pool_worker(poller, conn, max_decisions=None, max_rss=None):
+    """
+    Main loop of a pool worker: take decisions until told to stop or until it
+    should be recycled.
+
+    :param poller:
+    :type poller: DeciderPoller
+    :param conn: our end of the pipe
+    :type conn: multiprocessing.connection.Connection
+    :param max_decisions: recycle after this many decisions
+    :type max_decisions: Optional[int]
+    :param max_rss: recycle when the RSS exceeds this many bytes
+    :type max_rss: Optional[int]
+    """
+    from .base import process_decision
+
+    # The poller handles shutdown: finish the current decision, then stop
+    # when it closes the pipe or sends None.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+    # Don't share the parent's SWF connection: it keeps polling meanwhile.
+    poller.connection = ConnectedSWFObject().connection
+
+    process = psutil.Process()
+    nb_decisions = 0
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        process_decision(poller, response_from_task(poller, task))
+        nb_decisions += 1
+
+        rss = process.memory_info().rss
+        recycle = bool(
+            (max_decisions and nb_decisions >= max_decisions) or
+            (max_rss and rss > max_rss)
+        )
+        conn.send((recycle, rss))
+        if recycle:
+            logger.info('decider pool worker pid={} recycled after {} decisions (rss={})'.format(
+                os.getpid(), nb_decisions, rss))
+            break
+
+
+class PoolWorker(object):
+    """
+    Handle on a pool worker process.
+
+    :ivar process:
+    :type process: multiprocessing.Process
+    :ivar conn: our end of the pipe
+    :type conn: multiprocessing.connection.Connection
+    :ivar busy: whether it's taking a decision
+    :type busy: bool
+    :ivar run_id: run of the last decision task it got
+    :type run_id: Optional[str]
+    """
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.busy = False
+        self.run_id = None
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def fileno(self):
+        return self.conn.fileno()
+
+
+class DeciderPool(object):
+    """
+    Pool of pre-forked decision processes.
+
+    The poller sends them decision tasks over a pipe, so it can poll again
+    while they decide. Each process handles many decision tasks, keeping its
+    caches warm, and is replaced after *max_decisions* decisions or once its
+    RSS exceeds *max_rss*, to keep the protection against memory leaks that
+    forking on each decision task provides.
+
+    :ivar _poller:
+    :type _poller: DeciderPoller
+    :ivar size: number of processes
+    :type size: int
+    :ivar max_decisions: recycle after this many decisions
+    :type max_decisions: Optional[int]
+    :ivar max_rss: recycle when the RSS exceeds this many bytes
+    :type max_rss: Optional[int]
+    :ivar _workers:
+    :type _workers: List[PoolWorker]
+    """
+    def __init__(self, poller, size, max_decisions=None, max_rss=None):
+        if size < 1:
+            raise ValueError('decider pool size must be >= 1')
+        self._poller = poller
+        self.size = size
+        self.max_decisions = max_decisions
+        self.max_rss = max_rss
+        self._workers = []
+
+    def __repr__(self):
+        return '{}(size={}, max_decisions={}, max_rss={})'.format(
+            self.__class__.__name__,
+            self.size,
+            self.max_decisions,
+            self.max_rss,
+        )
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def _spawn_worker(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=run_pool_worker,
+            args=(self._poller, child_conn, self.max_decisions, self.max_rss),
+        )
+        process.start()
+        child_conn.close()
+        worker = PoolWorker(process, parent_conn)
+        logger.debug('decider pool: started worker pid={}'.format(worker.pid))
+        return worker
+
+    def start(self):
+        """
+        Start missing workers.
+        """
+        while len(self._workers) < self.size:
+            self._workers.append(self._spawn_worker())
+
+    def _retire(self, worker):
+        worker.conn.close()
+        worker.process.join()
+        self._workers.remove(worker)
+
+    def _collect(self, timeout):
+        """
+        Wait up to *timeout* seconds for busy workers to report, and replace
+        the ones that were recycled or died.
+        """
+        busy = [w for w in self._workers if w.busy]
+        if not busy:
+            return
+        ready, _, _ = select.select(busy, [], [], timeout)
+        for worker in ready:
+            try:
+                recycle, rss = worker.conn.recv()
+            except EOFError:
+                # The decision task will time out on SWF's side.
+                logger.error('decider pool: worker pid={} died while deciding'.format(worker.pid))
+                recycle = True
+            worker.busy = False
+            if recycle:
+                self._retire(worker)
+
+        for worker in [w for w in self._workers if not w.busy and not w.process.is_alive()]:
+            logger.error('decider pool: idle worker pid={} died (exitcode={})'.format(
+                worker.pid, worker.process.exitcode))
+            self._retire(worker)
+
+    def _idle_worker(self, run_id):
+        """
+        Wait for an idle worker, preferably the one that handled the last
+        decision task of *run_id*: its caches are warm for this execution.
+
+        :rtype: PoolWorker
+        """
+        while True:
+            self._collect(timeout=0)
+            self.start()
+            idle = [w for w in self._workers if not w.busy]
+            if idle:
+                return next((w for w in idle if w.run_id == run_id), idle[0])
+            self._collect(timeout=None)
+
+    def submit(self, decision_response):
+        """
+        Hand a decision task to an idle worker, waiting for one to be
+        available if needed. If it cannot be sent, the worker is replaced
+        and the task sent to another one.
+
+        :param decision_response:
+        :type decision_response: swf.responses.Response
+        :raise IOError|OSError: the task could not be sent to any worker
+        """
+        task = task_from_response(decision_response)
+        run_id = task['workflowExecution']['runId']
+        for attempt in range(self.size + 1):
+            worker = self._idle_worker(run_id)
+            try:
+                worker.conn.send(task)
+            except (IOError, OSError) as err:
+                logger.error('decider pool: cannot send task to worker pid={}: {}'.format(worker.pid, err))
+                self._retire(worker)
+                if attempt == self.size:
+                    raise
+                continue
+            worker.busy = True
+            worker.run_id = run_id
+            return
+
+    def stop(self):
+        """
+        Wait for running decisions, then stop the workers.
+        """
+        while any(w.busy for w in self._workers):
+            self._collect(timeout=None)
+        for worker in list(self._workers):
+            try:
+                worker.conn.send(None)
+            except (IOError, OSError):
+                pass
+            self._retire(worker)
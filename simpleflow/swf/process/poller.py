@@ -2,6 +2,7 @@ import abc
 import logging
 import os
 import signal
+import time
 
 import swf.actors
 import swf.exceptions
@@ -72,12 +73,18 @@ class Poller(swf.actors.Actor, NamedMixin):
         self.bind_signal_handlers()
         self.is_alive = True
         self.set_process_name()
+        first_task = True
         while self.is_alive:
             try:
                 response = self.poll_with_retry()
             except swf.exceptions.PollTimeout:
                 continue
+            start = time.time()
             self.process(response)
+            if first_task:
+                # Cold start latency, see simpleflow.process.preload_modules()
+                logger.info('{}: first task processed in {:.3f}s'.format(self.name, time.time() - start))
+                first_task = False
 
     @with_state('running')
     def run_once(self):
@@ -9,8 +9,6 @@ import sys
 import traceback
 import uuid
 
-import psutil
-
 from simpleflow.exceptions import ExecutionError
 from swf import format
 import swf.actors
@@ -46,7 +44,9 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
     Polls an activity and handles it in the worker.
 
     """
-    def __init__(self, domain, task_list, heartbeat=60, process_mode=None, poll_data=None):
+    def __init__(self, domain, task_list, heartbeat=60, process_mode=None, poll_data=None,
+                 concurrency=None, heartbeat_rate=None,
+                 warm_executor=False, executor_max_tasks=None, executor_max_rss=None):
         """
 
         :param domain:
@@ -57,6 +57,17 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
         :type heartbeat:
         :param process_mode: Whether to process locally (default) or spawn a Kubernetes job.
         :type process_mode: Optional[str]
+        :param concurrency: Max # of tasks processed at once by this poller (default: 1).
+        :type concurrency: Optional[int]
+        :param heartbeat_rate: Max # of heartbeats per second sent by this poller when processing
+                               several tasks at once.
+        :type heartbeat_rate: Optional[float]
+        :param warm_executor: Process tasks in a long-lived process instead of forking for each one.
+        :type warm_executor: bool
+        :param executor_max_tasks: Recycle the warm executor after N tasks.
+        :type executor_max_tasks: Optional[int]
+        :param executor_max_rss: Recycle the warm executor when its RSS exceeds N bytes.
+        :type executor_max_rss: Optional[int]
         """
         self.nb_retries = 3
         # heartbeat=0 is a special value to disable heartbeating. We want to
@@ -68,6 +79,14 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
         assert self.process_mode in VALID_PROCESS_MODES, 'invalid process_mode "{}"'.format(self.process_mode)
 
         self.poll_data = poll_data
+        self.concurrency = concurrency or 1
+        self.heartbeat_rate = heartbeat_rate
+        if warm_executor and self.concurrency > 1:
+            raise ValueError('a warm executor processes one task at a time, it cannot be used with concurrency')
+        self.warm_executor = warm_executor
+        self.executor_max_tasks = executor_max_tasks
+        self.executor_max_rss = executor_max_rss
+        self._executor = None
         super(ActivityPoller, self).__init__(domain, task_list)
 
     @property
@@ -77,6 +96,60 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
             self.task_list,
         )
 
+    def start(self):
+        if self.concurrency > 1 and self.process_mode == 'local' and not self.poll_data:
+            self.start_pipeline()
+            return
+        try:
+            super(ActivityPoller, self).start()
+        finally:
+            self.stop_executor()
+
+    def run_once(self):
+        try:
+            super(ActivityPoller, self).run_once()
+        finally:
+            self.stop_executor()
+
+    @property
+    def executor(self):
+        """
+        Warm executor process, started on first use.
+
+        :rtype: Optional[WarmExecutor]
+        """
+        if self.warm_executor and self._executor is None:
+            from .warm import WarmExecutor
+
+            self._executor = WarmExecutor(
+                self,
+                max_tasks=self.executor_max_tasks,
+                max_rss=self.executor_max_rss,
+            )
+        return self._executor
+
+    def stop_executor(self):
+        """
+        Stop the warm executor process, if any.
+        """
+        if self._executor is not None:
+            self._executor.stop()
+            self._executor = None
+
+    @with_state('running')
+    def start_pipeline(self):
+        """
+        Like start(), but keep up to `concurrency` tasks in flight: the next
+        long-poll starts as soon as a slot frees up.
+        """
+        from .pipeline import ActivityPipeline
+
+        logger.info("starting %s on domain %s", self.name, self.domain.name)
+        self.bind_signal_handlers()
+        self.is_alive = True
+        self.set_process_name()
+        ActivityPipeline(self, self.concurrency, self._heartbeat, self.heartbeat_rate).run()
+
     @with_state('polling')
     def poll(self, task_list=None, identity=None):
         if self.poll_data:
@@ -88,6 +161,15 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
 
     def fake_poll(self):
         polled_activity_data = json.loads(b64decode(self.poll_data))
+        return self.response_from_poll_data(polled_activity_data)
+
+    def response_from_poll_data(self, polled_activity_data):
+        """
+        Build a Response from a PollForActivityTask payload.
+        :param polled_activity_data:
+        :type polled_activity_data: dict[str, Any]
+        :rtype: swf.responses.Response
+        """
         activity_task = BaseActivityTask.from_poll(
             self.domain,
             self.task_list,
@@ -108,6 +190,8 @@ class ActivityPoller(Poller, swf.actors.ActivityWorker):
         """
         if self.process_mode == "kubernetes":
             spawn_kubernetes_job(self, response.raw_response)
+        elif self.warm_executor:
+            self.executor.run(response, self._heartbeat)
         else:
             token = response.task_token
             task = response.activity_task
@@ -242,7 +326,6 @@ def process_task(poller, token, task):
     :type task: swf.models.ActivityTask
     """
     logger.debug('process_task() pid={}'.format(os.getpid()))
-    format.JUMBO_FIELDS_MEMORY_CACHE.clear()
     worker = ActivityWorker()
     worker.process(poller, token, task)
 
@@ -271,69 +354,107 @@ def spawn(poller, token, task, heartbeat=60):
     )
     worker.start()
 
-    def worker_alive():
-        return psutil.pid_exists(worker.pid)
-
-    while worker_alive():
+    while True:
+        # Returns as soon as the process exits (it waits on its sentinel).
         worker.join(timeout=heartbeat)
-        if not worker_alive():
-            # Most certainly unneeded: we'll see
-            if worker.exitcode is None:
-                # race condition, try and re-join
-                worker.join(timeout=0)
-                if worker.exitcode is None:
-                    logger.warning("process {} is dead but multiprocessing doesn't know it (simpleflow bug)".format(
-                        worker.pid
-                    ))
-            if worker.exitcode != 0:
-                poller.fail_with_retry(
-                    token,
-                    task,
-                    reason='process {} died: exit code {}'.format(
-                        worker.pid,
-                        worker.exitcode)
-                )
+        if not worker.is_alive():
+            reap_worker(poller, worker, token, task)
             return
         try:
-            logger.debug(
-                'heartbeating for pid={} (token={})'.format(worker.pid, token)
-            )
-            response = poller.heartbeat(token)
-        except swf.exceptions.DoesNotExistError as error:
-            # Either the task or the workflow execution no longer exists,
-            # let's kill the worker process.
-            logger.warning('heartbeat failed: {}'.format(error))
-            logger.warning('killing (KILL) worker with pid={}'.format(worker.pid))
-            try:
-                # The try/except protects us from a race condition: by the
-                # time we issue the os.kill() call, we're not 100% sure
-                # that the worker process is still alive.
-                os.kill(worker.pid, signal.SIGKILL)
-            except OSError as e:
-                # Compare errno to the errno for "No such process"
-                if e.errno != errno.ESRCH:
-                    # re-raise if we get an OSError for another reason
-                    raise
-                logger.warning('process was not here anymore, got OSError: {}'.format(e.strerror))
-            return
-        except swf.exceptions.RateLimitExceededError as error:
+            if not send_heartbeat(poller, worker, token, task):
+                return
+        except swf.exceptions.RateLimitExceededError:
             # ignore rate limit errors: high chances the next heartbeat will be
             # ok anyway, so it would be stupid to break the task for that
-            logger.warning(
-                'got a "ThrottlingException / Rate exceeded" when heartbeating for task {}: {}'.format(
-                    task.activity_type.name,
-                    error))
             continue
-        except Exception as error:
-            # Let's crash if it cannot notify the heartbeat failed.  The
-            # subprocess will become orphan and the heartbeat timeout may
-            # eventually trigger on Amazon SWF side.
-            logger.error('cannot send heartbeat for task {}: {}'.format(
+
+
+def reap_worker(poller, worker, token, task):
+    """
+    Fail the task if its process died with a non-zero exit code.
+    :param poller:
+    :type poller: ActivityPoller
+    :param worker: dead process
+    :type worker: multiprocessing.Process
+    :param token:
+    :type token: str
+    :param task:
+    :type task: swf.models.ActivityTask
+    """
+    # Most certainly unneeded: we'll see
+    if worker.exitcode is None:
+        # race condition, try and re-join
+        worker.join(timeout=0)
+        if worker.exitcode is None:
+            logger.warning("process {} is dead but multiprocessing doesn't know it (simpleflow bug)".format(
+                worker.pid
+            ))
+    if worker.exitcode != 0:
+        poller.fail_with_retry(
+            token,
+            task,
+            reason='process {} died: exit code {}'.format(
+                worker.pid,
+                worker.exitcode)
+        )
+
+
+def send_heartbeat(poller, worker, token, task):
+    """
+    Send a heartbeat for a task processed by *worker*. Kill the process if the
+    task no longer exists and terminate it if cancellation was requested.
+    :param poller:
+    :type poller: ActivityPoller
+    :param worker: running process
+    :type worker: multiprocessing.Process
+    :param token:
+    :type token: str
+    :param task:
+    :type task: swf.models.ActivityTask
+    :return: False if the process was told to stop, True otherwise.
+    :rtype: bool
+    :raise swf.exceptions.RateLimitExceededError: if throttled.
+    """
+    try:
+        logger.debug(
+            'heartbeating for pid={} (token={})'.format(worker.pid, token)
+        )
+        response = poller.heartbeat(token)
+    except swf.exceptions.DoesNotExistError as error:
+        # Either the task or the workflow execution no longer exists,
+        # let's kill the worker process.
+        logger.warning('heartbeat failed: {}'.format(error))
+        logger.warning('killing (KILL) worker with pid={}'.format(worker.pid))
+        try:
+            # The try/except protects us from a race condition: by the
+            # time we issue the os.kill() call, we're not 100% sure
+            # that the worker process is still alive.
+            os.kill(worker.pid, signal.SIGKILL)
+        except OSError as e:
+            # Compare errno to the errno for "No such process"
+            if e.errno != errno.ESRCH:
+                # re-raise if we get an OSError for another reason
+                raise
+            logger.warning('process was not here anymore, got OSError: {}'.format(e.strerror))
+        return False
+    except swf.exceptions.RateLimitExceededError as error:
+        # Let the caller decide when to retry.
+        logger.warning(
+            'got a "ThrottlingException / Rate exceeded" when heartbeating for task {}: {}'.format(
                 task.activity_type.name,
                 error))
-            raise
-
-        if response and response.get('cancelRequested'):
-            # Task cancelled.
-            worker.terminate()  # SIGTERM
-            return
+        raise
+    except Exception as error:
+        # Let's crash if it cannot notify the heartbeat failed.  The
+        # subprocess will become orphan and the heartbeat timeout may
+        # eventually trigger on Amazon SWF side.
+        logger.error('cannot send heartbeat for task {}: {}'.format(
+            task.activity_type.name,
+            error))
+        raise
+
+    if response and response.get('cancelRequested'):
+        # Task cancelled.
+        worker.terminate()  # SIGTERM
+        return False
+    return True
@@ -2,13 +2,15 @@ from __future__ import absolute_import
 
 import swf.models
 
+from simpleflow.process import preload_modules
 from .base import (
     Worker,
     ActivityPoller,
 )
 
 
-def make_worker_poller(domain, task_list, heartbeat, process_mode, poll_data):
+def make_worker_poller(domain, task_list, heartbeat, process_mode, poll_data, concurrency=None,
+                       heartbeat_rate=None, warm_executor=False, executor_max_tasks=None, executor_max_rss=None):
     """
     Make a worker poller for the domain and task list.
     :param domain:
@@ -21,15 +23,27 @@ def make_worker_poller(domain, task_list, heartbeat, process_mode, poll_data):
     :type process_mode: str
     :param poll_data: Base64 encoded poll data from SWF, in case you don't want to poll directly.
     :type poll_data: str
+    :param concurrency: Max # of tasks processed at once by each poller process.
+    :type concurrency: Optional[int]
+    :param heartbeat_rate: Max # of heartbeats per second sent by each poller process.
+    :type heartbeat_rate: Optional[float]
+    :param warm_executor: Process tasks in a long-lived process instead of forking for each one.
+    :type warm_executor: bool
+    :param executor_max_tasks: Recycle the warm executor after N tasks.
+    :type executor_max_tasks: Optional[int]
+    :param executor_max_rss: Recycle the warm executor when its RSS exceeds N bytes.
+    :type executor_max_rss: Optional[int]
     :return:
     :rtype: ActivityPoller
     """
     domain = swf.models.Domain(domain)
-    return ActivityPoller(domain, task_list, heartbeat, process_mode, poll_data)
+    return ActivityPoller(domain, task_list, heartbeat, process_mode, poll_data, concurrency, heartbeat_rate,
+                          warm_executor, executor_max_tasks, executor_max_rss)
 
 
 def start(domain, task_list, nb_processes=None, heartbeat=60, one_task=False,
-          process_mode=None, poll_data=None):
+          process_mode=None, poll_data=None, concurrency=None, heartbeat_rate=None,
+          warm_executor=False, executor_max_tasks=None, executor_max_rss=None, preload=None):
     """
     Start a worker for the given domain and task_list.
     :param domain:
@@ -46,8 +60,24 @@ def start(domain, task_list, nb_processes=None, heartbeat=60, one_task=False,
     :type process_mode: Optional[str]
     :param poll_data: Base64 encoded poll data from SWF, in case you don't want to poll directly.
     :type poll_data: Optional[str]
+    :param concurrency: Max # of tasks processed at once by each poller process. Default: 1
+    :type concurrency: Optional[int]
+    :param heartbeat_rate: Max # of heartbeats per second sent by each poller process (with concurrency > 1).
+    :type heartbeat_rate: Optional[float]
+    :param warm_executor: Process tasks in a long-lived process instead of forking for each one.
+    :type warm_executor: bool
+    :param executor_max_tasks: Recycle the warm executor after N tasks.
+    :type executor_max_tasks: Optional[int]
+    :param executor_max_rss: Recycle the warm executor when its RSS exceeds N bytes.
+    :type executor_max_rss: Optional[int]
+    :param preload: Modules to import before forking the worker processes.
+    :type preload: Optional[list[str]]
     """
-    poller = make_worker_poller(domain, task_list, heartbeat, process_mode, poll_data)
+    if preload:
+        preload_modules(preload)
+
+    poller = make_worker_poller(domain, task_list, heartbeat, process_mode, poll_data, concurrency,
+                                heartbeat_rate, warm_executor, executor_max_tasks, executor_max_rss)
 
     if poll_data:
         # if "poll_data" is provided, no need to process it multiple times
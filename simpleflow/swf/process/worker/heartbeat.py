@@ -1,6 +1,7 @@
 import logging
 import multiprocessing
 import os
+import random
 import time
 
 import swf.exceptions
@@ -10,7 +11,7 @@ from simpleflow.utils import retry
 logger = logging.getLogger(__name__)
 
 
-__all__ = ['Heartbeater', 'HeartbeatProcess']
+__all__ = ['Heartbeater', 'HeartbeatProcess', 'HeartbeatScheduler', 'TokenBucket']
 
 
 @deprecated
@@ -116,3 +117,186 @@ class Heartbeater(object):  # Are people using it?
         self._heartbeater.terminate()
 
         return self
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter: allows *rate* operations per second on
+    average, with bursts of up to *capacity* operations.
+    """
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError('token bucket rate must be > 0')
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self._tokens = self.capacity
+        self._last = time.time()
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def consume(self, tokens=1):
+        """
+        Take *tokens* tokens if available.
+        :rtype: bool
+        """
+        self._refill()
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
+
+    def wait_time(self, tokens=1):
+        """
+        Seconds until *tokens* tokens are available.
+        :rtype: float
+        """
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def drain(self):
+        """
+        Drop all available tokens, e.g. when the server throttles us anyway.
+        """
+        self._refill()
+        self._tokens = 0.0
+
+
+class HeartbeatScheduler(object):
+    """
+    Schedule heartbeats for many running tasks from a single loop.
+
+    Each task heartbeats every *interval* seconds, or every third of its
+    heartbeat timeout if that is shorter. Times are jittered by +/- *jitter*
+    so that tasks started together don't heartbeat together, and an optional
+    token bucket caps the rate of heartbeats sent by this process. After a
+    throttling error, the task retries sooner with an exponential backoff and
+    the bucket is drained.
+
+    :ivar interval: default (and max) heartbeat interval in seconds
+    :type interval: float
+    :ivar jitter: relative jitter applied to each interval
+    :type jitter: float
+    :ivar metrics: counters: sent, throttled, rate_limited, errors, latency_total, latency_max
+    :type metrics: dict[str, float]
+    """
+    #: First retry delay after a throttling error, in seconds
+    throttle_backoff = 1.0
+
+    def __init__(self, interval, jitter=0.1, rate=None, burst=None):
+        if interval <= 0:
+            raise ValueError('heartbeat interval must be > 0')
+        self.interval = interval
+        self.jitter = jitter
+        self._bucket = TokenBucket(rate, burst) if rate else None
+        self._entries = {}  # key -> [next time, interval, # of consecutive throttles]
+        self.metrics = {
+            'sent': 0,
+            'throttled': 0,
+            'rate_limited': 0,
+            'errors': 0,
+            'latency_total': 0.0,
+            'latency_max': 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def interval_for(self, heartbeat_timeout=None):
+        """
+        Heartbeat interval for a task with this heartbeat timeout.
+        :param heartbeat_timeout: in seconds; None or "NONE" if not set
+        :type heartbeat_timeout: Optional[str | int]
+        :rtype: float
+        """
+        try:
+            heartbeat_timeout = int(heartbeat_timeout)
+        except (TypeError, ValueError):
+            return self.interval
+        if heartbeat_timeout <= 0:
+            return self.interval
+        return min(self.interval, heartbeat_timeout / 3.0)
+
+    def _jittered(self, interval):
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def add(self, key, heartbeat_timeout=None):
+        interval = self.interval_for(heartbeat_timeout)
+        self._entries[key] = [time.time() + self._jittered(interval), interval, 0]
+
+    def remove(self, key):
+        self._entries.pop(key, None)
+
+    def pop_due(self):
+        """
+        Keys whose heartbeat is due, as far as the rate limit allows; the
+        others stay due. Each returned key must then be passed to sent(),
+        throttled() or failed().
+        :rtype: list
+        """
+        now = time.time()
+        due = sorted(
+            (entry[0], key) for key, entry in self._entries.items() if entry[0] <= now
+        )
+        keys = []
+        for _, key in due:
+            if self._bucket and not self._bucket.consume():
+                break
+            keys.append(key)
+        self.metrics['rate_limited'] += len(due) - len(keys)
+        return keys
+
+    def next_timeout(self):
+        """
+        Seconds until the next heartbeat is due, None if there's none.
+        :rtype: Optional[float]
+        """
+        if not self._entries:
+            return None
+        timeout = min(entry[0] for entry in self._entries.values()) - time.time()
+        if timeout <= 0 and self._bucket:
+            return self._bucket.wait_time()
+        return max(0.0, timeout)
+
+    def _reschedule(self, key, delay):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[0] = time.time() + self._jittered(delay)
+
+    def sent(self, key, latency):
+        self.metrics['sent'] += 1
+        self.metrics['latency_total'] += latency
+        self.metrics['latency_max'] = max(self.metrics['latency_max'], latency)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[2] = 0
+            self._reschedule(key, entry[1])
+
+    def throttled(self, key):
+        self.metrics['throttled'] += 1
+        if self._bucket:
+            self._bucket.drain()
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[2] += 1
+            self._reschedule(key, min(entry[1] / 2.0, self.throttle_backoff * 2 ** (entry[2] - 1)))
+
+    def failed(self, key):
+        self.metrics['errors'] += 1
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._reschedule(key, entry[1])
+
+    def get_stats(self):
+        """
+        Metrics, with the mean latency.
+        :rtype: dict[str, float]
+        """
+        stats = dict(self.metrics)
+        stats['latency_mean'] = stats['latency_total'] / stats['sent'] if stats['sent'] else 0.0
+        return stats
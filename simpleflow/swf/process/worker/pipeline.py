@@ -0,0 +1,284 @@
+from __future__ import absolute_import
+
+import errno
+import json
+import logging
+import multiprocessing
+import os
+import select
+import signal
+import time
+
+import swf.exceptions
+from simpleflow.dispatch import dynamic_dispatcher
+from swf.core import ConnectedSWFObject
+from .heartbeat import HeartbeatScheduler
+
+
+if False:
+    from typing import List, Optional  # NOQA
+    from simpleflow.swf.process.worker.base import ActivityPoller  # NOQA
+
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['ActivityPipeline']
+
+
+def run_poll_process(poller, conn):
+    """
+    Long-poll SWF for activity tasks, one poll per request received on *conn*.
+    The raw poll response (or None on poll timeout) is sent back.
+
+    :param poller:
+    :type poller: ActivityPoller
+    :param conn: our end of the pipe
+    :type conn: multiprocessing.connection.Connection
+    """
+    # The pipeline process handles shutdown: we stop when it tells us to.
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+    # Don't share the parent's SWF connection: it heartbeats meanwhile.
+    poller.connection = ConnectedSWFObject().connection
+
+    while True:
+        try:
+            if not conn.recv():
+                break
+        except EOFError:
+            break
+        try:
+            response = poller.poll_with_retry()
+        except swf.exceptions.PollTimeout:
+            conn.send(None)
+        else:
+            conn.send(response.raw_response)
+
+
+class RunningTask(object):
+    """
+    Activity task processed by a child process.
+
+    :ivar token:
+    :type token: str
+    :ivar task:
+    :type task: swf.models.ActivityTask
+    :ivar process:
+    :type process: multiprocessing.Process
+    :ivar stopped: whether the process was killed or terminated on our side
+    :type stopped: bool
+    """
+    def __init__(self, token, task, process):
+        self.token = token
+        self.task = task
+        self.process = process
+        self.stopped = False
+
+
+class ActivityPipeline(object):
+    """
+    Keep up to *size* activity tasks in flight from a single poller process.
+
+    A dedicated process long-polls SWF as soon as a slot is free, while this
+    loop starts a child process per task, heartbeats all of them through a
+    HeartbeatScheduler and reaps them. Everything runs on the main thread, so
+    forking children is safe.
+
+    :ivar _poller:
+    :type _poller: ActivityPoller
+    :ivar size: max # of tasks in flight
+    :type size: int
+    :ivar heartbeat: heartbeat interval in seconds, or None to disable them
+    :type heartbeat: Optional[int]
+    :ivar heartbeats: heartbeat scheduler, None if heartbeats are disabled
+    :type heartbeats: Optional[HeartbeatScheduler]
+    :ivar _tasks:
+    :type _tasks: List[RunningTask]
+    """
+    # Check running processes at least this often (seconds) when we cannot
+    # wait on their sentinel.
+    check_interval = 1.0
+
+    def __init__(self, poller, size, heartbeat=60, heartbeat_rate=None):
+        if size < 1:
+            raise ValueError('pipeline size must be >= 1')
+        self._poller = poller
+        self.size = size
+        self.heartbeat = heartbeat
+        self.heartbeats = HeartbeatScheduler(heartbeat, rate=heartbeat_rate) if heartbeat else None
+        self._heartbeat_timeouts = {}
+        self._tasks = []
+        self._poll_process = None
+        self._poll_conn = None
+        self._polling = False
+
+    @property
+    def tasks(self):
+        return self._tasks
+
+    def _start_poll_process(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=run_poll_process,
+            args=(self._poller, child_conn),
+        )
+        process.start()
+        child_conn.close()
+        self._poll_process = process
+        self._poll_conn = parent_conn
+        self._polling = False
+        logger.debug('pipeline: started poll process pid={}'.format(process.pid))
+
+    def _stop_poll_process(self):
+        if self._poll_process is None:
+            return
+        try:
+            self._poll_conn.send(False)
+        except (IOError, OSError):
+            pass
+        self._poll_conn.close()
+        self._poll_process.join()
+        self._poll_process = None
+        self._poll_conn = None
+
+    def _request_poll(self):
+        self._poll_conn.send(True)
+        self._polling = True
+
+    def _receive_poll(self):
+        try:
+            polled_activity_data = self._poll_conn.recv()
+        except EOFError:
+            logger.error('pipeline: poll process pid={} died, restarting it'.format(self._poll_process.pid))
+            self._stop_poll_process()
+            self._start_poll_process()
+            return
+        self._polling = False
+        if polled_activity_data is not None:
+            response = self._poller.response_from_poll_data(polled_activity_data)
+            self.start_task(response.task_token, response.activity_task)
+
+    def start_task(self, token, task):
+        """
+        Process a task in a child process.
+
+        :param token:
+        :type token: str
+        :param task:
+        :type task: swf.models.ActivityTask
+        """
+        from .base import process_task
+
+        process = multiprocessing.Process(
+            target=process_task,
+            args=(self._poller, token, task),
+        )
+        process.start()
+        logger.debug('pipeline: started task {} in pid={}'.format(task.activity_id, process.pid))
+        running = RunningTask(token, task, process)
+        self._tasks.append(running)
+        if self.heartbeats is not None:
+            self.heartbeats.add(running, self._get_heartbeat_timeout(task))
+
+    def _get_heartbeat_timeout(self, task):
+        """
+        Heartbeat timeout of the task: the one it was scheduled with if it
+        was overridden, else its activity's default, if we can find it.
+        :rtype: Optional[str]
+        """
+        # Cheap check before parsing; jumbo or compressed inputs never match.
+        if task.input and '"heartbeat_timeout"' in task.input:
+            try:
+                return json.loads(task.input)['heartbeat_timeout']
+            except (ValueError, TypeError, KeyError):
+                pass
+        name = task.activity_type.name
+        if name not in self._heartbeat_timeouts:
+            try:
+                activity = dynamic_dispatcher.Dispatcher().dispatch_activity(name)
+                self._heartbeat_timeouts[name] = activity.task_heartbeat_timeout
+            except Exception as err:
+                # The task process will report it
+                logger.debug('pipeline: cannot find activity {}: {}'.format(name, err))
+                self._heartbeat_timeouts[name] = None
+        return self._heartbeat_timeouts[name]
+
+    def _next_timeout(self):
+        timeout = self.heartbeats.next_timeout() if self.heartbeats is not None else None
+        if timeout is None:
+            return self.check_interval
+        return min(self.check_interval, timeout)
+
+    def _wait(self):
+        """
+        Wait for a poll response, a child process to exit, or the next
+        heartbeat to be due.
+        """
+        fds = []
+        if self._polling:
+            fds.append(self._poll_conn)
+        # Process.sentinel is not available on Python 2
+        fds.extend(t.process.sentinel for t in self._tasks if hasattr(t.process, 'sentinel'))
+        try:
+            ready, _, _ = select.select(fds, [], [], self._next_timeout())
+        except (select.error, OSError, IOError) as err:
+            if err.args[0] != errno.EINTR:
+                raise
+            return
+        if self._poll_conn in ready:
+            self._receive_poll()
+
+    def _reap(self):
+        from .base import reap_worker
+
+        for running in list(self._tasks):
+            if running.process.is_alive():
+                continue
+            if not running.stopped:
+                reap_worker(self._poller, running.process, running.token, running.task)
+            self._tasks.remove(running)
+            if self.heartbeats is not None:
+                self.heartbeats.remove(running)
+
+    def _send_heartbeats(self):
+        from .base import send_heartbeat
+
+        if self.heartbeats is None:
+            return
+        for running in self.heartbeats.pop_due():
+            start = time.time()
+            try:
+                keep_going = send_heartbeat(self._poller, running.process, running.token, running.task)
+            except swf.exceptions.RateLimitExceededError:
+                self.heartbeats.throttled(running)
+                continue
+            except Exception:
+                # Already logged; don't give up on the other tasks, we'll
+                # retry on the next interval.
+                self.heartbeats.failed(running)
+                continue
+            self.heartbeats.sent(running, time.time() - start)
+            if not keep_going:
+                running.stopped = True
+                self.heartbeats.remove(running)
+
+    def run(self):
+        """
+        Poll and process tasks until the poller stops, then wait for the
+        running tasks.
+        """
+        logger.info('pipeline: processing up to {} tasks pid={}'.format(self.size, os.getpid()))
+        self._start_poll_process()
+        try:
+            while self._poller.is_alive or self._polling or self._tasks:
+                if self._poller.is_alive and not self._polling and len(self._tasks) < self.size:
+                    self._request_poll()
+                self._wait()
+                self._reap()
+                self._send_heartbeats()
+        finally:
+            self._stop_poll_process()
+            if self.heartbeats is not None:
+                logger.info('pipeline: heartbeat stats: {}'.format(self.heartbeats.get_stats()))
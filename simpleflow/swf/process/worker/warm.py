@@ -0,0 +1,195 @@
+from __future__ import absolute_import
+
+import logging
+import multiprocessing
+import os
+import signal
+
+import psutil
+
+import swf.exceptions
+from swf.core import ConnectedSWFObject
+
+
+if False:
+    from typing import Optional  # NOQA
+    from swf.responses import Response  # NOQA
+    from simpleflow.swf.process.worker.base import ActivityPoller  # NOQA
+
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['WarmExecutor']
+
+
+def run_warm_executor(poller, conn, max_tasks=None, max_rss=None):
+    """
+    Main loop of a warm executor process: process the activity tasks received
+    on *conn* until told to stop or until it should be recycled.
+
+    :param poller:
+    :type poller: ActivityPoller
+    :param conn: our end of the pipe
+    :type conn: multiprocessing.connection.Connection
+    :param max_tasks: recycle after this many tasks
+    :type max_tasks: Optional[int]
+    :param max_rss: recycle when the RSS exceeds this many bytes
+    :type max_rss: Optional[int]
+    """
+    from .base import ActivityWorker
+
+    # SIGTERM is how a cancelled task gets stopped; the poller handles the
+    # graceful shutdown and closes the pipe.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+    # Don't share the parent's SWF connection: it heartbeats meanwhile.
+    poller.connection = ConnectedSWFObject().connection
+
+    worker = ActivityWorker()
+    process = psutil.Process()
+    nb_tasks = 0
+    while True:
+        try:
+            polled_activity_data = conn.recv()
+        except EOFError:
+            break
+        if polled_activity_data is None:
+            break
+        response = poller.response_from_poll_data(polled_activity_data)
+        worker.process(poller, response.task_token, response.activity_task)
+        nb_tasks += 1
+
+        rss = process.memory_info().rss
+        recycle = bool(
+            (max_tasks and nb_tasks >= max_tasks) or
+            (max_rss and rss > max_rss)
+        )
+        conn.send((recycle, rss))
+        if recycle:
+            logger.info('warm executor pid={} recycled after {} tasks (rss={})'.format(
+                os.getpid(), nb_tasks, rss))
+            break
+
+
+class WarmExecutor(object):
+    """
+    Long-lived process executing the activity tasks of a poller one at a
+    time, so user modules are imported once instead of once per task.
+
+    The poller sends it tasks over a pipe and heartbeats while they run, as
+    it does for a process spawned per task. If the process dies or is
+    stopped (task cancelled or gone), the task is handled as with a spawned
+    process and a new executor is started for the next task. It is also
+    replaced after *max_tasks* tasks or once its RSS exceeds *max_rss*.
+
+    :ivar _poller:
+    :type _poller: ActivityPoller
+    :ivar max_tasks: recycle after this many tasks
+    :type max_tasks: Optional[int]
+    :ivar max_rss: recycle when the RSS exceeds this many bytes
+    :type max_rss: Optional[int]
+    :ivar process:
+    :type process: Optional[multiprocessing.Process]
+    """
+    def __init__(self, poller, max_tasks=None, max_rss=None):
+        self._poller = poller
+        self.max_tasks = max_tasks
+        self.max_rss = max_rss
+        self.process = None
+        self._conn = None
+
+    def __repr__(self):
+        return '{}(max_tasks={}, max_rss={})'.format(
+            self.__class__.__name__,
+            self.max_tasks,
+            self.max_rss,
+        )
+
+    def start(self):
+        """
+        Start the process if needed.
+        """
+        if self.process is not None:
+            return
+        parent_conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=run_warm_executor,
+            args=(self._poller, child_conn, self.max_tasks, self.max_rss),
+        )
+        self.process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        logger.debug('warm executor: started pid={}'.format(self.process.pid))
+
+    def _retire(self):
+        self._conn.close()
+        self.process.join()
+        self.process = None
+        self._conn = None
+
+    def run(self, response, heartbeat=60):
+        """
+        Process a task and wait for it to end, sending heartbeats to SWF.
+
+        :param response: activity task poll response
+        :type response: swf.responses.Response
+        :param heartbeat: heartbeat delay (seconds)
+        :type heartbeat: Optional[int]
+        """
+        from .base import reap_worker, send_heartbeat
+
+        token = response.task_token
+        task = response.activity_task
+        self.start()
+        try:
+            self._conn.send(response.raw_response)
+        except (IOError, OSError) as err:
+            logger.error('warm executor: cannot send task to pid={}: {}'.format(self.process.pid, err))
+            self.process.terminate()
+            self._retire()
+            self.start()
+            self._conn.send(response.raw_response)
+
+        process = self.process
+        stopped = False
+        while True:
+            if self._conn.poll(heartbeat):
+                try:
+                    recycle, rss = self._conn.recv()
+                except EOFError:
+                    break
+                if recycle:
+                    self._retire()
+                return
+            if not process.is_alive():
+                break
+            try:
+                if not send_heartbeat(self._poller, process, token, task):
+                    stopped = True
+                    break
+            except swf.exceptions.RateLimitExceededError:
+                # ignore rate limit errors: high chances the next heartbeat will be
+                # ok anyway, so it would be stupid to break the task for that
+                continue
+
+        # Died while processing the task, or stopped by send_heartbeat()
+        self._retire()
+        if stopped:
+            return
+        if process.exitcode == 0:
+            logger.warning('warm executor pid={} exited while processing a task'.format(process.pid))
+        reap_worker(self._poller, process, token, task)
+
+    def stop(self):
+        """
+        Stop the process; a task is never running at this point.
+        """
+        if self.process is None:
+            return
+        try:
+            self._conn.send(None)
+        except (IOError, OSError):
+            pass
+        self._retire()
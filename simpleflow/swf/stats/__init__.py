@@ -1,2 +1,3 @@
 from .base import *  # NOQA
 from . import pretty  # NOQA
+from .duration import DurationModel  # NOQA
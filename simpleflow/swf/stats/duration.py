@@ -0,0 +1,91 @@
+import json
+from itertools import chain
+
+from future.utils import iteritems
+
+from simpleflow.task import ActivityTask, WorkflowTask
+from .base import get_start_to_close_timing
+
+
+class DurationModel(object):
+    """
+    Estimated durations of the tasks, by activity or workflow type name.
+
+    It is built from the timings of past executions: each new duration moves
+    the estimate by ``smoothing`` towards it. Group(durations=...) uses it to
+    submit the longest tasks first.
+
+    :ivar durations: estimated duration in seconds, by task type name
+    :type durations: dict[str, float]
+    :ivar default: estimate for the unknown tasks
+    :type default: float
+    """
+    smoothing = 0.3
+
+    def __init__(self, durations=None, default=0.):
+        self.durations = dict(durations or {})
+        self.default = default
+
+    def add(self, name, duration):
+        """
+        Account for a new duration of a task type.
+
+        :param name: activity or workflow type name
+        :type name: str
+        :param duration: seconds
+        :type duration: float
+        """
+        previous = self.durations.get(name)
+        if previous is None:
+            self.durations[name] = duration
+        else:
+            self.durations[name] = previous + self.smoothing * (duration - previous)
+
+    def add_history(self, history):
+        """
+        Account for the completed activities and child workflows of an
+        execution, as timed by WorkflowStats.get_timings().
+
+        :param history:
+        :type history: simpleflow.history.History
+        """
+        history.parse()
+        tasks = chain(
+            iteritems(history.activities),
+            iteritems(history.child_workflows),
+        )
+        for _, attributes in tasks:
+            state, _, _, _, duration = get_start_to_close_timing(attributes)
+            if state == 'completed' and duration is not None:
+                self.add(attributes['name'], duration)
+
+    def estimate(self, submittable):
+        """
+        Estimated duration of a task: its ``estimated_duration`` hint if any,
+        else the duration learnt for its type.
+
+        :param submittable:
+        :type submittable: simpleflow.base.Submittable | simpleflow.base.SubmittableContainer
+        :rtype: float
+        """
+        if isinstance(submittable, ActivityTask):
+            hint = submittable.activity.estimated_duration
+            name = submittable.activity.name
+        elif isinstance(submittable, WorkflowTask):
+            workflow = submittable.workflow
+            hint = getattr(workflow, 'estimated_duration', None)
+            name = workflow.__module__ + '.' + workflow.__name__
+        else:
+            return self.default
+        if hint is not None:
+            return hint
+        return self.durations.get(name, self.default)
+
+    def save(self, path):
+        with open(path, 'w') as fp:
+            json.dump(self.durations, fp)
+
+    @classmethod
+    def load(cls, path, default=0.):
+        with open(path) as fp:
+            return cls(json.load(fp), default=default)
@@ -2,7 +2,9 @@ import logging
 
 import swf.models
 import swf.models.decision
+from swf import format
 from simpleflow import task, Workflow
+from simpleflow.swf import constants
 from simpleflow.utils import json_dumps
 
 logger = logging.getLogger(__name__)
@@ -76,6 +78,10 @@ class ActivityTask(task.ActivityTask, SwfTask):
         meta = activity.meta
         if meta:
             input["meta"] = meta
+        if heartbeat_timeout != activity.task_heartbeat_timeout:
+            # Activity workers don't see the scheduled event: tell them
+            # about the override so they heartbeat often enough.
+            input["heartbeat_timeout"] = heartbeat_timeout
 
         decision = swf.models.decision.ActivityTaskDecision(
             'schedule',
@@ -355,3 +361,33 @@ class CancelTimerTask(task.CancelTimerTask, SwfTask):
             id=self.timer_id,
         )
         return [decision]
+
+
+class CachedResultTask(SwfTask):
+    """
+    Completion of an activity task with its cached result, recorded in a
+    marker instead of scheduling the activity.
+    """
+    idempotent = True
+
+    def __init__(self, activity_task, result):
+        """
+        :param activity_task:
+        :type activity_task: ActivityTask
+        :param result: result as encoded in the history
+        :type result: Optional[str]
+        """
+        self.id = activity_task.id
+        self.result = result
+
+    @property
+    def name(self):
+        return constants.CACHED_RESULT_MARKER
+
+    def schedule(self, *args, **kwargs):
+        decision = swf.models.decision.MarkerDecision()
+        decision.record(
+            self.name,
+            format.details(json_dumps({'id': self.id, 'result': self.result})),
+        )
+        return [decision]
@@ -1,5 +1,7 @@
 from __future__ import absolute_import
 
+import json
+
 import swf.exceptions
 import swf.models
 import swf.querysets
@@ -7,7 +9,7 @@ from simpleflow.history import History
 
 
 if False:
-    from typing import Any, List, Dict  # NOQA
+    from typing import Any, List, Dict, Optional  # NOQA
     from swf.models.decision.base import Decision  # NOQA
 
 
@@ -60,10 +62,16 @@ class DecisionsAndContext(object):
     """
     Encapsulate decisions and execution context.
     The execution context contains keys with either plain values, lists or sets.
+
+    The size of the serialized decisions is kept up to date as they are
+    added, so each decision is serialized only once.
     """
     def __init__(self, decisions=None, execution_context=None):
         self.decisions = decisions or []  # type: List[Decision]
         self.execution_context = execution_context  # type: Dict[str, Any]
+        self._sized_decisions = None  # type: List[Decision]
+        self._nb_sized = 0
+        self._sizes_sum = 0
 
     def __repr__(self):
         return '<{} decisions={}, execution_context={}>'.format(
@@ -77,12 +85,61 @@ class DecisionsAndContext(object):
         """
         self.decisions.append(decision)
 
-    def extend_decision(self, decisions):
-        # type: (List[Decision]) -> None
+    def extend_decision(self, decisions, max_size=None):
+        # type: (List[Decision], Optional[int]) -> bool
         """
-        Append a list of decisions.
+        Append a list of decisions, unless the serialized decisions would
+        then exceed *max_size*.
+
+        :returns: whether the decisions were appended.
         """
+        self._update_sizes()
+        sizes_sum = self._sizes_sum + sum(self.get_decision_size(d) for d in decisions)
+        nb_decisions = len(self.decisions) + len(decisions)
+        if max_size is not None and self._get_serialized_size(nb_decisions, sizes_sum) > max_size:
+            return False
         self.decisions += decisions
+        self._nb_sized += len(decisions)
+        self._sizes_sum = sizes_sum
+        return True
+
+    @staticmethod
+    def get_decision_size(decision):
+        # type: (Decision) -> int
+        """
+        Size of a serialized decision.
+        NB: here we use json.dumps, not json_dumps, since the serialization will
+        happen inside boto.swf and is out of our control.
+        """
+        return len(json.dumps(decision))
+
+    @staticmethod
+    def _get_serialized_size(nb_decisions, sizes_sum):
+        # "[" + ", ".join(decisions) + "]"
+        return 2 + sizes_sum + 2 * max(nb_decisions - 1, 0)
+
+    def _update_sizes(self):
+        """
+        Measure the decisions added since the last call, from scratch if the
+        list was replaced or shortened.
+        """
+        decisions = self.decisions
+        if decisions is not self._sized_decisions or len(decisions) < self._nb_sized:
+            self._sized_decisions = decisions
+            self._nb_sized = 0
+            self._sizes_sum = 0
+        for i in range(self._nb_sized, len(decisions)):
+            self._sizes_sum += self.get_decision_size(decisions[i])
+        self._nb_sized = len(decisions)
+
+    @property
+    def serialized_size(self):
+        # type: () -> int
+        """
+        Size of the serialized decisions list.
+        """
+        self._update_sizes()
+        return self._get_serialized_size(len(self.decisions), self._sizes_sum)
 
     def append_kv_to_context(self, key, value):
         # type: (str, Any) -> None
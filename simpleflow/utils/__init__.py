@@ -2,7 +2,7 @@ import re
 from zlib import adler32
 
 from . import retry  # NOQA
-from .json_tools import json_dumps, json_loads_or_raw  # NOQA
+from .json_tools import json_dump, json_dumps, json_loads_or_raw  # NOQA
 
 
 def issubclass_(arg1, arg2):
@@ -83,6 +83,25 @@ def json_dumps(obj, pretty=False, compact=True, **kwargs):
         raise
 
 
+def json_dump(obj, fp, **kwargs):
+    """
+    Compact JSON dump to a file, written chunk by chunk instead of
+    building the whole string in memory. Same output as `json_dumps`.
+    :param obj:
+    :type obj: Any
+    :param fp: text file
+    :type fp: file
+    """
+    if "default" not in kwargs:
+        kwargs["default"] = _serialize_complex_object
+    kwargs["separators"] = (",", ":")
+    kwargs["sort_keys"] = True
+    if PY2:
+        # see json_dumps
+        obj = _resolve_proxy(obj)
+    json.dump(obj, fp, **kwargs)
+
+
 def json_loads_or_raw(data):
     """
     Try to get a JSON object from a string.
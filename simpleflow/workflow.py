@@ -32,6 +32,11 @@ class Workflow(Submittable):
     task_list = None
     task_priority = None
 
+    # Thresholds for continue_as_new_if_needed(): number of events and
+    # approximate size in bytes of the history; None means no limit.
+    continue_as_new_max_events = None
+    continue_as_new_max_size = None
+
     INHERIT_TAG_LIST = 'INHERIT_TAG_LIST'
 
     def __init__(self, executor):
@@ -107,6 +112,28 @@ class Workflow(Submittable):
     def fail(self, reason, details=None):
         self._executor.fail(reason, details)
 
+    def continue_as_new(self, *args, **kwargs):
+        """
+        Close this execution and start a new run of the workflow, with the
+        same workflow ID, called with *args* and *kwargs*. They should only
+        hold the state needed to carry on: the new run starts with an empty
+        history.
+
+        Tasks still open are abandoned.
+        """
+        self._executor.continue_as_new(*args, **kwargs)
+
+    def continue_as_new_if_needed(self, *args, **kwargs):
+        """
+        Call continue_as_new(*args, **kwargs) if should_continue_as_new()
+        says the history is too large.
+
+        On SWF, the execution only continues as new if nothing was done since
+        this call, i.e. the replay blocks before any other task is found in
+        the history; the new run starts from this point.
+        """
+        self._executor.continue_as_new_if_needed(*args, **kwargs)
+
     def before_replay(self, history):
         """
         Method called before playing the execution.
@@ -238,3 +265,42 @@ class Workflow(Submittable):
         :return:
         """
         return True
+
+    def should_continue_as_new(self, history):
+        """
+        Called by the executor on continue_as_new_if_needed().
+        The default implementation compares the history to
+        ``continue_as_new_max_events`` and ``continue_as_new_max_size``.
+
+        :param history:
+        :type history: simpleflow.history.History
+        :rtype: bool
+        """
+        if (self.continue_as_new_max_events is not None and
+                history.last_event_id > self.continue_as_new_max_events):
+            return True
+        if (self.continue_as_new_max_size is not None and
+                history.size > self.continue_as_new_max_size):
+            return True
+        return False
+
+
+class ShardWorkflow(Workflow):
+    """
+    Child workflow of a canvas.ShardedGroup: call an activity on a shard of
+    the items, sharding them again if there are too many.
+    """
+    name = 'shard'
+    version = '1'
+
+    def run(self, activity_name, items, shard_size, max_parallel=None, raises_on_failure=None):
+        from simpleflow.dispatch import dynamic_dispatcher
+        activity = dynamic_dispatcher.Dispatcher().dispatch_activity(activity_name)
+        group = canvas.ShardedGroup(
+            activity,
+            items,
+            shard_size=shard_size,
+            max_parallel=max_parallel,
+            raises_on_failure=raises_on_failure,
+        )
+        return self.submit(group).result
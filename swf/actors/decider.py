@@ -1,16 +1,56 @@
 # -*- coding: utf-8 -*-
+import sys
+import threading
+
 import boto.exception
+from future.utils import raise_
 
 from simpleflow import compat
 from simpleflow.utils import json_dumps
 from swf import format
 from swf.actors.core import Actor
 from swf.exceptions import PollTimeout, ResponseError, DoesNotExistError
+from swf.models.event import EventFactory
 from swf.models.history import History
 from swf.models.workflow import WorkflowExecution, WorkflowType
 from swf.responses import Response
 
 
+class PageFetcher(object):
+    """Fetches a history page in a background thread
+
+    :param  get_page: callable fetching a page from its token
+    :type   get_page: (str) -> dict[str, Any]
+
+    :param  next_page: page token
+    :type   next_page: str
+    """
+    def __init__(self, get_page, next_page):
+        self._get_page = get_page
+        self._next_page = next_page
+        self._page = None
+        self._exc_info = None
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._page = self._get_page(self._next_page)
+        except Exception:
+            self._exc_info = sys.exc_info()
+
+    def join(self):
+        self._thread.join()
+
+    def result(self):
+        """Waits for the page and returns it, or raises the fetch error"""
+        self.join()
+        if self._exc_info:
+            raise_(*self._exc_info)
+        return self._page
+
+
 class Decider(Actor):
     """Decider actor implementation
 
@@ -60,11 +100,16 @@ class Decider(Actor):
 
     def poll(self, task_list=None,
              identity=None,
+             on_page=None,
              **kwargs):
         """
         Polls a decision task and returns the token and the full history of the
         workflow's events.
 
+        The history is paginated: each page is converted to events as soon as
+        it arrives while the next one is fetched in the background, so we
+        never hold the raw events of the whole history.
+
         :param task_list: task list to poll for decision tasks from.
         :type task_list: str
 
@@ -73,52 +118,97 @@ class Decider(Actor):
         workflow history.
         :type identity: str
 
+        :param on_page: called with the page payload and the history built so
+        far after each page, e.g. to parse the history while downloading it.
+        :type on_page: Optional[(dict[str, Any], swf.models.history.History) -> None]
+
         :returns: a Response object with history, token, and execution set
         :rtype: swf.responses.Response
 
         """
         task_list = task_list or self.task_list
 
-        task = self.connection.poll_for_decision_task(
-            self.domain.name,
-            task_list=task_list,
-            identity=format.identity(identity),
-            **kwargs
-        )
+        def get_page(next_page):
+            return self.poll_page(task_list, identity, next_page, **kwargs)
+
+        task = get_page(None)
+        history = History()
+        fetcher = None
+        try:
+            while True:
+                next_page = task.get('nextPageToken')
+                fetcher = PageFetcher(get_page, next_page) if next_page else None
+
+                history.events.extend(EventFactory(event) for event in task['events'])
+                del task['events']
+                if on_page:
+                    on_page(task, history)
+
+                if not fetcher:
+                    break
+                task = fetcher.result()
+        finally:
+            # Don't leave a thread behind if a page can't be handled: deciders fork.
+            if fetcher:
+                fetcher.join()
+
+        return self.response_from_task(task, history)
+
+    def poll_page(self, task_list=None, identity=None, next_page_token=None, **kwargs):
+        """
+        Polls a decision task, or fetches the next page of its history.
+
+        :param task_list: task list to poll for decision tasks from.
+        :type task_list: str
+
+        :param identity: Identity of the decider making the request.
+        :type identity: str
+
+        :param next_page_token: token of the page to fetch, if not the first one
+        :type next_page_token: Optional[str]
+
+        :returns: the PollForDecisionTask payload
+        :rtype: dict[str, Any]
+        """
+        try:
+            task = self.connection.poll_for_decision_task(
+                self.domain.name,
+                task_list=task_list or self.task_list,
+                identity=format.identity(identity),
+                next_page_token=next_page_token,
+                **kwargs
+            )
+        except boto.exception.SWFResponseError as e:
+            message = self.get_error_message(e)
+            if e.error_code == 'UnknownResourceFault':
+                raise DoesNotExistError(
+                    "Unable to poll decision task",
+                    message,
+                )
+
+            raise ResponseError(message)
+
         token = task.get('taskToken')
         if token is None:
             raise PollTimeout("Decider poll timed out")
+        return task
 
-        events = task['events']
-
-        next_page = task.get('nextPageToken')
-        while next_page:
-            try:
-                task = self.connection.poll_for_decision_task(
-                    self.domain.name,
-                    task_list=task_list,
-                    identity=format.identity(identity),
-                    next_page_token=next_page,
-                    **kwargs
-                )
-            except boto.exception.SWFResponseError as e:
-                message = self.get_error_message(e)
-                if e.error_code == 'UnknownResourceFault':
-                    raise DoesNotExistError(
-                        "Unable to poll decision task",
-                        message,
-                    )
-
-                raise ResponseError(message)
+    def response_from_task(self, task, history=None):
+        """
+        Build a Response from a PollForDecisionTask payload whose events
+        are complete, i.e. all pages were merged.
 
-            token = task.get('taskToken')
-            if token is None:
-                raise PollTimeout("Decider poll timed out")
+        :param task: PollForDecisionTask payload
+        :type task: dict[str, Any]
 
-            events.extend(task['events'])
-            next_page = task.get('nextPageToken')
+        :param history: history, if already built from the events
+        :type history: Optional[swf.models.history.History]
 
-        history = History.from_event_list(events)
+        :returns: a Response object with history, token, and execution set
+        :rtype: swf.responses.Response
+        """
+        if history is None:
+            history = History.from_event_list(task['events'])
 
         workflow_type = WorkflowType(
             domain=self.domain,
@@ -133,4 +223,4 @@ class Decider(Actor):
         )
 
         # TODO: move history into execution (needs refactoring on WorkflowExecution.history())
-        return Response(token=token, history=history, execution=execution)
+        return Response(token=task['taskToken'], history=history, execution=execution)
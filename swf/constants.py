@@ -30,6 +30,9 @@ MAX_WORKFLOW_AGE = 366 + 90 + 1
 # Jumbo fields
 JUMBO_FIELDS_PREFIX = "simpleflow+s3://"
 JUMBO_FIELDS_MAX_SIZE = 5 * 1024 ** 2  # 5MB
+# Compressed fields small enough to be stored in SWF, followed by
+# "<compression>:<base64 payload>"
+COMPRESSED_FIELDS_PREFIX = "simpleflow+inline://"
 
 # Cache directory
 CACHE_DIR = "/tmp/simpleflow-cache"
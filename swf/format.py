@@ -1,4 +1,8 @@
+import base64
+import collections
 import os
+import zlib
+from multiprocessing.pool import ThreadPool
 from uuid import uuid4
 
 from diskcache import Cache
@@ -8,13 +12,219 @@ from sqlite3 import OperationalError
 from . import constants
 from .core import logger
 
-from simpleflow import storage
-from simpleflow.settings import SIMPLEFLOW_ENABLE_DISK_CACHE
+from simpleflow import compat, storage
+from simpleflow.settings import (
+    SIMPLEFLOW_ENABLE_DISK_CACHE,
+    SIMPLEFLOW_JUMBO_FIELDS_CACHE_SIZE,
+    SIMPLEFLOW_JUMBO_FIELDS_PREFETCH_THREADS,
+)
 from simpleflow.constants import HOUR
 from simpleflow.utils import json_dumps, json_loads_or_raw
 
+try:
+    import lzma
+except ImportError:  # Python 2
+    lzma = None
+
+
+def _compressors():
+    compressors = {
+        'zlib': (zlib.compress, zlib.decompress),
+    }
+    if lzma is not None:
+        compressors['lzma'] = (lzma.compress, lzma.decompress)
+    return compressors
+
+
+COMPRESSORS = _compressors()
+
+
+class JumboFieldsCache(object):
+    """
+    Cache of jumbo field contents, by path.
+
+    Jumbo fields are stored under a new UUID each time and never modified, so
+    entries remain valid across decision and activity tasks. Contents are
+    kept in memory in a LRU bounded by their total length, on top of a disk
+    cache if SIMPLEFLOW_ENABLE_DISK_CACHE is set.
+
+    :ivar max_size: max total length of the contents kept in memory
+    :type max_size: int
+    :ivar directory: disk cache directory
+    :type directory: str
+    :ivar size: total length of the contents in memory
+    :type size: int
+    :ivar hits: lookups found in memory
+    :type hits: int
+    :ivar disk_hits: lookups found on disk
+    :type disk_hits: int
+    :ivar misses: lookups found nowhere
+    :type misses: int
+    :ivar evictions: contents dropped from memory to make room
+    :type evictions: int
+    """
+    disk_expire = 3 * HOUR
+
+    def __init__(self, max_size=SIMPLEFLOW_JUMBO_FIELDS_CACHE_SIZE, directory=None):
+        self.max_size = max_size
+        self.directory = directory or constants.CACHE_DIR
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._contents = collections.OrderedDict()
+        self._disk = None
+        self._disk_pid = None
+
+    def __len__(self):
+        return len(self._contents)
+
+    def __contains__(self, path):
+        """
+        Whether the content is cached, in memory or on disk; not counted as a
+        lookup.
+        """
+        if path in self._contents:
+            return True
+        try:
+            disk = self.disk
+            return disk is not None and self.disk_key(path) in disk
+        except OperationalError:
+            return False
+
+    @property
+    def disk(self):
+        """
+        Disk cache, opened once per process: diskcache objects don't survive
+        forks (see DiskCache docs).
+
+        :rtype: Optional[Cache]
+        """
+        if not SIMPLEFLOW_ENABLE_DISK_CACHE:
+            return None
+        pid = os.getpid()
+        if self._disk_pid != pid:
+            self._disk = Cache(self.directory)
+            self._disk_pid = pid
+        return self._disk
+
+    @staticmethod
+    def disk_key(path):
+        # dedicated cache key because this cache may be shared with other
+        # features of simpleflow at some point
+        return "jumbo_fields/" + path.split("/")[-1]
+
+    def get(self, path):
+        """
+        Get the content of a jumbo field, from memory else from disk.
+
+        :param path: jumbo field path in its bucket
+        :type path: str
+        :rtype: Optional[str]
+        """
+        # 1/ memory cache
+        content = self._contents.pop(path, None)
+        if content is not None:
+            self._contents[path] = content
+            self.hits += 1
+            return content
+
+        # 2/ disk cache
+        try:
+            disk = self.disk
+            if disk is not None:
+                # NB: this cache may also be triggered on activity workers, where it's not that
+                # useful. The performance hit should be minimal. To be improved later.
+                content = disk.get(self.disk_key(path))
+                if content is not None:
+                    logger.debug("diskcache: got key={} from cache_dir={}".format(
+                        self.disk_key(path), self.directory))
+                    self.disk_hits += 1
+                    self._remember(path, content)
+                    return content
+        except OperationalError:
+            logger.warning("diskcache: got an OperationalError, skipping cache usage")
+
+        self.misses += 1
+        return None
+
+    def set(self, path, content):
+        """
+        Cache the content of a jumbo field, in memory and on disk.
 
-JUMBO_FIELDS_MEMORY_CACHE = {}
+        :param path: jumbo field path in its bucket
+        :type path: str
+        :param content:
+        :type content: str
+        """
+        self._remember(path, content)
+
+        try:
+            disk = self.disk
+            if disk is not None:
+                logger.debug("diskcache: setting key={} on cache_dir={}".format(self.disk_key(path), self.directory))
+                disk.set(self.disk_key(path), content, expire=self.disk_expire)
+        except OperationalError:
+            logger.warning("diskcache: got an OperationalError on write, skipping cache write")
+
+    def _remember(self, path, content):
+        old_content = self._contents.pop(path, None)
+        if old_content is not None:
+            self.size -= len(old_content)
+        if len(content) > self.max_size:
+            return
+        self._contents[path] = content
+        self.size += len(content)
+        while self.size > self.max_size:
+            _, evicted = self._contents.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Empty the memory cache.
+        """
+        self._contents.clear()
+        self.size = 0
+
+    def get_stats(self):
+        """
+        :rtype: dict[str, int]
+        """
+        return {
+            'entries': len(self._contents),
+            'size': self.size,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+JUMBO_FIELDS_MEMORY_CACHE = JumboFieldsCache()
+
+
+def _jumbo_fields_compression():
+    # wrapped into a function so easier to override for tests
+    compression = os.getenv("SIMPLEFLOW_JUMBO_FIELDS_COMPRESSION")
+    if not compression:
+        return
+    if compression not in COMPRESSORS:
+        raise ValueError("Unsupported jumbo fields compression: {}".format(compression))
+    return compression
+
+
+def _compress(message, compression):
+    compress, _ = COMPRESSORS[compression]
+    return compress(message.encode("utf-8"))
+
+
+def _decompress(data, compression):
+    if compression not in COMPRESSORS:
+        raise ValueError("Unsupported jumbo fields compression: {}".format(compression))
+    _, decompress = COMPRESSORS[compression]
+    return decompress(data).decode("utf-8")
 
 
 def _jumbo_fields_bucket():
@@ -28,17 +238,43 @@ def _jumbo_fields_bucket():
     return bucket
 
 
+class _JumboFieldLoader(object):
+    """
+    Factory of the lazy proxy `decode` returns for a jumbo field: it keeps
+    the signature so that the field can be passed on without pulling it.
+    """
+    def __init__(self, signature):
+        self.signature = signature
+
+    def __call__(self):
+        parts = self.signature.split()
+        compression = parts[2] if len(parts) > 2 else None
+        value = _pull_jumbo_field(parts[0], compression)
+        return json_loads_or_raw(value)
+
+
+def jumbo_signature(value):
+    """
+    Signature of a jumbo field decoded by `decode`, without pulling it.
+
+    :param value:
+    :type value: Any
+    :returns: the signature, None if *value* isn't a decoded jumbo field
+    :rtype: Optional[str]
+    """
+    if isinstance(value, lazy_object_proxy.Proxy) and isinstance(value.__factory__, _JumboFieldLoader):
+        return value.__factory__.signature
+    return None
+
+
 def decode(content):
     if content is None:
         return content
     if content.startswith(constants.JUMBO_FIELDS_PREFIX):
-
-        def unwrap():
-            location, _size = content.split()
-            value = _pull_jumbo_field(location)
-            return json_loads_or_raw(value)
-
-        return lazy_object_proxy.Proxy(unwrap)
+        return lazy_object_proxy.Proxy(_JumboFieldLoader(content))
+    if content.startswith(constants.COMPRESSED_FIELDS_PREFIX):
+        compression, payload = content[len(constants.COMPRESSED_FIELDS_PREFIX):].split(":", 1)
+        return json_loads_or_raw(_decompress(base64.b64decode(payload), compression))
     return json_loads_or_raw(content)
 
 
@@ -49,6 +285,19 @@ def encode(message, max_length, allow_jumbo_fields=True):
     can_use_jumbo_fields = allow_jumbo_fields and _jumbo_fields_bucket()
 
     if len(message) > max_length:
+        compression = allow_jumbo_fields and _jumbo_fields_compression()
+        compressed = None
+        if compression and len(message) <= constants.JUMBO_FIELDS_MAX_SIZE:
+            # keep the field in SWF if it fits once compressed
+            compressed = _compress(message, compression)
+            inline = "{}{}:{}".format(
+                constants.COMPRESSED_FIELDS_PREFIX,
+                compression,
+                base64.b64encode(compressed).decode("ascii"),
+            )
+            if len(inline) <= max_length:
+                return inline
+
         if not can_use_jumbo_fields:
             _log_message_too_long(message)
             raise ValueError("Message too long ({} chars)".format(len(message)))
@@ -57,7 +306,7 @@ def encode(message, max_length, allow_jumbo_fields=True):
             _log_message_too_long(message)
             raise ValueError("Message too long even for a jumbo field ({} chars)".format(len(message)))
 
-        jumbo_signature = _push_jumbo_field(message)
+        jumbo_signature = _push_jumbo_field(message, compression, compressed)
         if len(jumbo_signature) > max_length:
             raise ValueError(
                 "Jumbo field signature is longer than the max allowed length "
@@ -68,49 +317,7 @@ def encode(message, max_length, allow_jumbo_fields=True):
     return message
 
 
-def _get_cached(path):
-    # 1/ memory cache
-    if path in JUMBO_FIELDS_MEMORY_CACHE:
-        return JUMBO_FIELDS_MEMORY_CACHE[path]
-
-    # 2/ disk cache
-    if SIMPLEFLOW_ENABLE_DISK_CACHE:
-        try:
-            # NB: this cache may also be triggered on activity workers, where it's not that
-            # useful. The performance hit should be minimal. To be improved later.
-            # NB2: cache has to be lazily instantiated here, cache objects do not survive forks,
-            # see DiskCache docs.
-            cache = Cache(constants.CACHE_DIR)
-            # generate a dedicated cache key because this cache may be shared with other
-            # features of simpleflow at some point
-            cache_key = "jumbo_fields/" + path.split("/")[-1]
-            if cache_key in cache:
-                logger.debug("diskcache: getting key={} from cache_dir={}".format(cache_key, constants.CACHE_DIR))
-                return cache[cache_key]
-        except OperationalError:
-            logger.warning("diskcache: got an OperationalError, skipping cache usage")
-
-    # nothing to return, but better be explicit here
-    return
-
-
-def _set_cached(path, content):
-    # 1/ memory cache
-    JUMBO_FIELDS_MEMORY_CACHE[path] = content
-
-    # 2/ disk cache
-    if SIMPLEFLOW_ENABLE_DISK_CACHE:
-        try:
-            cache = Cache(constants.CACHE_DIR)
-            cache_key = "jumbo_fields/" + path.split("/")[-1]
-            logger.debug("diskcache: setting key={} on cache_dir={}".format(cache_key, constants.CACHE_DIR))
-            cache.set(cache_key, content, expire=3 * HOUR)
-        except OperationalError:
-            logger.warning("diskcache: got an OperationalError on write, skipping cache write")
-
-
-def _push_jumbo_field(message):
-    size = len(message)
+def _new_jumbo_field_location():
     uuid = str(uuid4())
     bucket_with_dir = _jumbo_fields_bucket()
     if "/" in bucket_with_dir:
@@ -119,26 +326,130 @@ def _push_jumbo_field(message):
     else:
         bucket = bucket_with_dir
         path = uuid
+    return bucket, path
+
 
-    storage.push_content(bucket, path, message)
-    _set_cached(path, message)
+def _push_jumbo_field(message, compression=None, compressed=None):
+    size = len(message)
+    bucket, path = _new_jumbo_field_location()
 
+    if compression:
+        storage.push_content(bucket, path, compressed)
+    else:
+        storage.push_content(bucket, path, message)
+    JUMBO_FIELDS_MEMORY_CACHE.set(path, message)
+
+    signature = "{}{}/{} {}".format(constants.JUMBO_FIELDS_PREFIX, bucket, path, size)
+    if compression:
+        signature += " " + compression
+    return signature
+
+
+def push_jumbo_file(fileobj, size):
+    """
+    Push the content of a file as a jumbo field, without loading it in
+    memory. It isn't cached: the process pushing it won't read it back.
+
+    :param fileobj: file opened in binary mode, positioned at its start
+    :type fileobj: file
+    :param size: content length
+    :type size: int
+    :returns: jumbo field signature, which `decode` turns into a lazy proxy
+    :rtype: str
+    """
+    if size > constants.JUMBO_FIELDS_MAX_SIZE:
+        raise ValueError("Message too long even for a jumbo field ({} chars)".format(size))
+    bucket, path = _new_jumbo_field_location()
+    storage.push_file(bucket, path, fileobj)
     return "{}{}/{} {}".format(constants.JUMBO_FIELDS_PREFIX, bucket, path, size)
 
 
-def _pull_jumbo_field(location):
-    bucket, path = location.replace(constants.JUMBO_FIELDS_PREFIX, "").split("/", 1)
+def _split_jumbo_location(location):
+    return location.replace(constants.JUMBO_FIELDS_PREFIX, "").split("/", 1)
+
+
+def _pull_content(bucket, path, compression=None):
+    if compression:
+        return _decompress(storage.pull_content(bucket, path, encoding=None), compression)
+    return storage.pull_content(bucket, path)
+
 
-    cached_value = _get_cached(path)
+def _pull_jumbo_field(location, compression=None):
+    bucket, path = _split_jumbo_location(location)
+
+    cached_value = JUMBO_FIELDS_MEMORY_CACHE.get(path)
     if cached_value:
         return cached_value
 
-    content = storage.pull_content(bucket, path)
-    _set_cached(path, content)
+    content = _pull_content(bucket, path, compression)
+    JUMBO_FIELDS_MEMORY_CACHE.set(path, content)
 
     return content
 
 
+def _pull_jumbo_field_or_none(bucket_path_and_compression):
+    bucket, path, compression = bucket_path_and_compression
+    try:
+        return _pull_content(bucket, path, compression)
+    except Exception as err:
+        # It will be pulled again, and fail properly, if it's really used
+        logger.warning("cannot prefetch jumbo field {}/{}: {}".format(bucket, path, err))
+        return None
+
+
+def prefetch_jumbo_fields(contents, nb_threads=SIMPLEFLOW_JUMBO_FIELDS_PREFETCH_THREADS):
+    """
+    Pull the jumbo fields among *contents* that aren't cached yet into the
+    jumbo fields cache, concurrently. Fields that would overflow the memory
+    cache are skipped.
+
+    :param contents: encoded fields; the ones that are not jumbo fields are ignored
+    :type contents: iterable[Any]
+    :param nb_threads: max concurrent downloads
+    :type nb_threads: int
+    :returns: number of jumbo fields pulled
+    :rtype: int
+    """
+    to_pull = collections.OrderedDict()
+    total_size = 0
+    for content in contents:
+        if not isinstance(content, compat.string_types) or not content.startswith(constants.JUMBO_FIELDS_PREFIX):
+            continue
+        parts = content.split()
+        location, size = parts[:2]
+        compression = parts[2] if len(parts) > 2 else None
+        bucket, path = _split_jumbo_location(location)
+        if path in to_pull or path in JUMBO_FIELDS_MEMORY_CACHE:
+            continue
+        if total_size + int(size) > JUMBO_FIELDS_MEMORY_CACHE.max_size:
+            continue
+        total_size += int(size)
+        to_pull[path] = (bucket, compression)
+    if not to_pull:
+        return 0
+
+    items = [(bucket, path, compression) for path, (bucket, compression) in to_pull.items()]
+    nb_threads = min(nb_threads, len(items))
+    if nb_threads > 1:
+        pool = ThreadPool(nb_threads)
+        try:
+            pulled = pool.map(_pull_jumbo_field_or_none, items)
+        finally:
+            # Don't leave threads behind: deciders fork.
+            pool.close()
+            pool.join()
+    else:
+        pulled = [_pull_jumbo_field_or_none(item) for item in items]
+
+    nb_pulled = 0
+    for (_, path, _), content in zip(items, pulled):
+        if content is not None:
+            JUMBO_FIELDS_MEMORY_CACHE.set(path, content)
+            nb_pulled += 1
+    logger.debug("prefetched {} jumbo fields with {} threads".format(nb_pulled, nb_threads))
+    return nb_pulled
+
+
 def _log_message_too_long(message):
     if len(message) > constants.MAX_LOG_FIELD:
         message = "{} <...truncated to {} chars>".format(
@@ -175,4 +486,8 @@ def reason(message):
 
 
 def result(message):
+    # A result pulled from a jumbo field, e.g. by execute.python, is passed on as is.
+    signature = jumbo_signature(message)
+    if signature is not None:
+        return signature
     return encode(json_dumps(message), constants.MAX_RESULT_LENGTH)
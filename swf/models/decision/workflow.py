@@ -87,6 +87,8 @@ class WorkflowExecutionDecision(Decision):
         """
         if input is not None:
             input = format.input(input)
+        if task_list is not None:
+            task_list = {'name': task_list}
 
         self.update_attributes({
             'childPolicy': child_policy,
@@ -14,6 +14,23 @@ from swf import format
 from swf.utils import camel_to_underscore, cached_property
 
 
+# Memoized camel_to_underscore() of attribute keys
+_UNDERSCORE_KEYS = {}
+
+
+def underscore_key(key):
+    """Memoized ``camel_to_underscore`` for event attribute keys"""
+    try:
+        return _UNDERSCORE_KEYS[key]
+    except KeyError:
+        _UNDERSCORE_KEYS[key] = underscore = camel_to_underscore(key)
+        return underscore
+
+
+_NOT_DECODED = object()
+_NO_INPUT = object()
+
+
 class Event(object):
     """Simple workflow execution event wrapper base class
 
@@ -31,6 +48,11 @@ class Event(object):
     instance would for example have type 'DecisionTask',
     name 'DecisionTaskScheduleFailed', id '1' and state 'failed'.
 
+    Events built by the factory are instances of compact subclasses (see
+    ``compact_event_class``): their attributes live in ``__slots__``, the
+    ``input`` is only decoded when accessed and the raw event is not kept
+    but rebuilt on demand.
+
     :param  id: event id provided by amazon service
     :type   id: string
 
@@ -48,6 +70,9 @@ class Event(object):
     _attributes_key = None
     _attributes = None
 
+    # Compact subclasses only: attribute keys, as (camelCase, underscore) pairs
+    _compact_keys = None
+
     excluded_attributes = (
         'eventId',
         'eventType',
@@ -60,10 +85,13 @@ class Event(object):
         self._id = id
         self._state = state
         self._timestamp = timestamp
-        self._input = {}
-        self.raw = raw_data or {}
+        self._input = _NOT_DECODED
+        self._raw_input = _NO_INPUT
+        self._raw = raw_data or {}
 
         self.process_attributes()
+        if self._compact_keys is not None:
+            self._raw = None
 
     def __repr__(self):
         return '<Event %s %s : %s >' % (self.id, self.type, self.state)
@@ -90,14 +118,108 @@ class Event(object):
 
     @property
     def input(self):
+        if self._input is _NOT_DECODED:
+            if self._raw_input is _NO_INPUT:
+                self._input = {}
+            else:
+                self._input = format.decode(self._raw_input)
         return self._input
 
     @input.setter
     def input(self, value):
-        self._input = format.decode(value)
+        self._raw_input = value
+        self._input = _NOT_DECODED
+
+    @property
+    def raw(self):
+        """Raw event, as provided by amazon service"""
+        if self._raw is None:
+            attributes = {}
+            for key, underscore in self._compact_keys:
+                if key == 'input':
+                    attributes[key] = self._raw_input
+                else:
+                    attributes[key] = getattr(self, underscore)
+            return {
+                'eventId': self._id,
+                'eventType': self._name,
+                'eventTimestamp': self._timestamp,
+                self._attributes_key: attributes,
+            }
+        return self._raw
+
+    @raw.setter
+    def raw(self, value):
+        self._raw = value
+
+    def get_fields(self):
+        """Instance attributes, wherever they are stored
+
+        :rtype: dict
+        """
+        fields = dict(getattr(self, '__dict__', {}))
+        for klass in type(self).__mro__:
+            for name in klass.__dict__.get('__slots__', ()):
+                if name not in fields and hasattr(self, name):
+                    fields[name] = getattr(self, name)
+        fields['_raw'] = self.raw
+        return fields
 
     def process_attributes(self):
         """Processes the event raw_data attributes_key elements
         and sets current instance attributes accordingly"""
-        for key, value in iteritems(self.raw[self._attributes_key]):
-            setattr(self, camel_to_underscore(key), value)
+        for key, value in iteritems(self._raw[self._attributes_key]):
+            setattr(self, underscore_key(key), value)
+
+
+# Event class, name, attributes key, attribute keys -> compact class
+_COMPACT_CLASSES = {}
+
+
+def compact_event_class(event_class, name, attributes_key, keys):
+    """Returns a subclass of *event_class* for events named *name* with these
+    attribute *keys*, storing everything in ``__slots__``.
+
+    :param  event_class: ``Event`` subclass for the event type
+    :type   event_class: type
+
+    :param  name: event name, e.g. 'ActivityTaskScheduled'
+    :type   name: str
+
+    :param  attributes_key: key of the attributes in the raw event
+    :type   attributes_key: str
+
+    :param  keys: attribute keys of the raw event
+    :type   keys: iterable[str]
+
+    :rtype: type
+    """
+    keys = tuple(sorted(keys))
+    cache_key = (event_class, name, attributes_key, keys)
+    klass = _COMPACT_CLASSES.get(cache_key)
+    if klass is None:
+        compact_keys = tuple((key, underscore_key(key)) for key in keys)
+        slots = [
+            '_id', '_state', '_timestamp', '_timestamp_cache',
+            '_input', '_raw_input', '_raw',
+        ]
+        slots.extend(
+            underscore for _, underscore in compact_keys
+            if not hasattr(event_class, underscore)  # e.g. input
+        )
+        klass = type(str(name + 'Event'), (event_class,), {
+            '__slots__': tuple(slots),
+            '__module__': event_class.__module__,
+            '__reduce__': _reduce_event,
+            '_name': name,
+            '_attributes_key': attributes_key,
+            '_compact_keys': compact_keys,
+        })
+        _COMPACT_CLASSES[cache_key] = klass
+    return klass
+
+
+def _reduce_event(self):
+    from swf.models.event.factory import EventFactory
+
+    return EventFactory, (self.raw,)
@@ -33,7 +33,9 @@ from swf.models.event.marker import (
     CompiledMarkerEvent
 )
 
-from swf.utils import camel_to_underscore, decapitalize
+from swf.models.event.base import compact_event_class, underscore_key
+
+from swf.utils import decapitalize
 
 
 EVENTS = collections.OrderedDict([
@@ -113,9 +115,12 @@ class EventFactory(object):
         # response field is non-capitalized...
         event_attributes_key = decapitalize(event_name) + 'EventAttributes'
 
-        klass = EventFactory.events[event_type]['event']
-        klass._name = event_name
-        klass._attributes_key = event_attributes_key
+        klass = compact_event_class(
+            EventFactory.events[event_type]['event'],
+            event_name,
+            event_attributes_key,
+            raw_event[event_attributes_key],
+        )
 
         instance = klass(
             id=event_id,
@@ -162,7 +167,7 @@ class EventFactory(object):
 
         """
         left, sep, right = event_name.partition(event_type)
-        return camel_to_underscore(left + right)
+        return underscore_key(left + right)
 
 
 class CompiledEventFactory(object):
@@ -68,9 +68,22 @@ class History(object):
 
     def __init__(self, *args, **kwargs):
         self.events = kwargs.pop('events', [])
-        self.raw = kwargs.pop('raw', None)
+        self._raw = kwargs.pop('raw', None)
         self.it_pos = 0
 
+    @property
+    def raw(self):
+        """Raw events: the ones passed at creation time, else rebuilt from
+        the events, leaving out the None placeholders of a history resumed
+        from a checkpoint."""
+        if self._raw is None:
+            return [event.raw for event in self.events if event is not None]
+        return self._raw
+
+    @raw.setter
+    def raw(self, value):
+        self._raw = value
+
     def __len__(self):
         return len(self.events)
 
@@ -274,4 +287,5 @@ class History(object):
             event = EventFactory(d)
             events_history.append(event)
 
-        return cls(events=events_history, raw=data)
+        # Don't keep *data*: events rebuild their raw representation if needed.
+        return cls(events=events_history)
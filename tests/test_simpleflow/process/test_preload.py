@@ -0,0 +1,27 @@
+import gc
+import sys
+import unittest
+
+from simpleflow.process import preload_modules
+
+
+class TestPreloadModules(unittest.TestCase):
+    def setUp(self):
+        sys.modules.pop('tests.data.constants', None)
+        if hasattr(gc, 'unfreeze'):
+            self.addCleanup(gc.unfreeze)
+
+    def test_preload_modules(self):
+        durations = preload_modules(['tests.data.constants', 'json', 'tests.data.constants'])
+        self.assertEqual(list(durations), ['tests.data.constants', 'json'])
+        self.assertIn('tests.data.constants', sys.modules)
+        if hasattr(gc, 'get_freeze_count'):
+            self.assertGreater(gc.get_freeze_count(), 0)
+
+    def test_missing_module(self):
+        with self.assertRaises(ImportError):
+            preload_modules(['tests.data.does_not_exist'])
+
+
+if __name__ == '__main__':
+    unittest.main()
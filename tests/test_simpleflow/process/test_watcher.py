@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+import unittest
+
+import mock
+
+from simpleflow.process import ProcessWatcher, watch_sigchld
+from simpleflow.process import watcher
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+class TestProcessWatcher(unittest.TestCase):
+    def setUp(self):
+        self.watcher = ProcessWatcher()
+        self.addCleanup(self.watcher.close)
+
+    def start_process(self, seconds):
+        process = multiprocessing.Process(target=sleep, args=(seconds,))
+        process.start()
+        self.addCleanup(process.join)
+        self.addCleanup(process.terminate)
+        return process
+
+    def start_subprocess(self, seconds):
+        process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep({})'.format(seconds)])
+        self.addCleanup(process.wait)
+        self.addCleanup(process.terminate)
+        return process
+
+    def test_wait_process(self):
+        short = self.start_process(0.1)
+        long_ = self.start_process(30)
+        self.watcher.add(short)
+        self.watcher.add(long_)
+
+        start = time.time()
+        exited, ready = self.watcher.wait(10)
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(exited, [short])
+        self.assertEqual(ready, [])
+
+        short.join()
+        self.watcher.remove(short)
+        self.assertEqual(len(self.watcher), 1)
+
+    def test_wait_subprocess(self):
+        process = self.start_subprocess(0.1)
+        self.watcher.add(process)
+
+        start = time.time()
+        exited, _ = self.watcher.wait(10)
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(exited, [process])
+        self.assertEqual(process.wait(), 0)
+
+    def test_wait_subprocess_sigchld(self):
+        self.addCleanup(signal.signal, signal.SIGCHLD, signal.getsignal(signal.SIGCHLD))
+        watch_sigchld()
+        process = self.start_subprocess(0.5)
+        with mock.patch.object(os, 'pidfd_open', side_effect=OSError, create=True):
+            self.watcher.add(process)
+
+        # No polling: the only wake-up is the SIGCHLD
+        with mock.patch.object(watcher, '_select', side_effect=watcher._select) as select_:
+            exited, _ = self.watcher.wait(10)
+        self.assertEqual(exited, [process])
+        self.assertLessEqual(select_.call_count, 2)
+        self.assertGreater(select_.call_args_list[0][0][1], 5)
+
+    def test_wait_timeout(self):
+        self.watcher.add(self.start_process(30))
+        self.watcher.add(self.start_subprocess(30))
+
+        start = time.time()
+        self.assertEqual(self.watcher.wait(0.2), ([], []))
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+    def test_wait_fds(self):
+        self.watcher.add(self.start_process(30))
+        r, w = os.pipe()
+        self.addCleanup(os.close, r)
+        self.addCleanup(os.close, w)
+        os.write(w, b'x')
+
+        self.assertEqual(self.watcher.wait(10, fds=[r]), ([], [r]))
+
+
+if __name__ == '__main__':
+    unittest.main()
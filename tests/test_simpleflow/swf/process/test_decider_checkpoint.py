@@ -0,0 +1,178 @@
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from simpleflow.history import HistoryCache, HistoryCheckpoints
+from simpleflow.swf.executor import Executor
+from simpleflow.swf.process.decider.base import DeciderPoller
+from simpleflow.swf.process.decider.pool import response_from_task, task_from_response
+from swf.models.history import builder
+from tests.data import (
+    BaseTestWorkflow,
+    DOMAIN,
+    increment,
+)
+
+
+class ATestWorkflow(BaseTestWorkflow):
+    def run(self, x):
+        return self.submit(increment, x).result
+
+
+class FakeConnection(object):
+    """
+    Serve a history in pages of 2 events, as SWF does.
+    """
+    page_size = 2
+
+    def __init__(self, history):
+        self.history = history
+        self.pages = []
+
+    def poll_for_decision_task(self, domain, task_list, identity=None, next_page_token=None,
+                               reverse_order=None):
+        events = [event.raw for event in self.history.events]
+        if reverse_order:
+            events.reverse()
+        start = int(next_page_token or 0)
+        self.pages.append(start)
+        task = {
+            'taskToken': 'token',
+            'events': events[start:start + self.page_size],
+            'workflowType': {'name': ATestWorkflow.name, 'version': ATestWorkflow.version},
+            'workflowExecution': {'workflowId': 'wf', 'runId': 'run'},
+        }
+        if start + self.page_size < len(events):
+            task['nextPageToken'] = str(start + self.page_size)
+        return task
+
+
+def build_history():
+    history = builder.History(ATestWorkflow, input={'args': [1]})
+    history.add_decision_task_completed()
+    return history
+
+
+def add_increment(history):
+    (history
+     .add_activity_task(increment,
+                        decision_id=history.last_id,
+                        last_state='completed',
+                        activity_id='activity-tests.data.activities.increment-1',
+                        input={'args': [1]},
+                        result=2)
+     .add_decision_task_scheduled()
+     .add_decision_task_started())
+
+
+class TestHistoryCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_poller(self, history, pool_size=None):
+        cache = HistoryCache(check=True)
+        executor = Executor(DOMAIN, ATestWorkflow, history_cache=cache)
+        poller = DeciderPoller(
+            [executor], DOMAIN, 'task-list', False,
+            history_cache=cache,
+            pool_size=pool_size,
+            history_checkpoints=HistoryCheckpoints(self.directory),
+        )
+        poller.connection = FakeConnection(history)
+        return poller
+
+    def poll_and_save(self, poller):
+        response = poller.poll()
+        poller.save_checkpoint(response)
+        return response
+
+    def test_fetch_new_events_only(self):
+        history = build_history()
+        poller = self.make_poller(history)
+        response = self.poll_and_save(poller)
+        self.assertEqual(poller.connection.pages, [0, 2])
+        self.assertEqual([e.id for e in response.history], [1, 2, 3, 4])
+
+        # Only the aggregated state and the events still referred to are saved
+        checkpoint = HistoryCheckpoints(self.directory).disk.get(HistoryCheckpoints.key_prefix + 'run')
+        self.assertNotIn('_history', checkpoint)
+        self.assertEqual(sorted(checkpoint['_events']), [1, 4])
+
+        # New process, e.g. after a restart: the checkpoint comes from disk
+        add_increment(history)
+        poller = self.make_poller(history)
+        response = self.poll_and_save(poller)
+        self.assertEqual(poller.connection.pages, [0, 2, 4])
+        self.assertEqual(len(response.history), len(history))
+        self.assertEqual(
+            [e.id for e in response.history if e is not None],
+            [1, 4] + list(range(5, len(history) + 1)))
+        self.assertEqual(poller.history_cache.hits, 1)
+        parsed = poller.history_cache.peek('wf', 'run')
+        self.assertEqual(parsed.activities['activity-tests.data.activities.increment-1']['state'], 'completed')
+
+        # Same process: the checkpoint comes from the history cache
+        add_increment(history)
+        with mock.patch.object(HistoryCheckpoints, 'load') as load:
+            response = poller.poll()
+        self.assertFalse(load.called)
+        self.assertEqual(len(response.history), len(history))
+        self.assertEqual(response.history.events[-1].id, len(history))
+
+    def test_stale_checkpoint(self):
+        self.poll_and_save(self.make_poller(build_history()))
+
+        history = build_history()
+        add_increment(history)
+        poller = self.make_poller(history)
+        response = poller.poll()
+        self.assertEqual(len(poller.connection.pages), (len(history) + 1) // 2)
+        self.assertEqual([e.id for e in response.history], list(range(1, len(history) + 1)))
+        self.assertEqual(poller.history_cache.misses, 1)
+
+    def test_pool(self):
+        history = build_history()
+        self.poll_and_save(self.make_poller(history))
+
+        add_increment(history)
+        poller = self.make_poller(history, pool_size=1)
+        response = poller.poll()
+        # The pool processes parse the history, not the poller
+        self.assertEqual(len(poller.history_cache), 0)
+
+        # A pool process gets the checkpoint and the new events only
+        task = pickle.loads(pickle.dumps(task_from_response(response)))
+        self.assertEqual([e['eventId'] for e in task['events']], list(range(5, len(history) + 1)))
+        response = response_from_task(poller, task)
+        self.assertEqual(len(response.history), len(history))
+        self.assertEqual([e['eventId'] for e in response.history.raw], [1, 4] + list(range(5, len(history) + 1)))
+        poller.decide(response)
+        poller.save_checkpoint(response)
+        self.assertEqual(poller.history_cache.hits, 1)
+        parsed = poller.history_cache.peek('wf', 'run')
+        self.assertEqual(parsed.activities['activity-tests.data.activities.increment-1']['state'], 'completed')
+        self.assertNotIn(None, parsed.events)
+
+        # The poller resumes from the newer checkpoint on disk
+        add_increment(history)
+        poller.connection = FakeConnection(history)
+        response = poller.poll()
+        self.assertEqual(poller.connection.pages, [0, 2, 4])
+        self.assertEqual(response.checkpoint.last_event_id, len(history) - 5)
+
+    def test_requires_history_cache(self):
+        with self.assertRaises(ValueError):
+            DeciderPoller(
+                [Executor(DOMAIN, ATestWorkflow)], DOMAIN, 'task-list', False,
+                history_checkpoints=HistoryCheckpoints(self.directory),
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import unittest
+
+from simpleflow.swf.process.decider.pool import DeciderPool
+from swf.actors.decider import Decider
+from swf.models.history import builder
+from tests.data import BaseTestWorkflow, DOMAIN
+
+
+class ATestWorkflow(BaseTestWorkflow):
+    pass
+
+
+class FakePoller(object):
+    """
+    Poller completing decision tasks by pushing (token, pid) to a queue.
+    """
+    workflow_name = ATestWorkflow.name
+    history_checkpoints = None
+    response_from_task = Decider.__dict__['response_from_task']
+
+    def __init__(self):
+        self.domain = DOMAIN
+        self.completed = multiprocessing.Queue()
+
+    def decide(self, decision_response):
+        return []
+
+    def complete_with_retry(self, token, decisions):
+        self.completed.put((token, os.getpid()))
+
+
+def make_response(poller, token, run_id='run'):
+    history = builder.History(ATestWorkflow)
+    task = {
+        'taskToken': token,
+        'events': [event.raw for event in history.events],
+        'workflowType': {'name': ATestWorkflow.name, 'version': ATestWorkflow.version},
+        'workflowExecution': {'workflowId': 'wf', 'runId': run_id},
+    }
+    return poller.response_from_task(task)
+
+
+class TestDeciderPool(unittest.TestCase):
+    def setUp(self):
+        self.poller = FakePoller()
+
+    def get_completed(self, count):
+        return [self.poller.completed.get(timeout=10) for _ in range(count)]
+
+    def test_processes_are_reused(self):
+        pool = DeciderPool(self.poller, 1)
+        pool.start()
+        for i in range(3):
+            pool.submit(make_response(self.poller, 'token-{}'.format(i)))
+        pool.stop()
+
+        completed = self.get_completed(3)
+        self.assertEqual([token for token, _ in completed], ['token-0', 'token-1', 'token-2'])
+        self.assertEqual(len(set(pid for _, pid in completed)), 1)
+        self.assertNotEqual(completed[0][1], os.getpid())
+        self.assertEqual(pool.workers, [])
+
+    def test_processes_are_recycled(self):
+        pool = DeciderPool(self.poller, 1, max_decisions=2)
+        pool.start()
+        for i in range(4):
+            pool.submit(make_response(self.poller, 'token-{}'.format(i)))
+        pool.stop()
+
+        pids = [pid for _, pid in self.get_completed(4)]
+        self.assertEqual(pids[0], pids[1])
+        self.assertEqual(pids[2], pids[3])
+        self.assertNotEqual(pids[1], pids[2])
+
+    def test_same_run_goes_to_same_worker(self):
+        pool = DeciderPool(self.poller, 2)
+        pool.start()
+        # run-a and run-b are handled concurrently, by different workers
+        pool.submit(make_response(self.poller, 'a-0', run_id='run-a'))
+        pool.submit(make_response(self.poller, 'b-0', run_id='run-b'))
+        pids = dict(self.get_completed(2))
+        while any(w.busy for w in pool.workers):
+            pool._collect(timeout=None)
+
+        pool.submit(make_response(self.poller, 'b-1', run_id='run-b'))
+        pool.stop()
+
+        [(_, pid)] = self.get_completed(1)
+        self.assertNotEqual(pids['a-0'], pids['b-0'])
+        self.assertEqual(pid, pids['b-0'])
+
+    def test_dead_idle_worker_is_replaced(self):
+        pool = DeciderPool(self.poller, 1)
+        pool.start()
+        dead = pool.workers[0]
+        dead.process.terminate()
+        dead.process.join()
+
+        pool.submit(make_response(self.poller, 'token'))
+        pool.stop()
+
+        [(token, pid)] = self.get_completed(1)
+        self.assertEqual(token, 'token')
+        self.assertNotEqual(pid, dead.pid)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            DeciderPool(self.poller, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import time
+import unittest
+
+import swf.exceptions
+from simpleflow.swf.process.worker.pipeline import ActivityPipeline
+from swf.responses import Response
+from tests.test_simpleflow.swf.process.utils import (
+    FakeActivityPoller,
+    make_poll_data,
+    sleep_and_report,
+)
+
+
+SLEEP = '{"args": [0.5]}'
+
+
+class PipelinePoller(FakeActivityPoller):
+    """
+    Poller serving canned tasks; stops once all tasks were polled.
+    """
+    def __init__(self, polls, concurrency):
+        super(PipelinePoller, self).__init__(concurrency=concurrency)
+        self.polls = polls
+        self.nb_polled = 0
+        self.is_alive = True
+
+    def poll_with_retry(self):
+        if not self.polls:
+            raise swf.exceptions.PollTimeout('')
+        data = self.polls.pop(0)
+        return Response(task_token=data['taskToken'], raw_response=data)
+
+    def response_from_poll_data(self, polled_activity_data):
+        self.nb_polled += 1
+        if self.nb_polled == len(self.polls):
+            self.is_alive = False
+        return super(PipelinePoller, self).response_from_poll_data(polled_activity_data)
+
+
+class TestActivityPipeline(unittest.TestCase):
+    def test_tasks_run_concurrently(self):
+        poller = PipelinePoller([make_poll_data(n, input=SLEEP) for n in range(4)], concurrency=4)
+        pipeline = ActivityPipeline(poller, poller.concurrency, heartbeat=0.2)
+        start = time.time()
+        pipeline.run()
+        elapsed = time.time() - start
+
+        completed = [poller.completed.get(timeout=1) for _ in range(4)]
+        self.assertEqual(sorted(token for token, _ in completed), ['token-{}'.format(n) for n in range(4)])
+        self.assertEqual(len(set(pid for _, pid in completed)), 4)
+        self.assertLess(elapsed, 1.5)
+        self.assertGreater(pipeline.heartbeats.metrics['sent'], 0)
+
+    def test_slots_are_limited(self):
+        poller = PipelinePoller([make_poll_data(n, input=SLEEP) for n in range(4)], concurrency=2)
+        pipeline = ActivityPipeline(poller, poller.concurrency, heartbeat=None)
+        start = time.time()
+        pipeline.run()
+        self.assertGreaterEqual(time.time() - start, 1.0)
+        self.assertIsNone(pipeline.heartbeats)
+
+    def test_heartbeat_timeout(self):
+        poller = PipelinePoller([], concurrency=1)
+        pipeline = ActivityPipeline(poller, poller.concurrency, heartbeat=60)
+
+        task = poller.response_from_poll_data(make_poll_data(0, input=SLEEP)).activity_task
+        self.assertEqual(pipeline._get_heartbeat_timeout(task), sleep_and_report.task_heartbeat_timeout)
+
+        data = make_poll_data(1, input='{"args": [0.5], "heartbeat_timeout": 30}')
+        task = poller.response_from_poll_data(data).activity_task
+        self.assertEqual(pipeline._get_heartbeat_timeout(task), 30)
+
+    def test_dead_process_fails_task(self):
+        poller = PipelinePoller([make_poll_data(0, 'exit_badly', '{}')], concurrency=2)
+        ActivityPipeline(poller, poller.concurrency).run()
+        token, reason = poller.failed.get(timeout=1)
+        self.assertEqual(token, 'token-0')
+        self.assertIn('exit code 3', reason)
+
+
+if __name__ == '__main__':
+    unittest.main()
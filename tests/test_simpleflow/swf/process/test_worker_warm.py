@@ -0,0 +1,69 @@
+import os
+import unittest
+
+from tests.test_simpleflow.swf.process.utils import FakeActivityPoller, make_poll_data
+
+
+class WarmPoller(FakeActivityPoller):
+    """
+    Poller with a warm executor, running the tasks it's given.
+    """
+    def __init__(self, cancel=(), **kwargs):
+        super(WarmPoller, self).__init__(warm_executor=True, **kwargs)
+        self.cancel = cancel
+
+    def run_tasks(self, polls):
+        try:
+            for data in polls:
+                self.process(self.response_from_poll_data(data))
+        finally:
+            self.stop_executor()
+
+    def heartbeat(self, token, details=None):
+        return {'cancelRequested': token in self.cancel}
+
+
+class TestWarmExecutor(unittest.TestCase):
+    def test_process_is_reused(self):
+        poller = WarmPoller()
+        poller.run_tasks([make_poll_data(n) for n in range(3)])
+
+        completed = [poller.completed.get(timeout=1) for _ in range(3)]
+        self.assertEqual([token for token, _ in completed], ['token-0', 'token-1', 'token-2'])
+        self.assertEqual(len(set(pid for _, pid in completed)), 1)
+        self.assertNotEqual(completed[0][1], os.getpid())
+        self.assertIsNone(poller._executor)
+
+    def test_process_is_recycled(self):
+        poller = WarmPoller(executor_max_tasks=2)
+        poller.run_tasks([make_poll_data(n) for n in range(4)])
+
+        pids = [poller.completed.get(timeout=1)[1] for _ in range(4)]
+        self.assertEqual(pids[0], pids[1])
+        self.assertEqual(pids[2], pids[3])
+        self.assertNotEqual(pids[1], pids[2])
+
+    def test_dead_process_fails_task(self):
+        poller = WarmPoller()
+        poller.run_tasks([make_poll_data(0, 'exit_badly', '{}'), make_poll_data(1)])
+
+        token, reason = poller.failed.get(timeout=1)
+        self.assertEqual(token, 'token-0')
+        self.assertIn('exit code 3', reason)
+        self.assertEqual(poller.completed.get(timeout=1)[0], 'token-1')
+
+    def test_cancelled_task_stops_process(self):
+        poller = WarmPoller(cancel=('token-0',))
+        poller.run_tasks([make_poll_data(0, input='{"args": [5]}'), make_poll_data(1)])
+
+        self.assertEqual(poller.completed.get(timeout=1)[0], 'token-1')
+        self.assertTrue(poller.completed.empty())
+        self.assertTrue(poller.failed.empty())
+
+    def test_no_concurrency(self):
+        with self.assertRaises(ValueError):
+            WarmPoller(concurrency=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import multiprocessing
+import os
+import time
+
+from simpleflow import activity
+from simpleflow.swf.process.worker.base import ActivityPoller
+from swf.models import Domain
+
+
+@activity.with_attributes(version='test')
+def sleep_and_report(seconds):
+    time.sleep(seconds)
+    return os.getpid()
+
+
+@activity.with_attributes(version='test')
+def exit_badly():
+    os._exit(3)
+
+
+def make_poll_data(n, name='sleep_and_report', input='{"args": [0]}'):
+    return {
+        'taskToken': 'token-{}'.format(n),
+        'activityId': 'activity-{}'.format(n),
+        'activityType': {'name': __name__ + '.' + name, 'version': 'test'},
+        'workflowExecution': {'workflowId': 'wf', 'runId': 'run'},
+        'startedEventId': n,
+        'input': input,
+    }
+
+
+class FakeActivityPoller(ActivityPoller):
+    """
+    Poller reporting completions and failures on queues instead of SWF.
+    """
+    def __init__(self, **kwargs):
+        super(FakeActivityPoller, self).__init__(
+            Domain('test-domain'), 'task-list', heartbeat=0.2, **kwargs
+        )
+        self.completed = multiprocessing.Queue()
+        self.failed = multiprocessing.Queue()
+
+    def complete_with_retry(self, token, result):
+        self.completed.put((token, result))
+
+    def fail_with_retry(self, token, task, reason=None, details=None):
+        self.failed.put((token, reason))
+
+    def heartbeat(self, token, details=None):
+        return {}
@@ -0,0 +1,57 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from simpleflow import activity
+from simpleflow.history import History
+from simpleflow.swf.stats import DurationModel
+from simpleflow.task import ActivityTask
+from swf.models import History as BasicHistory
+
+
+def fake_history():
+    with open("tests/data/dumps/workflow_execution_basic.json") as f:
+        basic_history_tree = json.loads(f.read())
+    return History(BasicHistory.from_event_list(basic_history_tree["events"]))
+
+
+@activity.with_attributes()
+def unknown():
+    pass
+
+
+@activity.with_attributes(estimated_duration=12)
+def hinted():
+    pass
+
+
+class TestDurationModel(unittest.TestCase):
+    def test_add_history(self):
+        model = DurationModel()
+        model.add_history(fake_history())
+        self.assertEqual(model.durations['examples.basic.Delay'], 30.24)
+        self.assertEqual(model.durations['examples.basic.double'], 0.236)
+
+        model.add('examples.basic.Delay', 40.24)
+        self.assertAlmostEqual(model.durations['examples.basic.Delay'], 33.24)
+
+    def test_estimate(self):
+        model = DurationModel({hinted.name: 1, unknown.name: 2}, default=5)
+        self.assertEqual(model.estimate(ActivityTask(hinted)), 12)
+        self.assertEqual(model.estimate(ActivityTask(unknown)), 2)
+        self.assertEqual(DurationModel(default=5).estimate(ActivityTask(unknown)), 5)
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'durations.json')
+            DurationModel({'a': 1.5}).save(path)
+            self.assertEqual(DurationModel.load(path).durations, {'a': 1.5})
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
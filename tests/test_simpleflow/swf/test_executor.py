@@ -1,11 +1,21 @@
+import json
+import shutil
+import tempfile
 import unittest
 
 import boto
+import mock
 from moto import mock_swf
 from sure import expect
 
 from simpleflow import activity, futures
+from simpleflow.canvas import ShardedGroup
+from simpleflow.history import History
+from simpleflow.result_cache import DiskResultCache, hash_arguments
+from simpleflow.swf import constants
 from simpleflow.swf.executor import Executor
+from simpleflow.workflow import ShardWorkflow
+import swf.format
 from swf.actors import Decider
 from swf.models.history import builder
 from swf.responses import Response
@@ -13,6 +23,7 @@ from tests.data import (
     BaseTestWorkflow,
     DOMAIN,
     increment,
+    triple,
 )
 
 
@@ -21,6 +32,90 @@ def increment_high_priority(self, x):
     return x + 1
 
 
+class ManyLargeTasksWorkflow(BaseTestWorkflow):
+    def run(self):
+        futures.wait(*[self.submit(increment, 'x' * 10000, i) for i in range(8)])
+
+
+class LoopWorkflow(BaseTestWorkflow):
+    continue_as_new_max_events = 10
+
+    def run(self, x, count=0):
+        while count < 100:
+            x = self.submit(increment, x).result
+            count += 1
+            self.continue_as_new_if_needed(x, count=count)
+        return x
+
+
+class RestartWorkflow(BaseTestWorkflow):
+    tag_list = ['a', 'b']
+
+    def run(self, x):
+        self.submit(increment, x)
+        self.continue_as_new(x + 1)
+
+
+class FanOutWorkflow(BaseTestWorkflow):
+    def run(self):
+        return self.submit(ShardedGroup(increment, range(30), shard_size=4)).result
+
+
+class LimitedFanOutWorkflow(BaseTestWorkflow):
+    def run(self):
+        return self.submit(ShardedGroup(increment, range(30), shard_size=4, max_parallel=6)).result
+
+
+class ATestShardWorkflow(ShardWorkflow):
+    task_list = BaseTestWorkflow.task_list
+    decision_tasks_timeout = BaseTestWorkflow.decision_tasks_timeout
+    execution_timeout = BaseTestWorkflow.execution_timeout
+
+
+class CachedResultsWorkflow(BaseTestWorkflow):
+    def run(self, x):
+        y = self.submit(triple, x).result
+        return self.submit(triple, y).result
+
+
+class JumboResultWorkflow(BaseTestWorkflow):
+    def run(self, x):
+        result = self.submit(triple, x).result
+        self.submit(increment, x).result
+        return result
+
+
+JUMBO_SIGNATURE = 'simpleflow+s3://jumbo-bucket/f00 13'
+
+
+def add_jumbo_triple(history, x):
+    """
+    Add a completed triple(x) whose result went to a jumbo field.
+    """
+    history.add_activity_task(
+        triple,
+        decision_id=history.last_id,
+        last_state='completed',
+        activity_id='activity-{}-{}'.format(triple.name, hash_arguments([x], {})),
+        input={'args': [x]},
+    )
+    history.events[-1].result = JUMBO_SIGNATURE
+    return history
+
+
+def add_increments(history, results):
+    for result in results:
+        (history
+         .add_activity_task(increment,
+                            decision_id=history.last_id,
+                            last_state='completed',
+                            activity_id='activity-tests.data.activities.increment-{}'.format(result - 1),
+                            input={'args': [result - 1]},
+                            result=result)
+         .add_decision_task_scheduled()
+         .add_decision_task_started())
+
+
 class ExampleWorkflow(BaseTestWorkflow):
     """
     Example workflow definition used in tests below.
@@ -86,6 +181,182 @@ class TestSimpleflowSwfExecutor(unittest.TestCase):
 
 
 class TestCaseNotNeedingDomain(unittest.TestCase):
+    def test_decisions_size_limit(self):
+        history = builder.History(ManyLargeTasksWorkflow, input={})
+        executor = Executor(DOMAIN, ManyLargeTasksWorkflow)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+
+        expect(decisions[-1]["decisionType"]).to.equal("StartTimer")
+        expect(len(decisions)).to.be.lower_than(8)
+        expect(len(json.dumps(decisions))).to.be.lower_than(constants.MAX_REQUEST_SIZE - 32000)
+
+    def test_continue_as_new(self):
+        history = builder.History(RestartWorkflow, input={'args': [1]})
+        executor = Executor(DOMAIN, RestartWorkflow)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+
+        expect(len(decisions)).to.equal(1)
+        expect(decisions[0]['decisionType']).to.equal('ContinueAsNewWorkflowExecution')
+        attributes = decisions[0]['continueAsNewWorkflowExecutionDecisionAttributes']
+        expect(json.loads(attributes['input'])).to.equal({'args': [2], 'kwargs': {}})
+        expect(attributes['taskList']).to.equal({'name': RestartWorkflow.task_list})
+        expect(attributes['childPolicy']).to.equal('TERMINATE')
+        expect(attributes['tagList']).to.equal(['a', 'b'])
+
+    def test_continue_as_new_if_needed(self):
+        history = builder.History(LoopWorkflow, input={'args': [1]})
+        add_increments(history, [2])
+        executor = Executor(DOMAIN, LoopWorkflow)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect(decisions[0]['decisionType']).to.equal('ScheduleActivityTask')
+
+        # Only the last check continues as new
+        add_increments(history, [3, 4])
+        expect(len(history)).to.be.greater_than(LoopWorkflow.continue_as_new_max_events)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect(len(decisions)).to.equal(1)
+        expect(decisions[0]['decisionType']).to.equal('ContinueAsNewWorkflowExecution')
+        attributes = decisions[0]['continueAsNewWorkflowExecutionDecisionAttributes']
+        expect(json.loads(attributes['input'])).to.equal({'args': [4], 'kwargs': {'count': 3}})
+
+    def test_sharded_group(self):
+        history = builder.History(FanOutWorkflow, input={})
+        executor = Executor(DOMAIN, FanOutWorkflow)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+
+        expect([d['decisionType'] for d in decisions]).to.equal(['StartChildWorkflowExecution'] * 4)
+        attributes = decisions[0]['startChildWorkflowExecutionDecisionAttributes']
+        expect(attributes['workflowType']['name']).to.equal('simpleflow.workflow.ShardWorkflow')
+        inputs = [json.loads(d['startChildWorkflowExecutionDecisionAttributes']['input']) for d in decisions]
+        expect([len(i['args'][1]) for i in inputs]).to.equal([8, 8, 8, 6])
+        expect(inputs[0]['args'][0]).to.equal(increment.name)
+        expect(inputs[0]['kwargs']['shard_size']).to.equal(4)
+
+        history = builder.History(ATestShardWorkflow, input=inputs[3])
+        executor = Executor(DOMAIN, ATestShardWorkflow)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect([d['decisionType'] for d in decisions]).to.equal(['StartChildWorkflowExecution'] * 2)
+
+        history = builder.History(ATestShardWorkflow, input={'args': [increment.name, [1, 2, 3], 4]})
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect([d['decisionType'] for d in decisions]).to.equal(['ScheduleActivityTask'] * 3)
+
+    def test_sharded_group_max_parallel(self):
+        # At most 6 activities open at once, across all levels
+        history = builder.History(LimitedFanOutWorkflow, input={})
+        executor = Executor(DOMAIN, LimitedFanOutWorkflow)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect([d['decisionType'] for d in decisions]).to.equal(['StartChildWorkflowExecution'] * 4)
+        inputs = [json.loads(d['startChildWorkflowExecutionDecisionAttributes']['input']) for d in decisions]
+        expect([i['kwargs']['max_parallel'] for i in inputs]).to.equal([1] * 4)
+
+        # Each child workflow runs one activity at a time, even sharded again
+        history = builder.History(ATestShardWorkflow, input=inputs[3])
+        executor = Executor(DOMAIN, ATestShardWorkflow)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect([d['decisionType'] for d in decisions]).to.equal(['StartChildWorkflowExecution'])
+        input = json.loads(decisions[0]['startChildWorkflowExecutionDecisionAttributes']['input'])
+        expect(input['kwargs']['max_parallel']).to.equal(1)
+
+        history = builder.History(ATestShardWorkflow, input=input)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect([d['decisionType'] for d in decisions]).to.equal(['ScheduleActivityTask'])
+
+    def test_result_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = DiskResultCache(directory)
+        cache.set(cache.make_key(triple.name, triple.version, [1], {}), '3')
+
+        # Cached result: recorded in a marker, the workflow goes on
+        history = builder.History(CachedResultsWorkflow, input={'args': [1]})
+        executor = Executor(DOMAIN, CachedResultsWorkflow, result_cache=cache)
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect([d['decisionType'] for d in decisions]).to.equal(['RecordMarker', 'ScheduleActivityTask'])
+        attributes = decisions[0]['recordMarkerDecisionAttributes']
+        expect(attributes['markerName']).to.equal(constants.CACHED_RESULT_MARKER)
+        first_id = 'activity-{}-{}'.format(triple.name, hash_arguments([1], {}))
+        expect(json.loads(attributes['details'])).to.equal({'id': first_id, 'result': '3'})
+        expect(cache.get_stats()['hits']).to.equal(1)
+
+        # Next decision: the marker is used, not the cache; new results are cached
+        history.add_decision_task_completed()
+        history.add_marker(constants.CACHED_RESULT_MARKER, {'id': first_id, 'result': '3'})
+        history.add_activity_task(
+            triple,
+            decision_id=history.last_id,
+            last_state='completed',
+            activity_id='activity-{}-{}'.format(triple.name, hash_arguments([3], {})),
+            input={'args': [3]},
+            result=9,
+        )
+        history.add_decision_task_scheduled()
+        history.add_decision_task_started()
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect(decisions[0]['decisionType']).to.equal('CompleteWorkflowExecution')
+        expect(cache.get_stats()['hits']).to.equal(1)
+        expect(cache.get(cache.make_key(triple.name, triple.version, [3], {}))).to.equal('9')
+        expect(executor.list_markers()).to.equal([])
+
+        # Without a cache, a miss or a non-idempotent activity: scheduled
+        history = builder.History(CachedResultsWorkflow, input={'args': [2]})
+        for executor in (Executor(DOMAIN, CachedResultsWorkflow),
+                         Executor(DOMAIN, CachedResultsWorkflow, result_cache=cache)):
+            decisions = executor.replay(Response(history=history, execution=None)).decisions
+            expect([d['decisionType'] for d in decisions]).to.equal(['ScheduleActivityTask'])
+        expect(cache.get_stats()['misses']).to.equal(2)  # triple(3) on the first replay, triple(2)
+
+    def check_jumbo_result_recorded(self, executor, decisions):
+        """
+        The jumbo field signature is recorded, not the result; it's only
+        pulled when the next decisions read the marker.
+        """
+        expect([d['decisionType'] for d in decisions]).to.equal(['RecordMarker', 'ScheduleActivityTask'])
+        task_id = 'activity-{}-{}'.format(triple.name, hash_arguments([1], {}))
+        details = json.loads(decisions[0]['recordMarkerDecisionAttributes']['details'])
+        expect(details).to.equal({'id': task_id, 'result': JUMBO_SIGNATURE})
+
+        history = builder.History(JumboResultWorkflow, input={'args': [1]})
+        history.add_decision_task_completed()
+        history.add_marker(constants.CACHED_RESULT_MARKER, details)
+        history.add_decision_task_scheduled()
+        history.add_decision_task_started()
+        swf.format.JUMBO_FIELDS_MEMORY_CACHE.clear()
+        self.addCleanup(swf.format.JUMBO_FIELDS_MEMORY_CACHE.clear)
+        with mock.patch('swf.format._pull_content', return_value='{"a":[1,2]}') as pull:
+            executor.replay(Response(history=history, execution=None), decref_workflow=False)
+            expect(executor.cached_results[task_id]).to.equal({'a': [1, 2]})
+        pull.assert_called_once_with('jumbo-bucket', 'f00', None)
+
+    def test_result_cache_jumbo_result(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = DiskResultCache(directory)
+        executor = Executor(DOMAIN, JumboResultWorkflow, result_cache=cache)
+
+        history = add_jumbo_triple(builder.History(JumboResultWorkflow, input={'args': [1]}), 1)
+        history.add_decision_task_scheduled()
+        history.add_decision_task_started()
+        with mock.patch('swf.format.prefetch_jumbo_fields'), mock.patch('swf.format._pull_content') as pull:
+            executor.replay(Response(history=history, execution=None))
+            expect(cache.get(cache.make_key(triple.name, triple.version, [1], {}))).to.equal(JUMBO_SIGNATURE)
+
+            history = builder.History(JumboResultWorkflow, input={'args': [1]})
+            decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect(pull.called).to.be.false
+        self.check_jumbo_result_recorded(executor, decisions)
+
+    def test_repair_jumbo_result(self):
+        to_repair = History(add_jumbo_triple(builder.History(JumboResultWorkflow, input={'args': [1]}), 1))
+        to_repair.parse()
+        executor = Executor(DOMAIN, JumboResultWorkflow, repair_with=to_repair)
+
+        history = builder.History(JumboResultWorkflow, input={'args': [1]})
+        with mock.patch('swf.format._pull_content') as pull:
+            decisions = executor.replay(Response(history=history, execution=None)).decisions
+        expect(pull.called).to.be.false
+        self.check_jumbo_result_recorded(executor, decisions)
+
     def test_get_event_details(self):
         history = builder.History(ExampleWorkflow, input={})
         signal_input = {'x': 42, 'foo': 'bar', '__propagate': False}
@@ -1,3 +1,5 @@
+import json
+
 from sure import expect
 
 from simpleflow import activity
@@ -31,3 +33,17 @@ def test_task_attaches_context_to_object_instances():
     ctx = {'foo': 'bar'}
     expect(ActivityTask(ShowContextCls, context=ctx).execute()).to.equal(ctx)
     expect(ShowContextCls.context).to.be.none
+
+
+def test_schedule_passes_overridden_heartbeat_timeout():
+    from swf.models import Domain
+
+    domain = Domain('test-domain')
+    [decision] = ActivityTask(show_context_func).schedule(domain)
+    attributes = decision['scheduleActivityTaskDecisionAttributes']
+    expect(attributes['input']).to_not.contain('heartbeat_timeout')
+
+    [decision] = ActivityTask(show_context_func).schedule(domain, heartbeat_timeout=30)
+    attributes = decision['scheduleActivityTaskDecisionAttributes']
+    expect(attributes['heartbeatTimeout']).to.equal('30')
+    expect(json.loads(attributes['input'])['heartbeat_timeout']).to.equal(30)
@@ -0,0 +1,50 @@
+import json
+import unittest
+
+import mock
+
+from simpleflow.swf.utils import DecisionsAndContext
+from swf.models.decision import MarkerDecision
+
+
+def make_decision(i):
+    decision = MarkerDecision()
+    decision.record('marker-{}'.format(i), details='x' * i)
+    return decision
+
+
+class TestDecisionsAndContext(unittest.TestCase):
+    def test_serialized_size(self):
+        dac = DecisionsAndContext()
+        self.assertEqual(dac.serialized_size, len(json.dumps([])))
+
+        dac.append_decision(make_decision(1))
+        self.assertTrue(dac.extend_decision([make_decision(2), make_decision(3)]))
+        self.assertEqual(dac.serialized_size, len(json.dumps(dac.decisions)))
+
+        dac.decisions.pop()
+        self.assertEqual(dac.serialized_size, len(json.dumps(dac.decisions)))
+
+        dac.decisions = [make_decision(4)]
+        self.assertEqual(dac.serialized_size, len(json.dumps(dac.decisions)))
+
+    def test_extend_decision_max_size(self):
+        dac = DecisionsAndContext([make_decision(1)])
+        decisions = [make_decision(100)]
+        max_size = len(json.dumps(dac.decisions + decisions))
+        self.assertFalse(dac.extend_decision(decisions, max_size=max_size - 1))
+        self.assertEqual(len(dac.decisions), 1)
+        self.assertTrue(dac.extend_decision(decisions, max_size=max_size))
+        self.assertEqual(dac.serialized_size, max_size)
+
+    def test_decisions_are_serialized_once(self):
+        dac = DecisionsAndContext()
+        with mock.patch.object(
+                DecisionsAndContext, 'get_decision_size',
+                side_effect=DecisionsAndContext.get_decision_size) as get_decision_size:
+            for i in range(50):
+                self.assertTrue(dac.extend_decision([make_decision(i)], max_size=1000000))
+                dac.append_decision(make_decision(i))
+                self.assertLess(dac.serialized_size, 1000000)
+        self.assertEqual(get_decision_size.call_count, 100)
+        self.assertEqual(dac.serialized_size, len(json.dumps(dac.decisions)))
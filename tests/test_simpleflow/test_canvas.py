@@ -6,10 +6,12 @@ from simpleflow.canvas import (
     FuncGroup,
     Group,
     Chain,
+    ShardedGroup,
 )
 from simpleflow.exceptions import AggregateException
 from simpleflow.constants import HOUR, MINUTE
 from simpleflow.local.executor import Executor
+from simpleflow.swf.stats import DurationModel
 from simpleflow.activity import with_attributes
 from simpleflow.task import ActivityTask
 
@@ -61,6 +63,25 @@ class CustomExecutor(Executor):
         return super(CustomExecutor, self).submit(func, *args, **kwargs)
 
 
+class FakeExecutor(object):
+    """
+    Finish the first *nb_finished* tasks; the next ones are running.
+    """
+    def __init__(self, nb_finished):
+        self.workflow = self
+        self.nb_finished = nb_finished
+        self.submitted = []
+
+    def submit(self, submittable):
+        future = futures.Future()
+        if len(self.submitted) < self.nb_finished:
+            future.set_finished(len(self.submitted))
+        else:
+            future.set_running()
+        self.submitted.append(submittable)
+        return future
+
+
 class MyWorkflow(workflow.Workflow):
     name = 'test_workflow'
     version = 'test_version'
@@ -160,6 +181,45 @@ class TestGroup(unittest.TestCase):
         ).submit(executor)
         self.assertTrue(future.finished)
 
+    def test_max_parallel_large_group(self):
+        group = Group(*[(to_string, i) for i in range(10000)], max_parallel=10)
+        future = group.submit(FakeExecutor(9000))
+        self.assertTrue(future.running)
+        self.assertEquals(len(future.futures), 9010)
+        self.assertEquals(future.count_finished_activities, 9000)
+        self.assertEquals(future._result[8999:9001], [8999, None])
+
+        future = group.submit(FakeExecutor(10000))
+        self.assertTrue(future.finished)
+        self.assertIsNone(future.exception)
+        self.assertEquals(future.result, list(range(10000)))
+
+    def test_longest_first(self):
+        @with_attributes(estimated_duration=60)
+        def slow(arg):
+            return arg
+
+        group = Group(
+            (to_string, 1),
+            (to_string, 2),
+            (slow, 3),
+            (to_int, '4'),
+            max_parallel=2,
+            durations=DurationModel({to_int.name: 10}),
+        )
+        fake_executor = FakeExecutor(nb_finished=1)
+        future = group.submit(fake_executor)
+        self.assertTrue(future.running)
+        self.assertEquals([t.activity for t in fake_executor.submitted], [slow, to_int, to_string])
+        self.assertEquals(future._result, [None, None, 0, None])
+
+        future = group.submit(FakeExecutor(nb_finished=4))
+        self.assertTrue(future.finished)
+        self.assertEquals(future.result, [2, 3, 0, 1])
+
+        future = Group((to_string, 1), (slow, 3), durations=DurationModel()).submit(executor)
+        self.assertEquals(future.result, ['1', 3])
+
     def test_propagate_attribute(self):
         """
         Test that attribute 'raises_on_failure' is well propagated through Group.
@@ -280,6 +340,38 @@ class TestChain(unittest.TestCase):
         self.assertFalse(inner_a.activities[1].activity.raises_on_failure)
 
 
+class TestShardedGroup(unittest.TestCase):
+    def test_small(self):
+        group = ShardedGroup(to_string, range(3), shard_size=3)
+        future = group.submit(executor)
+        self.assertTrue(future.finished)
+        self.assertEqual(future.result, ['0', '1', '2'])
+        self.assertEqual([a.activity for a in future.activities], [to_string] * 3)
+
+    def test_shards(self):
+        self.assertEqual([len(s) for s in ShardedGroup(to_string, range(30), shard_size=4).get_shards()],
+                         [8, 8, 8, 6])
+        self.assertEqual([len(s) for s in ShardedGroup(to_string, range(5), shard_size=4).get_shards()],
+                         [3, 2])
+        with self.assertRaises(ValueError):
+            ShardedGroup(to_string, range(5), shard_size=0)
+        with self.assertRaises(TypeError):
+            ShardedGroup(to_string, range(5), max_paralel=2)
+
+    def test_sharded(self):
+        future = ShardedGroup(to_string, range(30), shard_size=4).submit(executor)
+        self.assertTrue(future.finished)
+        self.assertIsNone(future.exception)
+        self.assertEqual(future.result, [str(i) for i in range(30)])
+        self.assertEqual(len(future.futures), 4)
+        self.assertEqual(future.futures[0].result, [str(i) for i in range(8)])
+
+    def test_exceptions(self):
+        future = ShardedGroup(to_int, ['1', 'a', '3'], shard_size=2).submit(executor)
+        self.assertTrue(future.finished)
+        self.assertEqual(future.result, [1, None, 3])
+
+
 class TestFuncGroup(unittest.TestCase):
     def test_previous_value_with_func(self):
         def custom_func(previous_value):
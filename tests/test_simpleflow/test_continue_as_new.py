@@ -0,0 +1,80 @@
+import unittest
+
+import mock
+
+from simpleflow import activity, workflow
+from simpleflow.history import History
+from simpleflow.local.executor import Executor
+
+
+@activity.with_attributes()
+def increment(x):
+    return x + 1
+
+
+class LoopWorkflow(workflow.Workflow):
+    name = 'loop'
+    continue_as_new_max_events = 10
+    runs = []
+
+    def run(self, x, count=0):
+        self.runs.append((x, count))
+        while count < 5:
+            x = self.submit(increment, x).result
+            count += 1
+            self.continue_as_new_if_needed(x, count=count)
+        return x
+
+
+class SizeLoopWorkflow(LoopWorkflow):
+    continue_as_new_max_events = None
+    continue_as_new_max_size = 2000
+    runs = []
+
+
+class TestLocalContinueAsNew(unittest.TestCase):
+    def test_max_events(self):
+        result = Executor(LoopWorkflow).run({'args': [0]})
+        self.assertEqual(result, 5)
+        self.assertEqual(LoopWorkflow.runs, [(0, 0), (3, 3)])
+
+    def test_max_size(self):
+        result = Executor(SizeLoopWorkflow).run({'args': [0]})
+        self.assertEqual(result, 5)
+        self.assertGreater(len(SizeLoopWorkflow.runs), 1)
+        self.assertEqual(SizeLoopWorkflow.runs[0], (0, 0))
+
+    def test_history_is_parsed_incrementally(self):
+        histories = []
+
+        class CheckedWorkflow(LoopWorkflow):
+            continue_as_new_max_events = None
+            runs = []
+
+            def should_continue_as_new(self, history):
+                histories.append(history)
+                return False
+
+        with mock.patch.object(History, 'parse', autospec=True, side_effect=History.parse) as parse:
+            self.assertEqual(Executor(CheckedWorkflow).run({'args': [0]}), 5)
+        # The same history is kept and parsed as the run goes
+        self.assertEqual(len(histories), 5)
+        self.assertEqual(len(set(id(h) for h in histories)), 1)
+        self.assertEqual(histories[0].last_event_id, len(histories[0].events))
+        self.assertEqual(len(histories[0].activities), 5)
+        self.assertEqual(parse.call_count, 6)
+
+    def test_explicit(self):
+        class RestartWorkflow(workflow.Workflow):
+            name = 'restart'
+
+            def run(self, x):
+                if x < 3:
+                    self.continue_as_new(x + 1)
+                return x
+
+        self.assertEqual(Executor(RestartWorkflow).run({'args': [0]}), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
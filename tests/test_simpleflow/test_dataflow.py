@@ -142,9 +142,63 @@ def test_workflow_with_repair_if_task_successful():
     # The executor should not schedule anything, it should use previous history
     decisions = executor.replay(Response(history=history, execution=None)).decisions
     assert len(decisions) == 1
-    assert decisions[0]['decisionType'] == 'ScheduleActivityTask'
-    attrs = decisions[0]['scheduleActivityTaskDecisionAttributes']
-    assert attrs['taskList']['name'].startswith("FAKE-")
+    assert decisions[0]['decisionType'] == 'CompleteWorkflowExecution'
+    attrs = decisions[0]['completeWorkflowExecutionDecisionAttributes']
+    assert attrs['result'] == json_dumps(57)
+
+
+@mock_swf
+def test_workflow_with_repair_records_reused_results():
+    workflow = ATestDefinition
+    history = builder.History(workflow)
+
+    previous_history = builder.History(workflow)
+    decision_id = previous_history.last_id
+    (previous_history
+     .add_activity_task(increment,
+                        decision_id=decision_id,
+                        last_state='completed',
+                        activity_id='activity-tests.data.activities.increment-1',
+                        input={'args': 1},
+                        result=57)
+     .add_activity_task(double,
+                        decision_id=decision_id,
+                        last_state='failed',
+                        activity_id='activity-tests.data.activities.double-1',
+                        input={'args': 57})
+     )
+    to_repair = History(previous_history)
+    to_repair.parse()
+
+    executor = Executor(DOMAIN, workflow, repair_with=to_repair)
+
+    # The reused result is recorded in a marker, the failed task is scheduled
+    decisions = executor.replay(Response(history=history, execution=None)).decisions
+    assert [d['decisionType'] for d in decisions] == ['RecordMarker', 'ScheduleActivityTask']
+    attrs = decisions[0]['recordMarkerDecisionAttributes']
+    assert attrs['markerName'] == constants.CACHED_RESULT_MARKER
+    check_task_scheduled_decision(decisions[1], double)
+
+    # Next decisions use the marker
+    (history
+     .add_decision_task_completed()
+     .add_marker(constants.CACHED_RESULT_MARKER, {
+         'id': 'activity-tests.data.activities.increment-1',
+         'result': '57',
+     })
+     .add_activity_task(double,
+                        decision_id=history.last_id,
+                        last_state='completed',
+                        activity_id='activity-tests.data.activities.double-1',
+                        input={'args': 57},
+                        result=114)
+     .add_decision_task_scheduled()
+     .add_decision_task_started())
+    executor = Executor(DOMAIN, workflow, repair_with=to_repair)
+    with patch.object(executor, 'find_event', wraps=executor.find_event) as find_event:
+        decisions = executor.replay(Response(history=history, execution=None)).decisions
+    assert decisions[0]['decisionType'] == 'CompleteWorkflowExecution'
+    assert [c[0][1] for c in find_event.call_args_list] == [executor._history] * 2
 
 
 @mock_swf
@@ -198,9 +252,6 @@ def test_workflow_with_repair_and_force_activities():
     # The executor should not schedule anything, it should use previous history
     decisions = executor.replay(Response(history=history, execution=None)).decisions
     assert len(decisions) == 1
-    assert decisions[0]['decisionType'] == 'ScheduleActivityTask'
-    attrs = decisions[0]['scheduleActivityTaskDecisionAttributes']
-    assert not attrs['taskList']['name'].startswith("FAKE-")
     check_task_scheduled_decision(decisions[0], increment)
 
 
@@ -2,11 +2,14 @@
 from __future__ import print_function
 
 import json
+import logging
 import tempfile
 import os.path
 import platform
+import sys
 import threading
 
+import mock
 import psutil
 import pytest
 import time
@@ -14,6 +17,7 @@ import time
 import subprocess
 
 from simpleflow import execute
+from swf import format
 from simpleflow.exceptions import ExecutionError, ExecutionTimeoutError
 
 
@@ -309,3 +313,165 @@ def test_execute_kill_children():
     pid = execute.python(kill_children=True)(create_sleeper_subprocess)()
     with pytest.raises(psutil.NoSuchProcess):
         psutil.Process(pid)
+
+
+def get_pid():
+    return os.getpid()
+
+
+@pytest.fixture
+def interpreter_pool():
+    # Idle interpreters would outlive the test as children of this process
+    yield execute.interpreter_pool
+    execute.interpreter_pool.close()
+
+
+def test_persistent_execute(interpreter_pool):
+    func = execute.python(persistent=True)(add)
+    assert func(3, 7) == 10
+    assert execute.python(persistent=True)(Add)(4) == 5
+    assert execute.python(persistent=True)(print_string)('', 'a\nb') == 'a\nb'
+    # Sent in several chunks
+    assert execute.python(persistent=True)(print_string)('', u'\xe9' * 100000) == u'\xe9' * 100000
+    with pytest.raises(ExecutionError) as excinfo:
+        func('1')
+    assert '"error":"TypeError"' in str(excinfo.value)
+
+
+def test_persistent_execute_reuses_interpreter(interpreter_pool):
+    func = execute.python(persistent=True)(get_pid)
+    pid = func()
+    assert pid != os.getpid()
+    assert func() == pid
+
+
+def test_persistent_execute_max_calls(interpreter_pool):
+    func = execute.python(persistent=True, max_calls=2)(get_pid)
+    first = func()
+    assert func() == first
+    assert func() != first
+
+
+def test_persistent_execute_timeout(interpreter_pool):
+    func = execute.python(persistent=True, timeout=3)(sleep_and_return)
+    assert func(0.25) == 0.25
+
+    t = time.time()
+    with pytest.raises(ExecutionTimeoutError) as e:
+        func(10)
+    assert (time.time() - t) < 10.0
+    assert 'ExecutionTimeoutError after 3 seconds' in str(e.value)
+
+    # The interpreter is replaced
+    assert func(0.25) == 0.25
+
+
+def test_interpreter_server_read_deadline():
+    server = execute.InterpreterServer.__new__(execute.InterpreterServer)
+    r, w = os.pipe()
+    server._responses_fd, server._buffer = r, bytearray()
+    try:
+        # A partial response doesn't extend the deadline
+        os.write(w, b'{"result_size": 3}\n"1')
+        t = time.time()
+        assert server._read_response(timeout=0.3) is None
+        assert 0.3 <= time.time() - t < 2
+
+        os.write(w, b'"')
+        assert server._read_response(timeout=1) == {'result': '"1"'}
+        assert server._buffer == b''
+
+        os.write(w, b'{"error": "oops"}\n')
+        assert server._read_response(timeout=1) == {'error': 'oops'}
+    finally:
+        os.close(w)
+    try:
+        # The server exited
+        assert server._read_response(timeout=1) == {}
+    finally:
+        os.close(r)
+
+
+def test_interpreter_server_close_kills_busy_server():
+    server = execute.InterpreterServer(sys.executable)
+    server._requests.write(json.dumps({
+        'funcname': execute.get_name(sleep_and_return),
+        'funcargs': json.dumps({'args': [30], 'kwargs': {}}),
+        'logger_name': None,
+        'kill_children': False,
+        'offload_threshold': None,
+    }).encode('utf-8') + b'\n')
+    server._requests.flush()
+
+    t = time.time()
+    server.close(timeout=0.5)
+    assert time.time() - t < 5
+    assert server.process.returncode == -9
+
+
+def test_persistent_execute_kill_children(interpreter_pool):
+    pid = execute.python(persistent=True, kill_children=True)(create_sleeper_subprocess)()
+    with pytest.raises(psutil.NoSuchProcess):
+        psutil.Process(pid)
+
+
+def test_write_and_load_result():
+    result = {'a': [1, 2, 3], 'b': u'é' * 1000}
+    with tempfile.TemporaryFile() as f:
+        execute.write_result(result, f.fileno(), offload_threshold=100)
+        assert execute.load_result(f, logging.getLogger(__name__)) == result
+
+
+def test_write_result_offload():
+    signature = 'simpleflow+s3://jumbo-bucket/f00 1004'
+    pushed = []
+
+    def push_jumbo_file(fileobj, size):
+        pushed.append((fileobj.read(), size))
+        return signature
+
+    with mock.patch('swf.format._jumbo_fields_bucket', return_value='jumbo-bucket'), \
+            mock.patch('swf.format.push_jumbo_file', push_jumbo_file):
+        with tempfile.TemporaryFile() as f:
+            execute.write_result(['small'], f.fileno(), offload_threshold=100)
+            f.seek(0)
+            assert f.read() == b'["small"]'
+        assert pushed == []
+
+        with tempfile.TemporaryFile() as f:
+            execute.write_result(['A' * 1000], f.fileno(), offload_threshold=100)
+            f.seek(0)
+            assert f.read() == signature.encode('utf-8')
+            result = execute.load_result(f, logging.getLogger(__name__))
+        assert pushed == [(b'["' + b'A' * 1000 + b'"]', 1004)]
+
+    # passed on without being pulled
+    assert format.jumbo_signature(result) == signature
+    assert format.result(result) == signature
+
+
+def test_serve_offload():
+    signature = 'simpleflow+s3://jumbo-bucket/f00 1004'
+    request_r, request_w = os.pipe()
+    response_r, response_w = os.pipe()
+    for value in ('small', 'A' * 1000):
+        os.write(request_w, json.dumps({
+            'funcname': execute.get_name(print_string),
+            'funcargs': json.dumps({'args': ['', value], 'kwargs': {}}),
+            'logger_name': None,
+            'kill_children': False,
+            'offload_threshold': 100,
+        }).encode('utf-8') + b'\n')
+    os.close(request_w)
+
+    with mock.patch('swf.format._jumbo_fields_bucket', return_value='jumbo-bucket'), \
+            mock.patch('swf.format.push_jumbo_file', return_value=signature):
+        execute.serve(request_r, response_w)
+
+    server = execute.InterpreterServer.__new__(execute.InterpreterServer)
+    server._responses_fd, server._buffer = response_r, bytearray()
+    try:
+        assert server._read_response() == {'result': '"small"'}
+        assert server._read_response() == {'result': signature}
+    finally:
+        os.close(response_r)
@@ -0,0 +1,206 @@
+from __future__ import absolute_import
+
+import unittest
+
+import swf.models
+from simpleflow.history import History, HistoryCache
+from simpleflow.swf.executor import Executor
+from swf.models.event.factory import EventFactory
+from swf.models.history import builder
+from swf.responses import Response
+from tests.data import (
+    BaseTestWorkflow,
+    DOMAIN,
+    double,
+    increment,
+)
+
+
+class ATestDefinitionChain(BaseTestWorkflow):
+    def run(self, x):
+        y = self.submit(increment, x).result
+        return self.submit(double, y).result
+
+
+def build_history():
+    history = builder.History(ATestDefinitionChain, input={'args': [1]})
+    history.add_decision_task_completed()
+    return history
+
+
+def add_increment(history):
+    (history
+     .add_activity_task(increment,
+                        decision_id=history.last_id,
+                        last_state='completed',
+                        activity_id='activity-tests.data.activities.increment-1',
+                        input={'args': [1]},
+                        result=2)
+     .add_decision_task_scheduled()
+     .add_decision_task_started())
+
+
+class TestHistory(unittest.TestCase):
+    def test_parse_is_incremental(self):
+        swf_history = build_history()
+        history = History(swf_history)
+        history.parse()
+        self.assertEqual(history.last_event_id, len(swf_history))
+        self.assertEqual(len(history.tasks), 0)
+
+        add_increment(swf_history)
+        history.parse()
+        self.assertEqual(history.last_event_id, len(swf_history))
+        self.assertEqual(len(history.tasks), 1)
+        self.assertEqual(history.activities['activity-tests.data.activities.increment-1']['state'], 'completed')
+
+        # Parsing again is a no-op
+        history.parse()
+        self.assertEqual(len(history.tasks), 1)
+
+    def test_is_prefix_of(self):
+        swf_history = build_history()
+        history = History(swf_history)
+        history.parse()
+        self.assertTrue(history.is_prefix_of(swf_history))
+        self.assertFalse(history.is_prefix_of(swf_history[:2]))
+        self.assertFalse(history.is_prefix_of(build_history()))
+
+    def test_checkpoint(self):
+        swf_history = build_history()
+        swf_history.add_activity_task_scheduled(
+            increment, decision_id=swf_history.last_id, activity_id='increment-1', input={'args': [1]})
+        scheduled_id = swf_history.last_id
+        swf_history.add_activity_task_started(scheduled_id)
+        history = History(swf_history)
+        history.parse()
+
+        checkpoint = history.get_checkpoint()
+        self.assertNotIn('_history', checkpoint)
+        # The scheduled event of the running activity is kept for later events
+        self.assertEqual(sorted(checkpoint['_events']), [1, scheduled_id, scheduled_id + 1])
+
+        resumed = History.from_checkpoint(checkpoint)
+        self.assertEqual(resumed.get_state(), history.get_state())
+        self.assertTrue(resumed.is_prefix_of(swf_history))
+        # The events that weren't saved aren't exposed
+        self.assertEqual([e.id for e in resumed.events], [1, scheduled_id, scheduled_id + 1])
+
+        swf_history.add_activity_task_completed(scheduled_id, scheduled_id + 1, result=2)
+        events = resumed.swf_history.events + swf_history.events[len(resumed.swf_history):]
+        resumed.update(swf.models.History(events=events))
+        history.parse()
+        self.assertEqual(resumed.get_state(), history.get_state())
+        self.assertEqual(resumed.activities['increment-1']['state'], 'completed')
+        self.assertEqual(resumed.size, history.size)
+        self.assertEqual([e.id for e in resumed.events], [1, scheduled_id, scheduled_id + 1, scheduled_id + 2])
+
+    def test_checkpoint_unscheduled_cancel_requested(self):
+        swf_history = build_history()
+        swf_history.events.append(EventFactory({
+            'eventId': swf_history.next_id,
+            'eventTimestamp': builder.new_timestamp_string(),
+            'eventType': 'ActivityTaskCancelRequested',
+            'activityTaskCancelRequestedEventAttributes': {
+                'activityId': 'increment-1',
+                'decisionTaskCompletedEventId': swf_history.last_id,
+            },
+        }))
+        history = History(swf_history)
+        history.parse()
+        self.assertEqual(history.activities['increment-1']['state'], 'cancel_requested')
+
+        checkpoint = history.get_checkpoint()
+        self.assertEqual(sorted(checkpoint['_events']), [1, swf_history.last_id])
+
+    def test_marker_index(self):
+        swf_history = build_history()
+        swf_history.add_marker('foo', details={'x': 1})
+        swf_history.add_marker('foo', details={'x': 2})
+        swf_history.add_marker('bar')
+        history = History(swf_history)
+        history.parse()
+        self.assertEqual(history.find_recorded_marker('foo', '{"x":1}')['event_id'], 5)
+        self.assertEqual(history.find_last_recorded_marker('foo')['event_id'], 6)
+        self.assertIsNone(history.find_recorded_marker('foo', '{"x":3}'))
+        self.assertIsNone(history.find_last_recorded_marker('baz'))
+
+    def test_signaled_workflows_index(self):
+        swf_history = build_history()
+        for run_id in ('run-1', 'run-2'):
+            initiated_id = swf_history.next_id
+            swf_history.events.append(EventFactory({
+                'eventId': initiated_id,
+                'eventTimestamp': builder.new_timestamp_string(),
+                'eventType': 'SignalExternalWorkflowExecutionInitiated',
+                'signalExternalWorkflowExecutionInitiatedEventAttributes': {
+                    'workflowId': 'wf',
+                    'runId': run_id,
+                    'signalName': 'sig',
+                    'decisionTaskCompletedEventId': 3,
+                },
+            }))
+            swf_history.events.append(EventFactory({
+                'eventId': swf_history.next_id,
+                'eventTimestamp': builder.new_timestamp_string(),
+                'eventType': 'ExternalWorkflowExecutionSignaled',
+                'externalWorkflowExecutionSignaledEventAttributes': {
+                    'initiatedEventId': initiated_id,
+                    'workflowExecution': {'workflowId': 'wf', 'runId': run_id},
+                },
+            }))
+        history = History(swf_history)
+        history.parse()
+        self.assertEqual(history.find_signaled_workflow('sig', 'wf')['run_id'], 'run-1')
+        self.assertEqual(history.find_signaled_workflow('sig', 'wf', 'run-2')['run_id'], 'run-2')
+        self.assertIsNone(history.find_signaled_workflow('sig', 'wf', 'run-3'))
+        self.assertIsNone(history.find_signaled_workflow('other', 'wf'))
+
+
+class TestHistoryCache(unittest.TestCase):
+    def test_incremental_parse(self):
+        cache = HistoryCache(check=True)
+        swf_history = build_history()
+        history = cache.get('wf', 'run', swf_history)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        add_increment(swf_history)
+        self.assertIs(cache.get('wf', 'run', swf_history), history)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(len(history.tasks), 1)
+
+    def test_stale_entry(self):
+        cache = HistoryCache(check=True)
+        history = cache.get('wf', 'run', build_history())
+        other = cache.get('wf', 'run', build_history())
+        self.assertIsNot(other, history)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_lru_eviction(self):
+        cache = HistoryCache(max_size=2)
+        cache.get('wf', 'run-1', build_history())
+        cache.get('wf', 'run-2', build_history())
+        cache.get('wf', 'run-1', cache._histories[('wf', 'run-1')].swf_history)
+        cache.get('wf', 'run-3', build_history())
+        self.assertEqual(len(cache), 2)
+        self.assertIn(('wf', 'run-1'), cache)
+        self.assertNotIn(('wf', 'run-2'), cache)
+
+    def test_executor_replay(self):
+        cache = HistoryCache(check=True)
+        executor = Executor(DOMAIN, ATestDefinitionChain, history_cache=cache)
+        execution = swf.models.WorkflowExecution(
+            DOMAIN, 'wf', 'run',
+            workflow_type=swf.models.WorkflowType(DOMAIN, ATestDefinitionChain.name, ATestDefinitionChain.version),
+        )
+        swf_history = build_history()
+        decisions = executor.replay(Response(history=swf_history, execution=execution)).decisions
+        self.assertEqual(decisions[0]['decisionType'], 'ScheduleActivityTask')
+
+        add_increment(swf_history)
+        decisions = executor.replay(Response(history=swf_history, execution=execution)).decisions
+        self.assertEqual(
+            decisions[0]['scheduleActivityTaskDecisionAttributes']['activityType']['name'],
+            double.name,
+        )
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
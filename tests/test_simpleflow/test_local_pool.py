@@ -0,0 +1,92 @@
+import os
+import time
+import unittest
+
+from simpleflow import activity, exceptions, futures, workflow
+from simpleflow.canvas import Chain, Group
+from simpleflow.local.executor import Executor
+
+
+@activity.with_attributes()
+def sleep_and_return(value, seconds=0.3):
+    time.sleep(seconds)
+    return value
+
+
+@activity.with_attributes()
+def get_pid():
+    return os.getpid()
+
+
+@activity.with_attributes()
+def increment(x):
+    return x + 1
+
+
+@activity.with_attributes(raises_on_failure=True)
+def fail():
+    raise ValueError('failed')
+
+
+class ParallelWorkflow(workflow.Workflow):
+    name = 'parallel'
+
+    def run(self, n):
+        return futures.wait(*[self.submit(sleep_and_return, i) for i in range(n)])
+
+
+class CanvasWorkflow(workflow.Workflow):
+    name = 'canvas'
+
+    def run(self):
+        group = self.submit(Group(*[(sleep_and_return, i, 0.1) for i in range(6)], max_parallel=2))
+        chain = self.submit(Chain((increment, 1), (increment,), send_result=True))
+        y = self.submit(increment, self.submit(increment, 0))
+        return group.result, chain.result, y.result
+
+
+class PidWorkflow(workflow.Workflow):
+    name = 'pid'
+
+    def run(self):
+        return futures.wait(*[self.submit(get_pid) for _ in range(4)])
+
+
+class FailingWorkflow(workflow.Workflow):
+    name = 'failing'
+
+    def run(self):
+        self.submit(fail)
+
+
+class TestLocalPool(unittest.TestCase):
+    def test_parallel(self):
+        executor = Executor(ParallelWorkflow, pool_size=4)
+        start = time.time()
+        result = executor.run({'args': [8]})
+        self.assertLess(time.time() - start, 1.2)
+        self.assertEqual(result, list(range(8)))
+
+        activities = executor._history.activities
+        self.assertEqual(list(activities), [str(i) for i in range(8)])
+        self.assertEqual([a['input']['args'][0] for a in activities.values()], list(range(8)))
+
+    def test_canvas(self):
+        result = Executor(CanvasWorkflow, pool_size=2).run()
+        self.assertEqual(result, ([0, 1, 2, 3, 4, 5], [2, 3], 2))
+
+    def test_process_pool(self):
+        pids = Executor(PidWorkflow, pool_size=2, pool_type='process').run()
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_raises_on_failure(self):
+        with self.assertRaises(exceptions.TaskFailed):
+            Executor(FailingWorkflow, pool_size=2).run()
+
+    def test_invalid_pool_type(self):
+        with self.assertRaises(ValueError):
+            Executor(ParallelWorkflow, pool_size=2, pool_type='fiber').run({'args': [1]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+import time
+import unittest
+
+import boto
+from moto import mock_s3
+
+from simpleflow import storage
+from simpleflow.result_cache import (
+    DiskResultCache,
+    ResultCache,
+    S3ResultCache,
+    make_result_cache,
+)
+
+
+class TestDiskResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_set(self):
+        cache = DiskResultCache(self.directory)
+        key = cache.make_key('triple', '1', [1], {})
+        self.assertNotEqual(key, cache.make_key('triple', '2', [1], {}))
+        self.assertNotEqual(key, cache.make_key('triple', '1', [2], {}))
+        self.assertIsNone(cache.get(key))
+        cache.set(key, '3')
+        self.assertEqual(cache.get(key), '3')
+        self.assertEqual(DiskResultCache(self.directory).get(key), '3')
+        self.assertEqual(cache.get_stats(), {
+            'hits': 1, 'misses': 1, 'stores': 1, 'errors': 0, 'hit_ratio': 0.5,
+        })
+
+    def test_expire(self):
+        cache = DiskResultCache(self.directory, expire=1)
+        cache.set('key', '3')
+        time.sleep(1.1)
+        self.assertIsNone(cache.get('key'))
+
+    def test_disk_is_opened_once(self):
+        cache = DiskResultCache(self.directory)
+        cache.set('key', '1')
+        disk = cache.disk
+        self.assertEqual(cache.get('key'), '1')
+        self.assertIs(cache.disk, disk)
+
+    def test_size_limit(self):
+        cache = DiskResultCache(self.directory, size_limit=100 * 1024)
+        for i in range(50):
+            cache.set('key-{}'.format(i), 'x' * 10000)
+        self.assertIsNone(cache.get('key-0'))
+        self.assertEqual(cache.get('key-49'), 'x' * 10000)
+
+
+class TestResultCache(unittest.TestCase):
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            ResultCache()
+
+
+class TestS3ResultCache(unittest.TestCase):
+    @mock_s3
+    def test_get_set(self):
+        boto.connect_s3().create_bucket('bucket')
+        storage.BUCKET_LOCATIONS_CACHE['bucket'] = 'us-east-1'
+        self.addCleanup(storage.BUCKET_LOCATIONS_CACHE.pop, 'bucket', None)
+        storage.set_backend(storage.S3Backend())
+        self.addCleanup(storage.set_backend, None)
+
+        cache = make_result_cache('s3://bucket/some/prefix', expire=60)
+        self.assertIsInstance(cache, S3ResultCache)
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', '{"x":1}')
+        self.assertEqual(cache.get('key'), '{"x":1}')
+        self.assertIsNotNone(storage.open_content('bucket', 'some/prefix/result_cache/key'))
+
+        cache.expire = -1
+        cache.set('key', '{"x":1}')
+        self.assertIsNone(cache.get('key'))
+
+
+if __name__ == '__main__':
+    unittest.main()
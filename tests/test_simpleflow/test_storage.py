@@ -1,4 +1,7 @@
+import io
 import os
+import shutil
+import threading
 import unittest
 import tempfile
 import boto
@@ -27,6 +30,8 @@ class TestGroup(unittest.TestCase):
         f = open(self.tmp_filename, "w")
         f.write("42")
         f.close()
+        storage.set_backend(storage.S3Backend())
+        self.addCleanup(storage.set_backend, None)
 
     def tearDown(self):
         os.remove(self.tmp_filename)
@@ -109,3 +114,74 @@ class TestGroup(unittest.TestCase):
         # bucket with too many "/": raise
         with self.assertRaises(ValueError):
             storage.sanitize_bucket_and_host('s3-eu-west-1.amazonaws.com/mybucket/subpath')
+
+
+class TestS3Backend(unittest.TestCase):
+    @patch("simpleflow.storage.sanitize_bucket_and_host", return_value=("bucket", "us-east-1"))
+    @patch("simpleflow.storage.get_connection")
+    def test_connection_per_thread(self, get_connection, _):
+        backend = storage.S3Backend()
+        self.assertIs(backend.get_bucket("bucket"), backend.get_bucket("bucket"))
+        self.assertEqual(get_connection.call_count, 1)
+
+        thread = threading.Thread(target=backend.get_bucket, args=("bucket",))
+        thread.start()
+        thread.join()
+        self.assertEqual(get_connection.call_count, 2)
+
+        # a forked child doesn't reuse its parent's connections
+        with patch("os.getpid", return_value=-1):
+            backend.get_bucket("bucket")
+        self.assertEqual(get_connection.call_count, 3)
+
+
+class TestLocalBackend(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        storage.set_backend(storage.LocalBackend(self.directory))
+        self.addCleanup(storage.set_backend, None)
+
+    def test_push_pull_content(self):
+        storage.push_content("bucket", "some/key.txt", u"Hey Jude \u266b")
+        self.assertEqual(storage.pull_content("bucket", "some/key.txt"), u"Hey Jude \u266b")
+        self.assertEqual(
+            storage.pull_content("bucket", "some/key.txt", encoding=None),
+            u"Hey Jude \u266b".encode("utf-8"))
+
+    def test_push_pull_file(self):
+        src = os.path.join(self.directory, "src")
+        with open(src, "w") as f:
+            f.write("42")
+        storage.push("bucket", "key", src)
+        dest = os.path.join(self.directory, "dest")
+        storage.pull("bucket", "key", dest)
+        with open(dest) as f:
+            self.assertEqual(f.read(), "42")
+
+        storage.push_file("bucket", "other", io.BytesIO(b"data"))
+        stream = storage.open_content("bucket", "other")
+        self.assertEqual(stream.read(), b"data")
+        stream.close()
+        self.assertIsNone(storage.open_content("bucket", "missing"))
+
+    def test_list_keys(self):
+        storage.push_content("bucket", "steps/b", "2")
+        storage.push_content("bucket", "steps/a", "1")
+        storage.push_content("bucket", "other", "3")
+        keys = list(storage.list_keys("bucket", "steps/"))
+        self.assertEqual([k.key for k in keys], ["steps/a", "steps/b"])
+        self.assertEqual(keys[0].name, "steps/a")
+        self.assertEqual(keys[0].get_contents_as_string(encoding="utf-8"), "1")
+
+    def test_no_bucket(self):
+        with self.assertRaises(NotImplementedError):
+            storage.get_bucket("bucket")
+
+    @patch("simpleflow.settings.SIMPLEFLOW_STORAGE_BACKEND", "local")
+    def test_backend_from_settings(self):
+        storage.set_backend(None)
+        with patch("simpleflow.settings.SIMPLEFLOW_STORAGE_DIRECTORY", self.directory):
+            backend = storage.get_backend()
+        self.assertIsInstance(backend, storage.LocalBackend)
+        self.assertEqual(backend.directory, self.directory)
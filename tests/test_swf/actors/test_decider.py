@@ -1,9 +1,11 @@
 import boto
+import mock
 import unittest
 from moto import mock_swf
 
 from swf.exceptions import PollTimeout
 from swf.actors import Decider
+from swf.actors.decider import PageFetcher
 from swf.models import Domain
 
 
@@ -46,3 +48,62 @@ class TestActor(unittest.TestCase):
         )
         self.assertEquals(response.execution.workflow_id, 'wfe-1234')
         self.assertIsNotNone(response.execution.run_id)
+
+    def test_poll_paginated_history(self):
+        events = [
+            {
+                'eventId': n,
+                'eventType': 'DecisionTaskScheduled',
+                'eventTimestamp': 1500000000 + n,
+                'decisionTaskScheduledEventAttributes': {'taskList': {'name': 'test-task-list'}},
+            }
+            for n in range(1, 6)
+        ]
+        pages = [
+            {'nextPageToken': 'page-2', 'events': events[:2]},
+            {'nextPageToken': 'page-3', 'events': events[2:4]},
+            {'events': events[4:]},
+        ]
+        for page in pages:
+            page.update({
+                'taskToken': 'token',
+                'workflowType': {'name': 'test-workflow', 'version': 'v1.2'},
+                'workflowExecution': {'workflowId': 'wfe-1234', 'runId': 'run'},
+            })
+        page_tokens = []
+
+        def poll_for_decision_task(domain, task_list, identity=None, next_page_token=None):
+            page_tokens.append(next_page_token)
+            return pages[len(page_tokens) - 1]
+
+        seen = []
+        self.actor.connection = mock.Mock(poll_for_decision_task=poll_for_decision_task)
+        response = self.actor.poll(on_page=lambda task, history: seen.append(len(history)))
+
+        self.assertEqual(page_tokens, [None, 'page-2', 'page-3'])
+        self.assertEqual(seen, [2, 4, 5])
+        self.assertEqual([evt.id for evt in response.history], [1, 2, 3, 4, 5])
+        self.assertEqual(response.execution.workflow_id, 'wfe-1234')
+
+    def test_poll_paginated_history_timeout(self):
+        pages = [
+            {'taskToken': 'token', 'nextPageToken': 'page-2', 'events': []},
+            {},
+        ]
+        self.actor.connection = mock.Mock(poll_for_decision_task=mock.Mock(side_effect=pages))
+        with self.assertRaises(PollTimeout):
+            self.actor.poll()
+
+    def test_poll_paginated_history_bad_event(self):
+        pages = [
+            {'taskToken': 'token', 'nextPageToken': 'page-2', 'events': [{'eventId': 1}]},
+            {'taskToken': 'token', 'events': []},
+        ]
+        self.actor.connection = mock.Mock(poll_for_decision_task=mock.Mock(side_effect=pages))
+        with mock.patch('swf.actors.decider.EventFactory', side_effect=ValueError), \
+                mock.patch.object(PageFetcher, 'join', autospec=True, side_effect=PageFetcher.join) as join:
+            with self.assertRaises(ValueError):
+                self.actor.poll()
+        # The page fetched in the background was waited for
+        self.assertEqual(join.call_count, 1)
+        self.assertEqual(self.actor.connection.poll_for_decision_task.call_count, 2)
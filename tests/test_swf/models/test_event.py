@@ -6,7 +6,9 @@ from datetime import datetime
 
 import pytz
 
-from swf.models.event import Event
+import pickle
+
+from swf.models.event import Event, EventFactory
 from swf.models.history import History
 import swf.constants
 
@@ -36,6 +38,54 @@ class TestEvent(unittest.TestCase):
         self.assertEqual(datetime(1970, 1, 1, 0, 0, tzinfo=pytz.UTC), ev.timestamp)
 
 
+class TestCompactEvent(unittest.TestCase):
+    def setUp(self):
+        self.raw_events = mock_get_workflow_execution_history()['events']
+
+    def test_attributes(self):
+        event = EventFactory(self.raw_events[0])
+        self.assertEqual(event.name, 'WorkflowExecutionStarted')
+        self.assertEqual(event.state, 'started')
+        self.assertEqual(event.child_policy, 'TERMINATE')
+        self.assertEqual(event.task_list, {'name': 'test'})
+        self.assertFalse(getattr(event, '__dict__', None))
+
+    def test_name_is_per_event(self):
+        events = [EventFactory(raw) for raw in self.raw_events]
+        self.assertEqual([e.name for e in events], [raw['eventType'] for raw in self.raw_events])
+
+    def test_classes_are_shared(self):
+        event1 = EventFactory(self.raw_events[1])
+        event2 = EventFactory(self.raw_events[1])
+        self.assertIs(type(event1), type(event2))
+
+    def test_raw_is_rebuilt(self):
+        for raw in self.raw_events:
+            self.assertEqual(EventFactory(raw).raw, raw)
+
+    def test_input_is_decoded_lazily(self):
+        raw = {
+            'eventId': 1,
+            'eventType': 'ActivityTaskScheduled',
+            'eventTimestamp': 0,
+            'activityTaskScheduledEventAttributes': {
+                'activityId': 'a',
+                'input': '{"args": [1]}',
+            },
+        }
+        event = EventFactory(raw)
+        self.assertEqual(event._raw_input, '{"args": [1]}')
+        self.assertEqual(event.input, {'args': [1]})
+        self.assertEqual(event.raw, raw)
+        self.assertEqual(EventFactory(self.raw_events[1]).input, {})
+
+    def test_pickle(self):
+        event = EventFactory(self.raw_events[0])
+        other = pickle.loads(pickle.dumps(event))
+        self.assertIs(type(other), type(event))
+        self.assertEqual(other.raw, event.raw)
+
+
 class TestHistory(unittest.TestCase):
 
     def setUp(self):
@@ -10,6 +10,8 @@ import swf.exceptions
 from simpleflow.swf.process.worker.heartbeat import (
     HeartbeatProcess,
     Heartbeater,
+    HeartbeatScheduler,
+    TokenBucket,
 )
 
 
@@ -196,3 +198,68 @@ class TestHeartbeater(unittest.TestCase):
         heartbeater.stop()
         heartbeater._heartbeater.join()
         self.assertTrue(toggler.value)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_consume(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        self.assertTrue(bucket.consume())
+        self.assertTrue(bucket.consume())
+        self.assertFalse(bucket.consume())
+        self.assertGreater(bucket.wait_time(), 0)
+        time.sleep(0.15)
+        self.assertTrue(bucket.consume())
+
+    def test_drain(self):
+        bucket = TokenBucket(rate=1)
+        bucket.drain()
+        self.assertFalse(bucket.consume())
+
+
+class TestHeartbeatScheduler(unittest.TestCase):
+    def test_interval_for(self):
+        scheduler = HeartbeatScheduler(60)
+        self.assertEqual(scheduler.interval_for(None), 60)
+        self.assertEqual(scheduler.interval_for('NONE'), 60)
+        self.assertEqual(scheduler.interval_for('300'), 60)
+        self.assertEqual(scheduler.interval_for(30), 10)
+
+    def test_jittered_schedule(self):
+        scheduler = HeartbeatScheduler(0.1, jitter=0.5)
+        for key in range(10):
+            scheduler.add(key)
+        self.assertEqual(scheduler.pop_due(), [])
+        self.assertLessEqual(scheduler.next_timeout(), 0.15)
+        time.sleep(0.15)
+        due = scheduler.pop_due()
+        self.assertEqual(sorted(due), list(range(10)))
+        for key in due:
+            scheduler.sent(key, 0.01)
+        self.assertEqual(scheduler.pop_due(), [])
+        self.assertEqual(scheduler.get_stats()['sent'], 10)
+        self.assertAlmostEqual(scheduler.get_stats()['latency_mean'], 0.01)
+
+        scheduler.remove(0)
+        self.assertNotIn(0, scheduler)
+        self.assertEqual(len(scheduler), 9)
+
+    def test_rate_limit(self):
+        scheduler = HeartbeatScheduler(0.01, jitter=0, rate=1, burst=3)
+        for key in range(5):
+            scheduler.add(key)
+        time.sleep(0.02)
+        self.assertEqual(len(scheduler.pop_due()), 3)
+        self.assertEqual(scheduler.metrics['rate_limited'], 2)
+        # every deferred heartbeat counts
+        self.assertEqual(scheduler.pop_due(), [])
+        self.assertEqual(scheduler.metrics['rate_limited'], 7)
+        self.assertGreater(scheduler.next_timeout(), 0.5)
+
+    def test_throttled_retries_sooner(self):
+        scheduler = HeartbeatScheduler(60, jitter=0)
+        scheduler.add('key')
+        scheduler.throttled('key')
+        self.assertAlmostEqual(scheduler.next_timeout(), scheduler.throttle_backoff, places=1)
+        scheduler.throttled('key')
+        self.assertAlmostEqual(scheduler.next_timeout(), 2 * scheduler.throttle_backoff, places=1)
+        self.assertEqual(scheduler.metrics['throttled'], 2)
@@ -1,9 +1,12 @@
 import json
 import os
+import shutil
+import tempfile
 import unittest
 import random
 
 import boto
+from mock import patch
 from moto import mock_s3
 
 import swf.format
@@ -95,3 +98,136 @@ class TestFormat(unittest.TestCase):
         message = 'A' * 500
         with self.assertRaisesRegexp(ValueError, "Jumbo field signature is longer than"):
             swf.format.reason(message)
+
+
+class TestJumboFieldsCache(unittest.TestCase):
+    def test_lru_bounded_by_size(self):
+        cache = swf.format.JumboFieldsCache(max_size=10)
+        cache.set("a", "aaaa")
+        cache.set("b", "bbbb")
+        self.assertEqual(cache.get("a"), "aaaa")
+        cache.set("c", "cccc")
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.size, 8)
+        cache.set("d", "d" * 11)
+        self.assertNotIn("d", cache)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get_stats(), {
+            "entries": 2,
+            "size": 8,
+            "hits": 1,
+            "disk_hits": 0,
+            "misses": 1,
+            "evictions": 1,
+        })
+
+    def test_disk_tier(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with patch("swf.format.SIMPLEFLOW_ENABLE_DISK_CACHE", True):
+            cache = swf.format.JumboFieldsCache(max_size=10, directory=directory)
+            cache.set("dir/a", "aaaa")
+            disk = cache.disk
+            self.assertIs(cache.disk, disk)
+
+            other = swf.format.JumboFieldsCache(max_size=10, directory=directory)
+            self.assertIn("dir/a", other)
+            self.assertNotIn("dir/b", other)
+            self.assertEqual(other.get("dir/a"), "aaaa")
+            self.assertEqual(other.get("dir/a"), "aaaa")
+            self.assertEqual((other.hits, other.disk_hits, other.misses), (1, 1, 0))
+
+
+class TestPrefetchJumboFields(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("swf.format.JUMBO_FIELDS_MEMORY_CACHE", swf.format.JumboFieldsCache(max_size=100))
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("simpleflow.storage.pull_content")
+    def test_prefetch(self, pull_content):
+        pull_content.side_effect = lambda bucket, path: "content of " + path
+        self.cache.set("dir/cached", "cached")
+        contents = [
+            None,
+            '{"not": "jumbo"}',
+            "simpleflow+s3://bucket/dir/a 12",
+            "simpleflow+s3://bucket/dir/b 12",
+            "simpleflow+s3://bucket/dir/a 12",
+            "simpleflow+s3://bucket/dir/cached 6",
+            "simpleflow+s3://bucket/dir/huge 100",
+        ]
+        self.assertEqual(swf.format.prefetch_jumbo_fields(contents, nb_threads=4), 2)
+        self.assertEqual(
+            sorted(call[0] for call in pull_content.call_args_list),
+            [("bucket", "dir/a"), ("bucket", "dir/b")],
+        )
+        # Checking what is cached doesn't count as lookups
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+        self.assertEqual(self.cache.get("dir/a"), "content of dir/a")
+        self.assertEqual(swf.format.decode("simpleflow+s3://bucket/dir/b 12"), "content of dir/b")
+        self.assertEqual(pull_content.call_count, 2)
+
+    @patch("simpleflow.storage.pull_content")
+    def test_prefetch_errors_are_ignored(self, pull_content):
+        pull_content.side_effect = IOError("boom")
+        self.assertEqual(swf.format.prefetch_jumbo_fields(["simpleflow+s3://bucket/dir/a 12"]), 0)
+        self.assertNotIn("dir/a", self.cache)
+
+
+class TestCompressedFields(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("swf.format.JUMBO_FIELDS_MEMORY_CACHE", swf.format.JumboFieldsCache(max_size=10 ** 6))
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.dict(os.environ, {
+            "SIMPLEFLOW_JUMBO_FIELDS_BUCKET": "jumbo-bucket",
+            "SIMPLEFLOW_JUMBO_FIELDS_COMPRESSION": "zlib",
+        })
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = {}
+        patcher = patch("simpleflow.storage.push_content", self.push_content)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch("simpleflow.storage.pull_content", self.pull_content)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def push_content(self, bucket, path, content):
+        self.store[(bucket, path)] = content
+
+    def pull_content(self, bucket, path, encoding='utf-8'):
+        content = self.store[(bucket, path)]
+        return content.decode(encoding) if encoding and isinstance(content, bytes) else content
+
+    def test_compressed_inline(self):
+        message = ["A"] * 10000
+        encoded = swf.format.result(message)
+        self.assertTrue(encoded.startswith("simpleflow+inline://zlib:"))
+        self.assertLessEqual(len(encoded), swf.constants.MAX_RESULT_LENGTH)
+        self.assertEqual(self.store, {})
+        self.assertEqual(swf.format.decode(encoded), message)
+
+    def test_compressed_jumbo_field(self):
+        message = [random.random() for _ in range(10000)]
+        encoded = swf.format.result(message)
+        location, size, compression = encoded.split()
+        self.assertTrue(location.startswith("simpleflow+s3://jumbo-bucket/"))
+        self.assertEqual(int(size), len(json.dumps(message).replace(" ", "")))
+        self.assertEqual(compression, "zlib")
+        stored, = self.store.values()
+        self.assertLess(len(stored), int(size))
+
+        self.cache.clear()
+        self.assertEqual(swf.format.decode(encoded), message)
+        self.cache.clear()
+        self.assertEqual(swf.format.prefetch_jumbo_fields([encoded], nb_threads=1), 1)
+        self.assertEqual(swf.format.decode(encoded), message)
+
+    def test_small_fields_are_not_compressed(self):
+        self.assertEqual(swf.format.result("small"), '"small"')
+
+    def test_unsupported_compression(self):
+        with self.assertRaisesRegexp(ValueError, "Unsupported"):
+            swf.format.decode("simpleflow+inline://snappy:AAAA")